@@ -0,0 +1,45 @@
+"""Scan manifest of directories.
+
+Revision ID: 3f1c2a9d8b7e
+Revises: aac864072193
+Create Date: 2022-07-25 10:12:41.271532
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d8b7e'
+down_revision = 'aac864072193'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('''
+    CREATE TABLE public.scan_directory (
+        id SERIAL PRIMARY KEY,
+        scanner TEXT NOT NULL,
+        path TEXT NOT NULL,
+        mtime_ns BIGINT,
+        directories JSONB NOT NULL,
+        files JSONB NOT NULL,
+        UNIQUE (scanner, path)
+    )''')
+
+    if not DOCKERIZED:
+        session.execute('ALTER TABLE public.scan_directory OWNER TO wrolpi')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP TABLE IF EXISTS public.scan_directory')
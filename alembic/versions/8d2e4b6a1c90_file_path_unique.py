@@ -0,0 +1,42 @@
+"""File path is unique.
+
+Revision ID: 8d2e4b6a1c90
+Revises: 3f1c2a9d8b7e
+Create Date: 2022-07-27 09:41:17.508213
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4b6a1c90'
+down_revision = '3f1c2a9d8b7e'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    # Keep the newest File of any duplicate paths.
+    session.execute('DELETE FROM file a USING file b WHERE a.path = b.path AND a.id < b.id')
+    session.execute('DROP INDEX IF EXISTS file_path_idx')
+    session.execute('ALTER TABLE file ADD CONSTRAINT file_path_key UNIQUE (path)')
+    # Titles were stored as an array literal.
+    session.execute('''
+        UPDATE file SET title = array_to_string(title::TEXT[], ' ')
+        WHERE title LIKE '{%}'
+    ''')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('ALTER TABLE file DROP CONSTRAINT IF EXISTS file_path_key')
+    session.execute('CREATE INDEX file_path_idx ON file(path)')
@@ -0,0 +1,50 @@
+"""Log each attempt of a download.
+
+Revision ID: a7d3e5c9f2b4
+Revises: f4b8d1e6a2c7
+Create Date: 2022-08-01 10:41:52.274836
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e5c9f2b4'
+down_revision = 'f4b8d1e6a2c7'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('''CREATE TABLE download_attempt (
+        id SERIAL PRIMARY KEY,
+        download_id INTEGER NOT NULL REFERENCES download(id) ON DELETE CASCADE,
+        started_at TIMESTAMPTZ NOT NULL,
+        ended_at TIMESTAMPTZ,
+        success BOOLEAN NOT NULL DEFAULT FALSE,
+        exit_code INTEGER,
+        downloaded_bytes BIGINT,
+        error_gz BYTEA
+    )''')
+    session.execute('CREATE INDEX download_attempt_download_id_idx ON download_attempt(download_id, id)')
+    session.execute('CREATE INDEX download_attempt_started_at_idx ON download_attempt(started_at)')
+
+    # Only the end of an error is kept in the download table, the entire error is kept in download_attempt.
+    session.execute('''UPDATE download SET error = '...' || RIGHT(error, 2000) WHERE LENGTH(error) > 2000''')
+
+    if not DOCKERIZED:
+        session.execute('ALTER TABLE public.download_attempt OWNER TO wrolpi')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP TABLE IF EXISTS download_attempt')
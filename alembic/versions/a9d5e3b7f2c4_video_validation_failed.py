@@ -0,0 +1,33 @@
+"""Mark the videos which failed validation, so they are not validated after every startup.
+
+Revision ID: a9d5e3b7f2c4
+Revises: f1b9d3a6c8e2
+Create Date: 2022-08-08 09:36:14.270583
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'a9d5e3b7f2c4'
+down_revision = 'f1b9d3a6c8e2'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('ALTER TABLE video ADD COLUMN validation_failed BOOLEAN DEFAULT FALSE')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('ALTER TABLE video DROP COLUMN IF EXISTS validation_failed')
@@ -0,0 +1,65 @@
+"""Store the catalog of each channel in channel_entry.
+
+Revision ID: b5e1c8d4a9f3
+Revises: a7d3e5c9f2b4
+Create Date: 2022-08-03 09:12:37.604418
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1c8d4a9f3'
+down_revision = 'a7d3e5c9f2b4'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('''CREATE TABLE channel_entry (
+        channel_id INTEGER NOT NULL REFERENCES channel(id) ON DELETE CASCADE,
+        source_id TEXT NOT NULL,
+        title TEXT,
+        url TEXT,
+        view_count INTEGER,
+        duration INTEGER,
+        upload_date DATE,
+        PRIMARY KEY (channel_id, source_id)
+    )''')
+
+    # Copy the entries of each channel's info_json.
+    session.execute('''
+        INSERT INTO channel_entry (channel_id, source_id, title, url, view_count, duration, upload_date)
+        SELECT DISTINCT ON (c.id, e->>'id')
+            c.id,
+            e->>'id',
+            e->>'title',
+            COALESCE(e->>'webpage_url', e->>'url'),
+            (e->>'view_count')::NUMERIC::INTEGER,
+            (e->>'duration')::NUMERIC::INTEGER,
+            TO_DATE(e->>'upload_date', 'YYYYMMDD')
+        FROM
+            channel AS c,
+            json_array_elements(
+                CASE WHEN json_typeof(c.info_json->'entries') = 'array' THEN c.info_json->'entries' END
+            ) AS e
+        WHERE
+            e->>'id' IS NOT NULL
+    ''')
+
+    if not DOCKERIZED:
+        session.execute('ALTER TABLE public.channel_entry OWNER TO wrolpi')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP TABLE IF EXISTS channel_entry')
@@ -0,0 +1,40 @@
+"""Download domain column.
+
+Revision ID: b5e7c3a9d2f1
+Revises: 8d2e4b6a1c90
+Create Date: 2022-07-28 14:06:52.190837
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'b5e7c3a9d2f1'
+down_revision = '8d2e4b6a1c90'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('ALTER TABLE download ADD COLUMN domain TEXT')
+    # The netloc of the URL, just like urlparse.
+    session.execute('''
+        UPDATE download SET domain = COALESCE(substring(url from '^[a-zA-Z][a-zA-Z0-9+.-]*://([^/?#]*)'), '')
+    ''')
+    # New downloads are queued by their domain.
+    session.execute('''CREATE INDEX download_new_domain_idx ON download(domain, id) WHERE status = 'new' ''')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP INDEX IF EXISTS download_new_domain_idx')
+    session.execute('ALTER TABLE download DROP COLUMN IF EXISTS domain')
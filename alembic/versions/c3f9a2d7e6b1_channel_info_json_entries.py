@@ -0,0 +1,57 @@
+"""Remove the entries of channel.info_json, they are stored in channel_entry.
+
+Revision ID: c3f9a2d7e6b1
+Revises: b5e1c8d4a9f3
+Create Date: 2022-08-04 14:27:05.918273
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'c3f9a2d7e6b1'
+down_revision = 'b5e1c8d4a9f3'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    # Videos are joined to their channel's catalog.
+    session.execute('CREATE INDEX video_channel_id_source_id_idx ON video(channel_id, source_id)')
+
+    session.execute('''
+        UPDATE channel SET info_json = (info_json::jsonb - 'entries')::json
+        WHERE json_typeof(info_json) = 'object' AND info_json::jsonb ? 'entries'
+    ''')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP INDEX IF EXISTS video_channel_id_source_id_idx')
+
+    # Restore the entries from the catalog.
+    session.execute('''
+        UPDATE channel SET info_json = (COALESCE(info_json::jsonb, '{}'::jsonb) || jsonb_build_object('entries', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', e.source_id,
+                'title', e.title,
+                'url', e.url,
+                'webpage_url', e.url,
+                'view_count', e.view_count,
+                'duration', e.duration,
+                'upload_date', TO_CHAR(e.upload_date, 'YYYYMMDD')
+            )), '[]'::jsonb)
+            FROM channel_entry AS e
+            WHERE e.channel_id = channel.id
+        )))::json
+        WHERE info_date IS NOT NULL
+    ''')
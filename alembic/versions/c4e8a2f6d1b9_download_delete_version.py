@@ -0,0 +1,50 @@
+"""Count the deletes of downloads, so the version of the download table can be read without reading the table.
+
+Revision ID: c4e8a2f6d1b9
+Revises: a9d5e3b7f2c4
+Create Date: 2022-08-09 11:02:47.518236
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2f6d1b9'
+down_revision = 'a9d5e3b7f2c4'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('CREATE TABLE download_delete_version (version BIGINT NOT NULL)')
+    session.execute('INSERT INTO download_delete_version (version) VALUES (0)')
+    session.execute('''CREATE OR REPLACE FUNCTION bump_download_delete_version() RETURNS TRIGGER AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM deleted_downloads) THEN
+            UPDATE download_delete_version SET version = version + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql''')
+    session.execute('''CREATE TRIGGER download_delete_version AFTER DELETE ON download
+        REFERENCING OLD TABLE AS deleted_downloads
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_download_delete_version()''')
+
+    if not DOCKERIZED:
+        session.execute('ALTER TABLE public.download_delete_version OWNER TO wrolpi')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP TRIGGER IF EXISTS download_delete_version ON download')
+    session.execute('DROP FUNCTION IF EXISTS bump_download_delete_version()')
+    session.execute('DROP TABLE IF EXISTS download_delete_version')
@@ -0,0 +1,44 @@
+"""Download URL is unique.
+
+Revision ID: c81f4d2e6a37
+Revises: b5e7c3a9d2f1
+Create Date: 2022-07-29 11:23:08.614290
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'c81f4d2e6a37'
+down_revision = 'b5e7c3a9d2f1'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    # Keep one Download of each URL, prefer a recurring Download, then the oldest.
+    session.execute('''
+        DELETE FROM download a USING download b
+        WHERE
+            a.url = b.url
+            AND a.id != b.id
+            AND (
+                (a.frequency IS NULL AND b.frequency IS NOT NULL)
+                OR ((a.frequency IS NULL) = (b.frequency IS NULL) AND a.id > b.id)
+            )
+    ''')
+    session.execute('ALTER TABLE download ADD CONSTRAINT download_url_key UNIQUE (url)')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('ALTER TABLE download DROP CONSTRAINT IF EXISTS download_url_key')
@@ -0,0 +1,34 @@
+"""Index recurring downloads by frequency.
+
+Revision ID: d3a6b8f1c5e2
+Revises: c81f4d2e6a37
+Create Date: 2022-07-29 16:47:31.902114
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'd3a6b8f1c5e2'
+down_revision = 'c81f4d2e6a37'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    # The slot of a recurring download is its position within the downloads of the same frequency.
+    session.execute('CREATE INDEX download_frequency_id_idx ON download(frequency, id) WHERE frequency IS NOT NULL')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP INDEX IF EXISTS download_frequency_id_idx')
@@ -0,0 +1,34 @@
+"""Store the minimized info_json of each video.
+
+Revision ID: d8e2b6f1c4a5
+Revises: c3f9a2d7e6b1
+Create Date: 2022-08-05 11:03:48.531920
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'd8e2b6f1c4a5'
+down_revision = 'c3f9a2d7e6b1'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    # The info_json files of existing videos are read after startup, see `fill_minimized_info_json`.
+    session.execute('ALTER TABLE video ADD COLUMN minimized_info_json JSON')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('ALTER TABLE video DROP COLUMN IF EXISTS minimized_info_json')
@@ -0,0 +1,78 @@
+"""Version each download using a sequence, instead of a single row which is updated by every writer.
+
+Revision ID: e6a4c2f8b7d1
+Revises: d8e2b6f1c4a5
+Create Date: 2022-08-07 10:41:52.307914
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'e6a4c2f8b7d1'
+down_revision = 'd8e2b6f1c4a5'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP TRIGGER IF EXISTS download_version_insert ON download')
+    session.execute('DROP TRIGGER IF EXISTS download_version_update ON download')
+    session.execute('DROP TRIGGER IF EXISTS download_version_delete ON download')
+    session.execute('DROP FUNCTION IF EXISTS bump_download_version()')
+    session.execute('DROP TABLE IF EXISTS download_version')
+
+    session.execute('CREATE SEQUENCE download_version_seq')
+    session.execute('ALTER TABLE download ADD COLUMN version BIGINT')
+    session.execute("UPDATE download SET version = nextval('download_version_seq')")
+    session.execute('''CREATE OR REPLACE FUNCTION set_download_version() RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.version := nextval('download_version_seq');
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql''')
+    session.execute('''CREATE TRIGGER download_version BEFORE INSERT OR UPDATE ON download
+        FOR EACH ROW EXECUTE PROCEDURE set_download_version()''')
+
+    if not DOCKERIZED:
+        session.execute('ALTER SEQUENCE public.download_version_seq OWNER TO wrolpi')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP TRIGGER IF EXISTS download_version ON download')
+    session.execute('DROP FUNCTION IF EXISTS set_download_version()')
+    session.execute('ALTER TABLE download DROP COLUMN IF EXISTS version')
+    session.execute('DROP SEQUENCE IF EXISTS download_version_seq')
+
+    session.execute('CREATE TABLE download_version (version BIGINT NOT NULL)')
+    session.execute('INSERT INTO download_version (version) VALUES (0)')
+    session.execute('''CREATE OR REPLACE FUNCTION bump_download_version() RETURNS TRIGGER AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM changed_downloads) THEN
+            UPDATE download_version SET version = version + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql''')
+    session.execute('''CREATE TRIGGER download_version_insert AFTER INSERT ON download
+        REFERENCING NEW TABLE AS changed_downloads
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_download_version()''')
+    session.execute('''CREATE TRIGGER download_version_update AFTER UPDATE ON download
+        REFERENCING NEW TABLE AS changed_downloads
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_download_version()''')
+    session.execute('''CREATE TRIGGER download_version_delete AFTER DELETE ON download
+        REFERENCING OLD TABLE AS changed_downloads
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_download_version()''')
+
+    if not DOCKERIZED:
+        session.execute('ALTER TABLE public.download_version OWNER TO wrolpi')
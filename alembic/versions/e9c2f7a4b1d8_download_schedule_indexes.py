@@ -0,0 +1,38 @@
+"""Index the download schedule.
+
+Revision ID: e9c2f7a4b1d8
+Revises: d3a6b8f1c5e2
+Create Date: 2022-07-30 09:12:44.381052
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'e9c2f7a4b1d8'
+down_revision = 'd3a6b8f1c5e2'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    # Recurring downloads which are due are renewed.
+    session.execute('CREATE INDEX download_frequency_next_download_idx ON download(frequency, next_download)')
+    # Finished once-downloads are deleted after a month.
+    session.execute('''CREATE INDEX download_status_last_successful_download_idx
+        ON download(status, last_successful_download) WHERE frequency IS NULL''')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP INDEX IF EXISTS download_frequency_next_download_idx')
+    session.execute('DROP INDEX IF EXISTS download_status_last_successful_download_idx')
@@ -0,0 +1,36 @@
+"""Store the date of the last full catalog of a channel, separate from the date of its last catalog.
+
+Revision ID: f1b9d3a6c8e2
+Revises: e6a4c2f8b7d1
+Create Date: 2022-08-07 15:22:09.815340
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'f1b9d3a6c8e2'
+down_revision = 'e6a4c2f8b7d1'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('ALTER TABLE channel ADD COLUMN full_catalog_date DATE')
+    # Only full catalogs were recorded in info_date.
+    session.execute('UPDATE channel SET full_catalog_date = info_date')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('UPDATE channel SET info_date = full_catalog_date')
+    session.execute('ALTER TABLE channel DROP COLUMN IF EXISTS full_catalog_date')
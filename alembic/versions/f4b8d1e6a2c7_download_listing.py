@@ -0,0 +1,81 @@
+"""Paginate and version the downloads listing.
+
+Revision ID: f4b8d1e6a2c7
+Revises: e9c2f7a4b1d8
+Create Date: 2022-07-31 14:27:03.518946
+
+"""
+import os
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8d1e6a2c7'
+down_revision = 'e9c2f7a4b1d8'
+branch_labels = None
+depends_on = None
+
+DOCKERIZED = True if os.environ.get('DOCKER', '').lower().startswith('t') else False
+
+
+def upgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('''ALTER TABLE download ADD COLUMN status_order INTEGER GENERATED ALWAYS AS (CASE
+        WHEN (status = 'pending') THEN 0
+        WHEN (status = 'failed') THEN 1
+        WHEN (status = 'new') THEN 2
+        WHEN (status = 'resolving') THEN 3
+        WHEN (status = 'deferred') THEN 4
+        WHEN (status = 'complete') THEN 5
+        ELSE 6
+    END) STORED''')
+
+    # The downloads listing is sorted, and paginated, using these indexes.
+    session.execute('''CREATE INDEX download_recurring_order_idx
+        ON download(status_order, COALESCE(next_download, 'infinity'), frequency, id)
+        WHERE frequency IS NOT NULL''')
+    session.execute('''CREATE INDEX download_once_order_idx
+        ON download(status_order, COALESCE(last_successful_download, 'infinity') DESC, id)
+        WHERE frequency IS NULL''')
+
+    # The version is incremented by any statement which changes a download.
+    session.execute('CREATE TABLE download_version (version BIGINT NOT NULL)')
+    session.execute('INSERT INTO download_version (version) VALUES (0)')
+    session.execute('''CREATE OR REPLACE FUNCTION bump_download_version() RETURNS TRIGGER AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM changed_downloads) THEN
+            UPDATE download_version SET version = version + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql''')
+    session.execute('''CREATE TRIGGER download_version_insert AFTER INSERT ON download
+        REFERENCING NEW TABLE AS changed_downloads
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_download_version()''')
+    session.execute('''CREATE TRIGGER download_version_update AFTER UPDATE ON download
+        REFERENCING NEW TABLE AS changed_downloads
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_download_version()''')
+    session.execute('''CREATE TRIGGER download_version_delete AFTER DELETE ON download
+        REFERENCING OLD TABLE AS changed_downloads
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_download_version()''')
+
+    if not DOCKERIZED:
+        session.execute('ALTER TABLE public.download_version OWNER TO wrolpi')
+
+
+def downgrade():
+    bind = op.get_bind()
+    session = Session(bind=bind)
+
+    session.execute('DROP TRIGGER IF EXISTS download_version_insert ON download')
+    session.execute('DROP TRIGGER IF EXISTS download_version_update ON download')
+    session.execute('DROP TRIGGER IF EXISTS download_version_delete ON download')
+    session.execute('DROP FUNCTION IF EXISTS bump_download_version()')
+    session.execute('DROP TABLE IF EXISTS download_version')
+
+    session.execute('DROP INDEX IF EXISTS download_recurring_order_idx')
+    session.execute('DROP INDEX IF EXISTS download_once_order_idx')
+    session.execute('ALTER TABLE download DROP COLUMN IF EXISTS status_order')
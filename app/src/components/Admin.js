@@ -541,6 +541,18 @@ class DownloadRow extends React.Component {
     }
 }
 
+function DownloadProgress({progress}) {
+    const {percent, speed, eta} = progress;
+    let label = `${percent}%`;
+    if (speed) {
+        label = `${label} ${humanFileSize(speed)}/s`;
+    }
+    if (eta !== null && eta !== undefined) {
+        label = `${label} ETA ${Math.floor(eta / 60)}:${String(eta % 60).padStart(2, '0')}`;
+    }
+    return <Progress percent={percent} size='tiny' color='green' label={label}/>;
+}
+
 class StoppableRow extends React.Component {
     constructor(props) {
         super(props);
@@ -583,7 +595,7 @@ class StoppableRow extends React.Component {
     };
 
     render() {
-        let {url, last_successful_download, status, location, error} = this.props;
+        let {url, last_successful_download, status, location, error, progress} = this.props;
         let {stopOpen, startOpen, errorModalOpen} = this.state;
 
         let completedAtCell = last_successful_download ? secondsToDate(last_successful_download) : null;
@@ -591,7 +603,7 @@ class StoppableRow extends React.Component {
         let positive = false;
         let negative = false;
         let warning = false;
-        if (status === 'pending' || status === 'new') {
+        if (status === 'pending' || status === 'new' || status === 'resolving') {
             positive = status === 'pending';
             buttonCell = (
                 <Table.Cell>
@@ -667,7 +679,7 @@ class StoppableRow extends React.Component {
         return (
             <Table.Row positive={positive} negative={negative} warning={warning}>
                 <Table.Cell><a href={url} target='_blank'>{textEllipsis(url, 50)}</a></Table.Cell>
-                <Table.Cell>{status}</Table.Cell>
+                <Table.Cell>{status}{progress && <DownloadProgress progress={progress}/>}</Table.Cell>
                 <Table.Cell>{completedAtCell}</Table.Cell>
                 {buttonCell}
             </Table.Row>
@@ -10,11 +10,12 @@ from sanic import Sanic
 from sanic.signals import Event
 
 from wrolpi import root_api, BEFORE_STARTUP_FUNCTIONS, after_startup, limit_concurrent, admin
-from wrolpi.common import logger, get_config, import_modules, check_media_directory
+from wrolpi.common import logger, get_config, import_modules, check_media_directory, get_media_directory
 from wrolpi.dates import set_timezone
 from wrolpi.downloader import download_manager
 from wrolpi.vars import PROJECT_DIR, DOCKERIZED, PYTEST
 from wrolpi.version import get_version_string
+from wrolpi.watcher import start_media_watcher, stop_media_watcher
 
 logger = logger.getChild('wrolpi-main')
 
@@ -174,8 +175,8 @@ async def set_log_level(args):
 
 @after_startup
 @limit_concurrent(1)
-def periodic_downloads(app: Sanic, loop):
-    """A simple function that perpetually calls downloader_manager.do_downloads() after sleeping."""
+def start_downloads(app: Sanic, loop):
+    """Start the download workers, and the scheduler which queues downloads as they are created or become due."""
     # Set all downloads to new.
     download_manager.reset_downloads()
 
@@ -191,13 +192,21 @@ def periodic_downloads(app: Sanic, loop):
 
     logger.info('Starting download manager.')
 
-    async def _periodic_download():
-        download_manager.start_workers()
-        await download_manager.do_downloads()
-        await asyncio.sleep(60)
-        app.add_task(_periodic_download())  # noqa
+    download_manager.start_workers(loop)
+    download_manager.start_scheduler(loop)
+    # Downloads may be created by any Sanic worker, this process will be notified.
+    download_manager.listen_for_downloads(loop)
 
-    app.add_task(_periodic_download())
+
+@after_startup
+@limit_concurrent(1)
+def watch_media_directory(app: Sanic, loop):
+    """Keep the indexes current by watching the media directory for changes."""
+    config = get_config()
+    if config.wrol_mode or not config.watch_media_directory:
+        return
+
+    start_media_watcher(get_media_directory(), loop)
 
 
 @root_api.api_app.signal(Event.SERVER_SHUTDOWN_BEFORE)
@@ -205,6 +214,7 @@ def handle_server_shutdown(*args, **kwargs):
     """Stop downloads when server is shutting down."""
     if not PYTEST:
         download_manager.stop()
+        stop_media_watcher()
 
 
 if __name__ == '__main__':
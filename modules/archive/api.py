@@ -6,7 +6,7 @@ from sanic_ext import validate
 from sanic_ext.extensions.openapi import openapi
 
 from wrolpi.common import logger, wrol_mode_check, api_param_limiter
-from wrolpi.root_api import get_blueprint, json_response
+from wrolpi.root_api import get_blueprint, json_response, get_bool_arg
 from wrolpi.schema import JSONErrorResponse
 from . import lib, schema
 
@@ -36,9 +36,10 @@ async def delete_archive(_: Request, archive_id: int):
 
 
 @bp.post('/refresh')
+@openapi.description('Find and index all archives.  Only changed archives are indexed, unless `full` is true.')
 @wrol_mode_check
-async def refresh_archives(_: Request):
-    asyncio.ensure_future(lib.refresh_archives())
+async def refresh_archives(request: Request):
+    asyncio.ensure_future(lib.refresh_archives(full=get_bool_arg(request, 'full')))
     return response.empty()
 
 
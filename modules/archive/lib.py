@@ -1,10 +1,12 @@
 import base64
 import gzip
 import json
+import os
 import pathlib
 import re
 import subprocess
 import tempfile
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
 from itertools import groupby
@@ -16,13 +18,15 @@ from selenium import webdriver
 from sqlalchemy.orm import Session
 
 from modules.archive.models import Domain, Archive
+from wrolpi import scan_manifest
 from wrolpi.cmd import which
-from wrolpi.common import get_media_directory, logger, chunks, extract_domain, chdir, escape_file_name, walk, \
-    aiohttp_post
+from wrolpi.common import get_media_directory, logger, chunks, extract_domain, chdir, escape_file_name, \
+    aiohttp_post, walk_entries
 from wrolpi.dates import now, Seconds, local_timezone
 from wrolpi.db import get_db_session, get_db_curs, get_ranked_models, optional_session
 from wrolpi.errors import InvalidDomain, UnknownURL, InvalidArchive
 from wrolpi.vars import DOCKERIZED, PYTEST
+from wrolpi.watcher import watch_handler, delete_paths
 
 logger = logger.getChild(__name__)
 
@@ -48,6 +52,11 @@ class ArchiveFiles:
         screenshot = str(self.screenshot.relative_to(get_archive_directory())) if self.screenshot else None
         return f'<ArchiveFiles {singlefile=} {readability=} {readability_txt=} {readability_json=} {screenshot=}>'
 
+    def paths(self) -> List[pathlib.Path]:
+        """Get all the files of this Archive that exist."""
+        paths = [self.singlefile, self.readability, self.readability_txt, self.readability_json, self.screenshot]
+        return [i for i in paths if i]
+
 
 def get_archive_directory() -> pathlib.Path:
     archive_directory = get_media_directory() / 'archive'
@@ -413,14 +422,15 @@ def migrate_archive_files():
     """
     archive_directory = get_archive_directory()
 
-    def _is_archive_file(path: pathlib.Path) -> bool:
-        return path.is_file() and path.suffix.lower() in ARCHIVE_SUFFIXES and bool(OLD_ARCHIVE_MATCHER.match(path.name))
+    def _is_archive_file(entry: os.DirEntry) -> bool:
+        return pathlib.Path(entry.name).suffix.lower() in ARCHIVE_SUFFIXES \
+               and bool(OLD_ARCHIVE_MATCHER.match(entry.name)) and entry.is_file()
 
     plan = []
 
     # It is safer to plan the renames before we make them.
     for domain_directory in filter(lambda i: i.is_dir(), archive_directory.iterdir()):
-        all_archives_files = filter(_is_archive_file, walk(domain_directory))
+        all_archives_files = (pathlib.Path(i.path) for i in walk_entries(domain_directory) if _is_archive_file(i))
         archive_groups = group_archive_files(all_archives_files)
         for dt, archive_files in archive_groups:
             archive_files: ArchiveFiles
@@ -468,44 +478,64 @@ ARCHIVE_MATCHER = re.compile(r'\d{4}(-\d\d){5}_.*$')
 ARCHIVE_SUFFIXES = {'.txt', '.html', '.json', '.png', '.jpg', '.jpeg'}
 
 
-def is_archive_file(path: pathlib.Path) -> bool:
+def is_archive_file_name(path: pathlib.Path) -> bool:
     """
     Archive files are expected to start with the following: %Y-%m-%d-%H-%M-%S
     they must have one of the following suffixes: .txt, .html, .json, .png, .jpg, .jpeg
     """
-    return path.is_file() and path.suffix.lower() in ARCHIVE_SUFFIXES and bool(ARCHIVE_MATCHER.match(path.name))
+    return path.suffix.lower() in ARCHIVE_SUFFIXES and bool(ARCHIVE_MATCHER.match(path.name))
+
+
+def is_archive_file(path: pathlib.Path) -> bool:
+    """Returns True if the path is an existing archive file.  See `is_archive_file_name`."""
+    return path.is_file() and is_archive_file_name(path)
 
 
-def _refresh_archives():
+def _refresh_archives(full: bool = False):
     """
     Search the Archives directory for archive files, update the database if new files are found.  Remove any orphan
     URLs or Domains.
+
+    Only Archives with files that have changed since the previous refresh will be upserted, unless `full` is True.
     """
     archive_directory = get_archive_directory()
 
     # TODO remove this later when everyone has migrated their files.
     migrate_archive_files()
 
-    singlefile_paths = set()
-    for domain_directory in filter(lambda i: i.is_dir(), archive_directory.iterdir()):
-        logger.debug(f'Refreshing directory: {domain_directory}')
-        all_archives_files = filter(is_archive_file, walk(domain_directory))
-        archive_groups = group_archive_files(all_archives_files)
-        archive_groups = list(archive_groups)
-        archive_count = 0
-        for chunk in chunks(archive_groups, 20):
-            with get_db_session(commit=True) as session:
-                for dt, archive_files in chunk:
-                    archive_count += 1
-                    singlefile_paths.add(str(archive_files.singlefile))
-                    upsert_archive(dt, archive_files, session)
-
-        if archive_count:
-            logger.info(f'Inserted/updated {archive_count} archives in {domain_directory}')
-
-    singlefile_paths = list(singlefile_paths)
-    with get_db_curs(commit=True) as curs:
-        curs.execute('DELETE FROM archive WHERE singlefile_path != ALL(%s)', (singlefile_paths,))
+    result = scan_manifest.scan('archive', archive_directory, full=full)
+
+    if result.changed or full:
+        # Archive files are in the domain directories.
+        domain_files = defaultdict(list)
+        for path in filter(is_archive_file_name, result.paths):
+            relative = path.relative_to(archive_directory)
+            if len(relative.parts) > 1:
+                domain_files[archive_directory / relative.parts[0]].append(path)
+
+        # Only upsert Archives when any of their files have changed.
+        modified = set(result.modified)
+        singlefile_paths = set()
+        for domain_directory, paths in domain_files.items():
+            logger.debug(f'Refreshing directory: {domain_directory}')
+            archive_groups = list(group_archive_files(paths))
+            archive_count = 0
+            for chunk in chunks(archive_groups, 20):
+                with get_db_session(commit=True) as session:
+                    for dt, archive_files in chunk:
+                        singlefile_paths.add(str(archive_files.singlefile))
+                        if full or result.first_scan or modified.intersection(archive_files.paths()):
+                            archive_count += 1
+                            upsert_archive(dt, archive_files, session)
+
+            if archive_count:
+                logger.info(f'Inserted/updated {archive_count} archives in {domain_directory}')
+
+        singlefile_paths = list(singlefile_paths)
+        with get_db_curs(commit=True) as curs:
+            curs.execute('DELETE FROM archive WHERE singlefile_path != ALL(%s)', (singlefile_paths,))
+
+    result.save()
 
     with get_db_curs(commit=True) as curs:
         stmt = '''
@@ -528,8 +558,37 @@ def _refresh_archives():
                 archive.contents = fh.read()
 
 
-async def refresh_archives():
-    _refresh_archives()
+@watch_handler
+def archive_watch_handler(created: List[pathlib.Path], deleted: List[pathlib.Path]):
+    """Upsert any Archives whose files were created, delete any Archives whose singlefile was deleted."""
+    archive_directory = get_archive_directory()
+    created = [i for i in created if archive_directory in i.parents and is_archive_file_name(i)]
+
+    # Gather the other files of the created Archive files, they share a datetime prefix.
+    archive_paths = set()
+    for directory, prefix in {(i.parent, i.name[:19]) for i in created}:
+        try:
+            with os.scandir(directory) as entries:
+                archive_paths |= {pathlib.Path(i.path) for i in entries if i.name.startswith(prefix)}
+        except FileNotFoundError:
+            continue
+
+    archive_paths = filter(is_archive_file_name, archive_paths)
+    with get_db_session(commit=True) as session:
+        for dt, archive_files in group_archive_files(archive_paths):
+            try:
+                upsert_archive(dt, archive_files, session)
+            except InvalidArchive as e:
+                logger.warning(f'Unable to upsert {archive_files}', exc_info=e)
+
+    if deleted:
+        with get_db_curs(commit=True) as curs:
+            delete_paths(curs, 'archive', 'singlefile_path', deleted)
+            curs.execute('DELETE FROM domains WHERE id NOT IN (SELECT DISTINCT domain_id FROM archive)')
+
+
+async def refresh_archives(full: bool = False):
+    _refresh_archives(full=full)
 
 
 def upsert_archive(dt: str, archive_files: ArchiveFiles, session: Session):
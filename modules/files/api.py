@@ -8,7 +8,7 @@ from sanic_ext.extensions.openapi import openapi
 
 from wrolpi.common import get_media_directory, api_param_limiter
 from wrolpi.errors import InvalidFile
-from wrolpi.root_api import get_blueprint, json_response
+from wrolpi.root_api import get_blueprint, json_response, get_bool_arg
 from . import lib, schema
 
 bp = get_blueprint('Files', '/api/files')
@@ -74,9 +74,9 @@ files_offset_limiter = api_param_limiter(100, 0)
 
 
 @bp.post('/refresh')
-@openapi.description('Find and index all files')
-async def refresh(_: Request):
-    lib.refresh_files()
+@openapi.description('Find and index all files.  Only changed files are indexed, unless `full` is true.')
+async def refresh(request: Request):
+    lib.refresh_files(full=get_bool_arg(request, 'full'))
     return response.empty()
 
 
@@ -1,21 +1,24 @@
 import asyncio
+import io
+import mimetypes
 import re
 import subprocess
 from functools import wraps
 from pathlib import Path
-from typing import List
-from uuid import uuid4
+from typing import List, Dict, Optional, Iterable, Generator
 
 import psycopg2
 from sqlalchemy.orm import Session
 
 from modules.files.models import File
 from wrolpi.cmd import which
-from wrolpi.common import get_media_directory, wrol_mode_check, walk, chunks, logger
+from wrolpi import scan_manifest
+from wrolpi.common import get_media_directory, wrol_mode_check, chunks, logger
 from wrolpi.dates import from_timestamp
 from wrolpi.db import get_db_session, get_db_curs, get_ranked_models
 from wrolpi.errors import InvalidFile
 from wrolpi.vars import PYTEST
+from wrolpi.watcher import watch_handler, delete_paths
 
 logger = logger.getChild(__name__)
 
@@ -94,8 +97,118 @@ def split_file_name(path: Path) -> List[str]:
 FILE_BIN = which('file', '/usr/bin/file')
 
 
+# The first bytes of a file, and the mimetype that `file` would report.
+MAGIC_MIMETYPES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'BZh', 'application/x-bzip2'),
+    (b'\xfd7zXZ\x00', 'application/x-xz'),
+    (b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (b'OggS', 'audio/ogg'),
+    (b'fLaC', 'audio/flac'),
+    (b'ID3', 'audio/mpeg'),
+    (b'FLV', 'video/x-flv'),
+    (b'SQLite format 3\x00', 'application/vnd.sqlite3'),
+    (b'\x7fELF', 'application/x-executable'),
+)
+# The major brand of an ISO media file (mp4, etc.).
+FTYP_MIMETYPES = {
+    b'isom': 'video/mp4', b'iso2': 'video/mp4', b'mp41': 'video/mp4', b'mp42': 'video/mp4', b'avc1': 'video/mp4',
+    b'dash': 'video/mp4', b'M4V ': 'video/x-m4v', b'M4A ': 'audio/x-m4a', b'qt  ': 'video/quicktime',
+    b'3gp4': 'video/3gpp', b'3gp5': 'video/3gpp',
+}
+# The number of bytes that are read to detect a mimetype.
+MAGIC_SIZE = 4096
+
+
+def detect_mimetype(path: Path) -> Optional[str]:
+    """Detect a file's mimetype from its first bytes, without spawning a process.  Returns None if the mimetype
+    could not be detected, `file` should be used for these files."""
+    try:
+        with path.open('rb') as fh:
+            head = fh.read(MAGIC_SIZE)
+    except OSError:
+        return None
+
+    if not head:
+        return 'inode/x-empty'
+
+    for magic, mimetype in MAGIC_MIMETYPES:
+        if head.startswith(magic):
+            return mimetype
+
+    if head[4:8] == b'ftyp':
+        return FTYP_MIMETYPES.get(head[8:12])
+    if head.startswith(b'RIFF'):
+        return {b'WEBP': 'image/webp', b'WAVE': 'audio/x-wav', b'AVI ': 'video/x-msvideo'}.get(head[8:12])
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        # Matroska, the DocType is near the start.
+        if b'webm' in head[:64]:
+            return 'video/webm'
+        if b'matroska' in head[:64]:
+            return 'video/x-matroska'
+        return None
+
+    if b'\x00' in head:
+        # Binary data which was not recognized.
+        return None
+
+    try:
+        # The last character may have been cut off.
+        text = head.decode('utf-8') if len(head) < MAGIC_SIZE else head[:-3].decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+    # The suffix of a text file is more specific than "text/plain" (csv, python, etc.).
+    mimetype, _ = mimetypes.guess_type(path.name)
+    if mimetype and mimetype.startswith('text/') and mimetype != 'text/plain':
+        return mimetype
+
+    start = text.lstrip()[:100].lower()
+    if start.startswith('<!doctype html') or start.startswith('<html'):
+        return 'text/html'
+    if start.startswith('<?xml'):
+        return 'text/xml'
+    if start.startswith('webvtt'):
+        return 'text/vtt'
+    if start.startswith('#!'):
+        # `file` knows which interpreter this is.
+        return None
+    if path.suffix.lower() == '.json' and start[:1] in ('{', '['):
+        return 'application/json'
+    return 'text/plain'
+
+
+def get_mimetypes(paths: List[Path]) -> Dict[Path, str]:
+    """Get the mimetypes of many files.  Only files that cannot be detected are passed to `file`, all in one call."""
+    path_mimetypes = {i: detect_mimetype(i) for i in paths}
+
+    # `file -f` reads one path per line.
+    unknown = [i for i, j in path_mimetypes.items() if not j and '\n' not in str(i)]
+    if unknown:
+        cmd = (FILE_BIN, '--mime-type', '--separator', '\t', '--files-from', '-')
+        stdin = ''.join(f'{i.absolute()}\n' for i in unknown).encode()
+        output = subprocess.run(cmd, input=stdin, stdout=subprocess.PIPE, check=True).stdout.decode()
+        file_mimetypes = dict(line.rpartition('\t')[::2] for line in output.splitlines())
+        for path in unknown:
+            mimetype = file_mimetypes.get(str(path.absolute()), '').strip()
+            # `file` reports errors (i.e. "cannot open") in place of the mimetype.
+            path_mimetypes[path] = mimetype if '/' in mimetype and ' ' not in mimetype else None
+
+    for path in (i for i, j in path_mimetypes.items() if not j):
+        path_mimetypes[path] = get_mimetype(path)
+    return path_mimetypes
+
+
 def get_mimetype(path: Path) -> str:
-    """Get the mimetype using the builtin `file` command."""
+    """Get the mimetype of a file from its contents, or by using the builtin `file` command."""
+    if mimetype := detect_mimetype(path):
+        return mimetype
+
     cmd = (FILE_BIN, '--mime-type', str(path.absolute()))
     output = subprocess.check_output(cmd)
     output = output.decode()
@@ -103,54 +216,141 @@ def get_mimetype(path: Path) -> str:
     return mimetype
 
 
-def upsert_file(path: Path, session: Session) -> File:
-    """Update/insert a File in the DB.  Gather metadata about it."""
+def upsert_file(path: Path, session: Session, mimetype: str = None) -> File:
+    """Update/insert a File in the DB.  Gather metadata about it.
+
+    The mimetype will be detected if it is not provided."""
     file = session.query(File).filter_by(path=path).one_or_none()
     if not file:
         file = File(path=path)
         session.add(file)
-    if not file.mimetype:
+    if mimetype:
+        file.mimetype = mimetype
+    elif not file.mimetype:
         file.mimetype = get_mimetype(path)
     if not file.title:
-        file.title = split_file_name(path)
-    if not file.size or not file.modification_datetime:
-        stat = path.stat()
-        file.size = stat.st_size
-        file.modification_datetime = file.modification_datetime or from_timestamp(stat.st_mtime)
+        file.title = ' '.join(split_file_name(path))
+    # The file may have changed since it was last upserted.
+    stat = path.stat()
+    file.size = stat.st_size
+    file.modification_datetime = from_timestamp(stat.st_mtime)
 
     return file
 
 
-def _refresh_files():
-    """Find and index all files"""
-    logger.info('Refreshing Files')
-    # Mark all files as unverified.  Any records that are unverified after refresh will be deleted.
+def get_file_rows(paths: Iterable[Path]) -> Generator[tuple, None, None]:
+    """Gather the (path, size, modification_datetime, mimetype, title) of each file that still exists."""
+    for chunk in chunks(paths, 100):
+        stats = dict()
+        for path in chunk:
+            try:
+                stats[path] = path.stat()
+            except FileNotFoundError:
+                # File was deleted after it was found.
+                pass
+        path_mimetypes = get_mimetypes(list(stats))
+        for path, stat in stats.items():
+            title = ' '.join(split_file_name(path))
+            yield str(path), stat.st_size, from_timestamp(stat.st_mtime).isoformat(), path_mimetypes[path], title
+
+
+def copy_value(value) -> str:
+    """Format a value for Postgres' COPY text format."""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def bulk_upsert_files(paths: Iterable[Path], delete_missing: bool = False) -> int:
+    """Insert/update many files.  The files are copied into a temporary table, then merged into the file table using
+    one statement.
+
+    If `delete_missing` is True, all Files not in `paths` will be deleted.
+
+    Returns the count of files that were upserted."""
+    count = 0
+    with get_db_session(commit=True) as session:
+        # Use the Session's connection so any pending changes of the Session will be used.
+        session.flush()
+        curs = session.connection().connection.cursor()
+        curs.execute('''
+            CREATE TEMPORARY TABLE file_staging (
+                path TEXT,
+                size BIGINT,
+                modification_datetime TIMESTAMPTZ,
+                mimetype TEXT,
+                title TEXT
+            ) ON COMMIT DROP
+        ''')
+        # Stream the rows into the table, only a chunk is in memory at a time.
+        for rows in chunks(get_file_rows(paths), 1000):
+            buffer = io.StringIO(''.join('\t'.join(map(copy_value, i)) + '\n' for i in rows))
+            curs.copy_expert('COPY file_staging (path, size, modification_datetime, mimetype, title) FROM STDIN',
+                             buffer)
+            count += len(rows)
+
+        curs.execute('''
+            INSERT INTO file (path, size, modification_datetime, mimetype, title)
+            SELECT DISTINCT ON (path) path, size, modification_datetime, mimetype, title
+            FROM file_staging
+            ON CONFLICT (path) DO UPDATE SET
+                size = EXCLUDED.size,
+                modification_datetime = EXCLUDED.modification_datetime,
+                mimetype = EXCLUDED.mimetype,
+                title = EXCLUDED.title
+        ''')
+        if delete_missing:
+            curs.execute('''
+                DELETE FROM file
+                WHERE NOT EXISTS (SELECT 1 FROM file_staging s WHERE s.path = file.path)
+            ''')
+
+    return count
+
+
+def delete_files(paths: List[Path]):
+    """Delete the Files of the provided paths.  A path may be a directory, all Files in it will be deleted."""
+    if not paths:
+        return
+
     with get_db_curs(commit=True) as curs:
-        curs.execute('UPDATE file SET idempotency=null')  # noqa
+        delete_paths(curs, 'file', 'path', paths)
 
-    paths = filter(lambda i: i.is_file(), walk(get_media_directory()))
-    idempotency = str(uuid4())
-    for chunk in chunks(paths, 20):
-        with get_db_session(commit=True) as session:
-            for path in chunk:
-                file = upsert_file(path, session)
-                file.idempotency = idempotency
 
-    # Remove any records where the file no longer exists.
-    with get_db_curs(commit=True) as curs:
-        curs.execute('DELETE FROM file WHERE idempotency IS NULL')
+def _refresh_files(full: bool = False):
+    """Find and index all files.
+
+    Only files which have changed since the previous refresh will be upserted, unless `full` is True."""
+    logger.info('Refreshing Files')
+    result = scan_manifest.scan('files', get_media_directory(), full=full)
+
+    if result.first_scan or full:
+        # The DB may contain files that were never scanned, replace all Files.
+        bulk_upsert_files(result.paths, delete_missing=True)
+    else:
+        # The contents of a modified file may have changed, so its mimetype may have also changed.
+        bulk_upsert_files(result.modified)
+        delete_files(result.deleted)
+
+    result.save()
+    logger.info(f'Done refreshing Files.  {len(result.modified)} modified, {len(result.deleted)} deleted')
+
 
-    logger.info('Done refreshing Files')
+@watch_handler
+def files_watch_handler(created: List[Path], deleted: List[Path]):
+    """Index the files that were created in the media directory, remove files that were deleted."""
+    bulk_upsert_files(created)
+    delete_files(deleted)
 
 
 @wraps(_refresh_files)
-def refresh_files():
+def refresh_files(full: bool = False):
     """Schedule a refresh task if not testing.  If testing, do a synchronous refresh."""
     if PYTEST:
-        return _refresh_files()
+        return _refresh_files(full=full)
 
     async def _():
-        return _refresh_files()
+        return _refresh_files(full=full)
 
     asyncio.create_task(_())
 
@@ -164,6 +364,7 @@ def search(search_str: str, limit: int, offset: int):
             SELECT id, ts_rank_cd(textsearch, websearch_to_tsquery(%(search_str)s)), COUNT(*) OVER() AS total
             FROM file
             WHERE textsearch @@ websearch_to_tsquery(%(search_str)s)
+            ORDER BY 2 DESC, path
             OFFSET %(offset)s LIMIT %(limit)s
         '''
         params = dict(search_str=search_str, offset=offset, limit=limit)
@@ -9,7 +9,7 @@ from wrolpi.media_path import MediaPathType
 class File(ModelHelper, Base):
     __tablename__ = 'file'
     id = Column(Integer, primary_key=True)
-    path = Column(MediaPathType)
+    path = Column(MediaPathType, unique=True)
 
     idempotency = Column(String)
     mimetype = Column(String)
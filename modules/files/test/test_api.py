@@ -151,9 +151,25 @@ def test_files_search(test_session, test_client, make_files_structure):
 
     do_search(test_client, 'foo', 1, [dict(path='foo_is_the_name.txt', mimetype='text/plain', size=12)])
     do_search(test_client, 'bar', 1, [dict(path='archives/bar.txt', mimetype='text/plain', size=16)])
+    # "baz" is in the title of "baz baz two.mp4" twice, it is ranked higher.
     do_search(test_client, 'baz', 2, [
-        dict(path='baz.mp4', mimetype='video/mp4', size=1055736),
         dict(path='baz baz two.mp4', mimetype='video/mp4', size=1055736),
+        dict(path='baz.mp4', mimetype='video/mp4', size=1055736),
     ])
     do_search(test_client, 'two', 1, [dict(path='baz baz two.mp4', mimetype='video/mp4', size=1055736)])
     do_search(test_client, 'nothing', 0, [])
+
+
+def test_files_refresh_full(test_session, test_client):
+    with mock.patch('modules.files.lib._refresh_files') as mock_refresh_files:
+        request, response = test_client.post('/api/files/refresh')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        mock_refresh_files.assert_called_once_with(full=False)
+
+        mock_refresh_files.reset_mock()
+        request, response = test_client.post('/api/files/refresh?full=true')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        mock_refresh_files.assert_called_once_with(full=True)
+
+        request, response = test_client.post('/api/files/refresh?full=maybe')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
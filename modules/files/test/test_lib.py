@@ -1,6 +1,8 @@
 import shutil
+import subprocess
 from pathlib import Path
 from typing import List, Iterable
+from unittest import mock
 
 import pytest
 from sqlalchemy.orm import Session
@@ -179,6 +181,32 @@ def test_refresh_files(test_session, make_files_structure, test_directory):
     assert get_relative_strs(results) == []
 
 
+def test_bulk_upsert_files(test_session, make_files_structure, test_directory):
+    """Files are copied into the DB in bulk, special characters must be escaped."""
+    foo, bar, baz = make_files_structure([
+        'foo.txt',
+        'back\\slash.txt',
+        'tab\tname.txt',
+    ])
+    assert lib.bulk_upsert_files([foo, bar, baz]) == 3
+    assert_files(test_session, ['foo.txt', 'back\\slash.txt', 'tab\tname.txt'])
+    foo_file = test_session.query(File).filter_by(path=foo).one()
+    assert foo_file.title == 'foo'
+    assert foo_file.size == 0
+
+    # Existing files are updated, not duplicated.
+    foo.write_text('foo')
+    assert lib.bulk_upsert_files([foo]) == 1
+    test_session.expire_all()
+    assert test_session.query(File).count() == 3
+    assert test_session.query(File).filter_by(path=foo).one().size == 3
+
+    # Missing files are deleted, files which no longer exist are ignored.
+    baz.unlink()
+    assert lib.bulk_upsert_files([foo, baz], delete_missing=True) == 1
+    assert_files(test_session, ['foo.txt'])
+
+
 def test_mime_type(test_session, make_files_structure, test_directory):
     """Files module uses the `file` command to get the mimetype of each file."""
     from PIL import Image
@@ -205,3 +233,43 @@ def test_mime_type(test_session, make_files_structure, test_directory):
     assert bar.mimetype == 'image/jpeg'
     assert baz.mimetype == 'video/mp4'
     assert empty.mimetype == 'inode/x-empty'
+
+
+def test_get_mimetypes(test_directory):
+    """Mimetypes are detected without `file`, unless the file cannot be detected."""
+    from PIL import Image
+
+    text, csv, html, empty, image, video, binary1, binary2 = paths = [
+        test_directory / 'text.txt',
+        test_directory / 'data.csv',
+        test_directory / 'page.html',
+        test_directory / 'empty',
+        test_directory / 'image.jpeg',
+        test_directory / 'video.mp4',
+        test_directory / 'binary1',
+        test_directory / 'binary2',
+    ]
+    text.write_text('some text')
+    csv.write_text('a,b\n1,2\n')
+    html.write_text('<!DOCTYPE html><html></html>')
+    empty.touch()
+    Image.new('RGB', (25, 25), color='grey').save(image)
+    shutil.copy(PROJECT_DIR / 'test/big_buck_bunny_720p_1mb.mp4', video)
+    binary1.write_bytes(b'\x00\x01\x02')
+    binary2.write_bytes(b'\x00\x01\x02')
+
+    with mock.patch('modules.files.lib.subprocess.run', wraps=subprocess.run) as mock_run:
+        mimetypes = lib.get_mimetypes(paths)
+        # `file` is called once for all unknown files.
+        mock_run.assert_called_once()
+
+    assert mimetypes == {
+        text: 'text/plain',
+        csv: 'text/csv',
+        html: 'text/html',
+        empty: 'inode/x-empty',
+        image: 'image/jpeg',
+        video: 'video/mp4',
+        binary1: 'application/octet-stream',
+        binary2: 'application/octet-stream',
+    }
@@ -1,4 +1,5 @@
 import asyncio
+import os
 import subprocess
 from multiprocessing import Event, Manager
 from pathlib import Path
@@ -8,7 +9,7 @@ from sqlalchemy.orm import Session
 
 from modules.map.models import MapFile
 from wrolpi.cmd import which
-from wrolpi.common import get_media_directory, walk, logger, wrol_mode_check
+from wrolpi.common import get_media_directory, walk_entries, logger, wrol_mode_check
 from wrolpi.dates import now, timedelta_to_timestamp
 from wrolpi.db import optional_session, get_db_session
 from wrolpi.vars import PYTEST, PROJECT_DIR
@@ -52,17 +53,16 @@ def is_dump_file(path: Path) -> bool:
 def get_map_paths() -> List[Path]:
     """Find all pbf/dump files in the map directory."""
     map_directory = get_map_directory()
-    paths = walk(map_directory)
-
-    def is_valid(path: Path) -> bool:
-        if path.is_file():
-            if str(path).endswith('.osm.pbf') and is_pbf_file(path):
-                return True
-            elif path.suffix == '.dump' and is_dump_file(path):
-                return True
+
+    def is_valid(entry: os.DirEntry) -> bool:
+        # Check the name before asking the file system, or the `file` command.
+        if entry.name.endswith('.osm.pbf') and entry.is_file():
+            return is_pbf_file(Path(entry.path))
+        elif entry.name.endswith('.dump') and entry.is_file():
+            return is_dump_file(Path(entry.path))
         return False
 
-    return list(filter(is_valid, paths))
+    return [Path(i.path) for i in walk_entries(map_directory) if is_valid(i)]
 
 
 def get_or_create_map_file(pbf_path: Path, session: Session) -> MapFile:
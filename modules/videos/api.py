@@ -8,11 +8,14 @@ from sanic.request import Request
 from sanic_ext import validate
 from sanic_ext.extensions.openapi import openapi
 
+from wrolpi import after_startup, limit_concurrent
 from wrolpi.common import create_websocket_feed, get_sanic_url, \
-    wrol_mode_check
+    wrol_mode_check, wrol_mode_enabled
 from wrolpi.common import logger
-from wrolpi.root_api import add_blueprint, json_response
+from wrolpi.db import get_db_curs
+from wrolpi.root_api import add_blueprint, json_response, get_bool_arg
 from wrolpi.schema import JSONErrorResponse
+from wrolpi.vars import PYTEST
 from . import lib, schema
 from .channel import lib as channel_lib
 from .channel.api import channel_bp
@@ -34,12 +37,14 @@ refresh_queue, refresh_event = create_websocket_feed('refresh', '/feeds/refresh'
 
 @content_bp.post('/refresh')
 @content_bp.post('/refresh/<channel_id:str>')
-@openapi.description('Search for videos that have previously been downloaded and stored.')
+@openapi.description('Search for videos that have previously been downloaded and stored.  Only changed directories'
+                     ' are searched, unless `full` is true.')
 @openapi.response(HTTPStatus.OK, schema.StreamResponse)
 @openapi.response(HTTPStatus.BAD_REQUEST, JSONErrorResponse)
 @wrol_mode_check
-async def refresh(_, channel_id: int = None):
+async def refresh(request: Request, channel_id: int = None):
     refresh_logger = logger.getChild('refresh')
+    full = get_bool_arg(request, 'full')
     stream_url = get_sanic_url(scheme='ws', path='/api/videos/feeds/refresh')
 
     # Only one refresh can run at a time
@@ -53,7 +58,7 @@ async def refresh(_, channel_id: int = None):
             refresh_logger.info('refresh started')
 
             channel_ids = [channel_id] if channel_id else None
-            await refresh_videos(channel_ids)
+            await refresh_videos(channel_ids, full=full)
 
             refresh_logger.info('refresh complete')
         except Exception:
@@ -78,8 +83,41 @@ def download(_, channel_id: int = None):
 
 
 @wraps(lib.refresh_videos)
-async def refresh_videos(channel_ids: List[int] = None):
-    return lib.refresh_videos(channel_ids=channel_ids)
+async def refresh_videos(channel_ids: List[int] = None, full: bool = False):
+    return lib.refresh_videos(channel_ids=channel_ids, progress_queue=refresh_queue, full=full)
+
+
+@after_startup
+@limit_concurrent(1)
+async def resume_validate_videos(app, loop):
+    """Continue validating any Videos that were not validated before the server was stopped."""
+    if PYTEST or wrol_mode_enabled():
+        return
+
+    with get_db_curs() as curs:
+        curs.execute('SELECT EXISTS (SELECT 1 FROM video WHERE video_path IS NOT NULL AND validated IS FALSE'
+                     ' AND validation_failed IS NOT TRUE)')
+        unvalidated = curs.fetchone()[0]
+
+    if unvalidated:
+        logger.warning('Resuming validation of videos')
+        loop.run_in_executor(None, lib.validate_videos)
+
+
+@after_startup
+@limit_concurrent(1)
+async def resume_fill_minimized_info_json(app, loop):
+    """Store the info json of any Videos that were validated before the info json was stored in the DB."""
+    if PYTEST or wrol_mode_enabled():
+        return
+
+    with get_db_curs() as curs:
+        curs.execute('SELECT EXISTS (SELECT 1 FROM video WHERE info_json_path IS NOT NULL'
+                     ' AND minimized_info_json IS NULL)')
+        unfilled = curs.fetchone()[0]
+
+    if unfilled:
+        loop.run_in_executor(None, lib.fill_minimized_info_json)
 
 
 @content_bp.post('/favorite')
@@ -198,4 +198,5 @@ def download_channel(id_: int):
     if not download:
         raise InvalidDownload(f'Channel {channel.name} does not have a download!')
     download.renew(reset_attempts=True)
+    download_manager.notify_downloads(session)
     session.commit()
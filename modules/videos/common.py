@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import pathlib
@@ -14,12 +15,12 @@ from sqlalchemy.orm import Session
 
 from wrolpi.cmd import which
 from wrolpi.common import logger, iterify, get_media_directory, \
-    minimize_dict, any_extensions
+    minimize_dict, any_extensions, walk_entries
 from wrolpi.db import get_db_session, get_db_curs
 from wrolpi.errors import UnknownFile, ChannelNameConflict, ChannelURLConflict, \
     ChannelDirectoryConflict, ChannelSourceIdConflict
 from wrolpi.media_path import MediaPath
-from wrolpi.vars import DEFAULT_FILE_PERMISSIONS
+from wrolpi.vars import DEFAULT_FILE_PERMISSIONS, PYTEST, CACHE_DIR
 from .models import Channel, Video
 
 logger = logger.getChild(__name__)
@@ -73,14 +74,11 @@ match_video_extensions = partial(any_extensions, extensions=VIDEO_EXTENSIONS)
 
 def generate_video_paths(directory: Union[str, pathlib.Path]) -> Tuple[str, pathlib.Path]:
     """Generate a list of video paths in the provided directory."""
-    directory = pathlib.Path(directory)
+    directory = pathlib.Path(directory).absolute()
 
-    for child in directory.iterdir():
-        if child.is_file() and match_video_extensions(child.name):
-            child = child.absolute()
-            yield child
-        elif child.is_dir():
-            yield from generate_video_paths(child)
+    for entry in walk_entries(directory):
+        if match_video_extensions(entry.name) and entry.is_file():
+            yield pathlib.Path(entry.path)
 
 
 @iterify(set)
@@ -237,31 +235,37 @@ def is_valid_poster(poster_path: Path) -> bool:
 FFPROBE_BIN = which('ffprobe', '/usr/bin/ffprobe', warn=True)
 
 
-def get_video_duration(video_path: Path) -> Optional[int]:
-    """Get the duration of a video in seconds.  Do this using ffprobe."""
-    if not isinstance(video_path, Path):
-        video_path = Path(video_path)
-    if not video_path.is_file():
-        raise FileNotFoundError(f'{video_path} does not exist!')
-    if not FFPROBE_BIN:
-        raise SystemError('ffprobe is not installed!')
+def ffprobe_video(video_path: Path) -> dict:
+    """Run ffprobe on a video file.  Returns the parsed format/streams, any errors, and the ffprobe return code."""
+    cmd = [FFPROBE_BIN, '-v', 'error', '-show_format', '-show_streams', '-of', 'json', str(video_path)]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        probe = json.loads(proc.stdout.decode()) if proc.stdout else dict()
+    except json.JSONDecodeError:
+        probe = dict()
+    return dict(
+        probe=probe,
+        returncode=proc.returncode,
+        stderr=proc.stderr.decode(errors='replace'),
+    )
 
-    cmd = [FFPROBE_BIN, '-v', 'error', '-show_entries', 'format=duration', '-of',
-           'default=noprint_wrappers=1:nokey=1', str(video_path)]
 
-    try:
-        proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
-        logger.warning(f'FFPROBE failed to get duration with stdout: {e.stdout.decode()}')
-        logger.warning(f'FFPROBE failed to get duration with stderr: {e.stderr.decode()}')
-        raise
-    stdout = proc.stdout.decode()
-    duration = int(Decimal(stdout.strip()))
-    return duration
+def get_probe_cache_directory() -> Path:
+    directory = (get_media_directory() / '.cache' if PYTEST else CACHE_DIR) / 'ffprobe'
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
 
 
-def check_for_video_corruption(video_path: Path) -> bool:
-    """Uses ffprobe to check for specific ways a video file can be corrupt."""
+def get_probe_cache_file(video_path: Path) -> Path:
+    return get_probe_cache_directory() / f'{hashlib.sha1(str(video_path).encode()).hexdigest()}.json'
+
+
+def get_video_probe(video_path: Path) -> dict:
+    """Get the ffprobe results of a video file.
+
+    ffprobe is only run once for a video file, the results are cached until the video file's size or modification
+    time change.
+    """
     if not isinstance(video_path, Path):
         video_path = Path(video_path)
     if not video_path.is_file():
@@ -269,64 +273,122 @@ def check_for_video_corruption(video_path: Path) -> bool:
     if not FFPROBE_BIN:
         raise SystemError('ffprobe is not installed!')
 
-    cmd = [FFPROBE_BIN, str(video_path)]
+    stat = video_path.stat()
+    key = dict(path=str(video_path), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    cache_file = get_probe_cache_file(video_path)
     try:
-        proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
-        logger.warning(f'FFPROBE failed to check for corruption with stdout: {e.stdout.decode()}')
-        logger.warning(f'FFPROBE failed to check for corruption with stderr: {e.stderr.decode()}')
+        cached = json.loads(cache_file.read_text())
+        if all(cached.get(k) == v for k, v in key.items()):
+            return cached
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    result = ffprobe_video(video_path)
+    result.update(key)
+    try:
+        # Write then rename so a partial cache file is never read.
+        with tempfile.NamedTemporaryFile('wt', dir=cache_file.parent, suffix='.tmp', delete=False) as fh:
+            fh.write(json.dumps(result))
+        os.rename(fh.name, cache_file)
+    except OSError as e:
+        logger.warning(f'Failed to cache ffprobe of {video_path}', exc_info=e)
+    return result
+
+
+def evict_video_probe(video_path: Path):
+    """Remove the cached ffprobe results of a video file."""
+    get_probe_cache_file(video_path).unlink(missing_ok=True)
+
+
+def get_video_duration(video_path: Path) -> Optional[int]:
+    """Get the duration of a video in seconds.  Do this using ffprobe."""
+    result = get_video_probe(video_path)
+    if result['returncode'] != 0:
+        logger.warning(f'FFPROBE failed to get duration with stderr: {result["stderr"]}')
+        raise subprocess.CalledProcessError(result['returncode'], FFPROBE_BIN, stderr=result['stderr'])
+
+    duration = result['probe'].get('format', dict()).get('duration')
+    return int(Decimal(duration)) if duration else None
+
+
+def get_video_info(video_path: Path) -> dict:
+    """Get the duration, bitrate, codecs and resolution of a video file using ffprobe."""
+    probe = get_video_probe(video_path)['probe']
+    format_ = probe.get('format', dict())
+    streams = probe.get('streams', list())
+    video_stream = next((i for i in streams if i.get('codec_type') == 'video'), dict())
+    audio_stream = next((i for i in streams if i.get('codec_type') == 'audio'), dict())
+    duration, bit_rate = format_.get('duration'), format_.get('bit_rate')
+    return dict(audio_codec=audio_stream.get('codec_name'), bit_rate=int(bit_rate) if bit_rate else None,
+                duration=int(Decimal(duration)) if duration else None, format_name=format_.get('format_name'),
+                height=video_stream.get('height'), video_codec=video_stream.get('codec_name'),
+                width=video_stream.get('width'))
+
+
+def check_for_video_corruption(video_path: Path) -> bool:
+    """Uses ffprobe to check for specific ways a video file can be corrupt."""
+    result = get_video_probe(video_path)
+    if result['returncode'] != 0:
+        logger.warning(f'FFPROBE failed to check for corruption with stderr: {result["stderr"]}')
         return True  # video is corrupt.
 
     messages = (
-        b'Invalid NAL unit size',
-        b'Error splitting the input into NAL units',
+        'Invalid NAL unit size',
+        'Error splitting the input into NAL units',
     )
     corrupt = False
     for error in messages:
-        if error in proc.stderr:
-            logger.warning(f'Possible video corruption ({error.decode()}): {video_path}')
+        if error in result['stderr']:
+            logger.warning(f'Possible video corruption ({error}): {video_path}')
             corrupt = True
     return corrupt
 
 
 def apply_info_json(channel_id: int):
-    """Update view_count for all Videos in a channel using its info_json file.
+    """Update view_count for all Videos in a channel using its catalog.
 
-    Mark any videos not in the info_json as "censored".
+    Mark any videos not in the catalog as "censored".
     """
     with get_db_session() as session:
         channel = session.query(Channel).filter_by(id=channel_id).one()
         channel_name = channel.name
-        info = channel.info_json
+        # Videos can only be censored using a full catalog.
+        full_catalog_date = channel.full_catalog_date
 
-    if not info:
-        logger.info(f'No info_json for channel {channel.name}')
+    if not full_catalog_date:
+        logger.info(f'No catalog for channel {channel_name}')
         return
 
-    view_counts = [{'id': i['id'], 'view_count': i['view_count']} for i in info['entries']]
-    view_counts_str = json.dumps(view_counts)
-
     with get_db_curs(commit=True) as curs:
-        # Update the view_count for each video.
+        # Update the view_count of each video which has changed.
         stmt = '''
-            WITH source AS (select * from json_to_recordset(%s::json) as (id text, view_count int))
             UPDATE video
-            SET view_count = s.view_count
-            FROM source as s
-            WHERE source_id=s.id AND channel_id=%s
+            SET view_count = e.view_count
+            FROM channel_entry AS e
+            WHERE
+                e.channel_id = %(channel_id)s
+                AND video.channel_id = %(channel_id)s
+                AND video.source_id = e.source_id
+                AND video.view_count IS DISTINCT FROM e.view_count
             RETURNING video.id AS updated_ids
         '''
-        curs.execute(stmt, (view_counts_str, channel_id))
+        curs.execute(stmt, dict(channel_id=channel_id))
         count = len(curs.fetchall())
         logger.debug(f'Updated {count} view counts in DB for {channel_name}.')
 
-        # Mark any video not in the info_json entries as censored.
-        source_ids = [i['id'] for i in info['entries']]
+        # Mark any video not in the catalog as censored.
         stmt = '''
-            UPDATE video SET censored=(source_id != ALL(%s))
-            WHERE channel_id=%s
+            UPDATE video
+            SET censored = c.censored
+            FROM (
+                SELECT v.id, (v.source_id IS NOT NULL AND e.source_id IS NULL) AS censored
+                FROM video AS v
+                    LEFT JOIN channel_entry AS e ON e.channel_id = v.channel_id AND e.source_id = v.source_id
+                WHERE v.channel_id = %(channel_id)s
+            ) AS c
+            WHERE video.id = c.id AND video.censored IS DISTINCT FROM c.censored
         '''
-        curs.execute(stmt, (source_ids, channel_id))
+        curs.execute(stmt, dict(channel_id=channel_id))
 
 
 minimize_channel = partial(minimize_dict, keys=MINIMUM_CHANNEL_KEYS)
@@ -2,16 +2,17 @@ import json
 import pathlib
 import shutil
 from itertools import zip_longest
-from typing import List
+from typing import List, Optional
 from uuid import uuid4
 
 import mock
 import pytest
 from PIL import Image
 
-from modules.videos.downloader import VideoDownloader, ChannelDownloader
+from modules.videos.downloader import VideoDownloader, ChannelDownloader, upsert_channel_entries
 from modules.videos.lib import set_test_channels_config, set_test_downloader_config
 from modules.videos.models import Channel, Video
+from wrolpi.dates import today
 from wrolpi.downloader import DownloadFrequency, DownloadManager, Download
 from wrolpi.vars import PROJECT_DIR
 
@@ -30,6 +31,18 @@ def simple_channel(test_session, test_directory) -> Channel:
     return channel
 
 
+@pytest.fixture
+def set_channel_catalog(test_session):
+    """Replace the catalog of a Channel with the provided entries.  The Channel has no catalog if entries is None."""
+
+    def set_catalog(channel: Channel, entries: Optional[List[dict]]):
+        channel.info_date = channel.full_catalog_date = today() if entries is not None else None
+        test_session.commit()
+        upsert_channel_entries(channel.id, entries or [], full=True)
+
+    return set_catalog
+
+
 @pytest.fixture
 def channel_factory(test_session, test_directory):
     """Create a random Channel with a directory, but no frequency."""
@@ -2,19 +2,24 @@
 import json
 import pathlib
 import re
+import sys
 import traceback
 from abc import ABC
-from typing import Tuple, List, Optional
+from collections import OrderedDict
+from functools import partial
+from itertools import chain
+from multiprocessing.connection import Connection
+from typing import Tuple, List, Optional, Iterable
 
 import yt_dlp.utils
 from sqlalchemy.orm import Session
 from yt_dlp import YoutubeDL
 from yt_dlp.extractor import YoutubeTabIE  # noqa
-from yt_dlp.utils import UnsupportedError, DownloadError
+from yt_dlp.utils import UnsupportedError, DownloadError, match_filter_func
 
 from wrolpi.cmd import which
 from wrolpi.common import logger, extract_domain, get_media_directory
-from wrolpi.dates import now
+from wrolpi.dates import today
 from wrolpi.db import get_db_session, get_db_curs
 from wrolpi.db import optional_session
 from wrolpi.downloader import Downloader, Download, DownloadResult
@@ -22,8 +27,9 @@ from wrolpi.errors import UnknownChannel, ChannelURLEmpty, UnrecoverableDownload
 from wrolpi.vars import PYTEST
 from .channel.lib import create_channel, get_channel
 from .common import apply_info_json, get_no_channel_directory, get_videos_directory
+from .extractor_index import ExtractorIndex
 from .lib import upsert_video, refresh_channel_videos, get_downloader_config
-from .models import Video, Channel
+from .models import Video, Channel, ChannelEntry
 from .schema import ChannelPostRequest
 from .video_url_resolver import video_url_resolver
 
@@ -49,6 +55,39 @@ PREFERRED_VIDEO_FORMAT = ','.join([
 ])
 
 
+# The most YoutubeDL's that will be kept by `get_ydl`.
+YDL_CACHE_SIZE = 16
+YDL_CACHE: 'OrderedDict[str, YoutubeDL]' = OrderedDict()
+
+
+def get_ydl(options: dict) -> YoutubeDL:
+    """Get a YoutubeDL which uses the provided options.  Creating a YoutubeDL and adding its extractors is slow, so the
+    most recently used YoutubeDL's are kept."""
+    key = json.dumps(options, sort_keys=True, default=str)
+    if key in YDL_CACHE:
+        YDL_CACHE.move_to_end(key)
+        return YDL_CACHE[key]
+
+    ydl = YoutubeDL(options)
+    ydl.params['logger'] = ydl_logger
+    ydl.add_default_info_extractors()
+    YDL_CACHE[key] = ydl
+    while len(YDL_CACHE) > YDL_CACHE_SIZE:
+        YDL_CACHE.popitem(last=False)
+    return ydl
+
+
+EXTRACTOR_INDEX: Optional[ExtractorIndex] = None
+
+
+def get_extractor_index() -> ExtractorIndex:
+    """Get the index of YDL's extractors, it is created when first used."""
+    global EXTRACTOR_INDEX
+    if EXTRACTOR_INDEX is None:
+        EXTRACTOR_INDEX = ExtractorIndex(YDL._ies.values())
+    return EXTRACTOR_INDEX
+
+
 def extract_info(url: str, ydl: YoutubeDL = YDL, process=False) -> dict:
     """Get info about a video.  Separated for testing."""
     return ydl.extract_info(url, download=False, process=process)
@@ -59,6 +98,67 @@ def prepare_filename(entry: dict, ydl: YoutubeDL = YDL) -> str:
     return ydl.prepare_filename(entry)
 
 
+def get_ydl_options(out_dir: pathlib.Path) -> dict:
+    """YoutubeDL expects specific options, add onto the default options."""
+    options = get_downloader_config().dict()
+    options.pop('in_process', None)
+    options['outtmpl'] = f'{out_dir}/{options["file_name_format"]}'
+    options['merge_output_format'] = PREFERRED_VIDEO_EXTENSION
+    return options
+
+
+class YDLPipeLogger:
+    """Sends the messages of a YoutubeDL to the Download Manager, see `Downloader.fork_runner`."""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+
+    def debug(self, msg: str):
+        self.conn.send(('stdout', msg))
+
+    info = debug
+
+    def warning(self, msg: str):
+        self.conn.send(('stderr', msg))
+
+    error = warning
+
+
+def send_ydl_progress(conn: Connection, status: dict):
+    """A YoutubeDL progress hook, sends progress like `parse_progress` to the Download Manager."""
+    if status.get('status') not in ('downloading', 'finished'):
+        return
+    downloaded_bytes = status.get('downloaded_bytes')
+    total_bytes = status.get('total_bytes') or status.get('total_bytes_estimate')
+    percent = round(downloaded_bytes / total_bytes * 100, 1) if downloaded_bytes is not None and total_bytes else None
+    conn.send(('progress', dict(
+        downloaded_bytes=downloaded_bytes,
+        eta=status.get('eta'),
+        percent=percent,
+        speed=status.get('speed'),
+        total_bytes=total_bytes,
+    )))
+
+
+def ydl_download(conn: Connection, entry: dict, options: dict):
+    """Download a video using the `entry` which was already extracted by `VideoDownloader.prepare_filename`.
+
+    This is run in a fork of WROLPi, see `Downloader.fork_runner`."""
+    try:
+        options = dict(options, logger=YDLPipeLogger(conn), progress_hooks=[partial(send_ydl_progress, conn)],
+                       noprogress=True)
+        ydl = YoutubeDL(options)
+        ydl.add_default_info_extractors()
+        # Process the entry like `yt-dlp --load-info-json`, the video is not extracted again.
+        info = ydl.sanitize_info(entry, ydl.params.get('clean_infojson', True))
+        ydl.process_ie_result(info, download=True)
+    except Exception:
+        conn.send(('stderr', traceback.format_exc()))
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
 class ChannelDownloader(Downloader, ABC):
     """Handles downloading of videos in a Channel or Playlist."""
     name = 'video_channel'
@@ -84,9 +184,14 @@ class ChannelDownloader(Downloader, ABC):
     async def do_download(self, download: Download) -> DownloadResult:
         """Update a Channel's catalog, then schedule downloads of every missing video."""
         info = extract_info(download.url, process=False)
-        # Resolve the entries generator.
-        info['entries'] = list(info['entries'])
-        download.info_json = info
+        is_a_playlist = self.is_a_playlist(info)
+        if is_a_playlist:
+            # Resolve the entries generator.
+            info['entries'] = list(info['entries'])
+            download.info_json = info
+        else:
+            # The entries of a channel are only fetched as they are needed, see `update_channel_catalog`.
+            download.info_json = {k: v for k, v in info.items() if k != 'entries'}
         if session := Session.object_session(download):
             # May not have a session during testing.
             session.commit()
@@ -98,7 +203,6 @@ class ChannelDownloader(Downloader, ABC):
 
         location = f'/videos/channel/{channel.id}/video' if channel and channel.id else None
 
-        is_a_playlist = self.is_a_playlist(info)
         try:
             if is_a_playlist:
                 downloads = self.get_playlist_downloads(download)
@@ -160,17 +264,16 @@ class VideoDownloader(Downloader, ABC):
     @classmethod
     def valid_url(cls, url) -> Tuple[bool, Optional[dict]]:
         """Match against all Youtube-DL Info Extractors, except those that match a Channel."""
-        for ie in YDL._ies.values():
-            if ie.suitable(url) and not ChannelDownloader.valid_url(url)[0]:
-                try:
-                    info = extract_info(url)
-                    return True, info
-                except UnsupportedError:
-                    logger.debug(f'Video downloader extract_info failed for {url}')
-                    return False, None
-                except DownloadError:
-                    logger.debug(f'Video downloader extract_info failed for {url}')
-                    return False, None
+        if not ChannelDownloader.valid_url(url)[0] and get_extractor_index().suitable(url):
+            try:
+                info = extract_info(url)
+                return True, info
+            except UnsupportedError:
+                logger.debug(f'Video downloader extract_info failed for {url}')
+                return False, None
+            except DownloadError:
+                logger.debug(f'Video downloader extract_info failed for {url}')
+                return False, None
         logger.debug(f'{cls.__name__} not suitable for {url}')
         return False, None
 
@@ -207,32 +310,43 @@ class VideoDownloader(Downloader, ABC):
         try:
             video_path, entry = self.prepare_filename(url, out_dir)
             # Do the real download.
-            file_name_format = '%(uploader)s_%(upload_date)s_%(id)s_%(title)s.%(ext)s'
-            cmd = (
-                str(YT_DLP_BIN),
-                '-cw',  # Continue downloads, do not clobber existing files.
-                '-f', PREFERRED_VIDEO_FORMAT,
-                '--match-filter', '!is_live',  # Do not attempt to download Live videos.
-                '--write-subs',
-                '--write-auto-subs',
-                '--write-thumbnail',
-                '--write-info-json',
-                '--merge-output-format', PREFERRED_VIDEO_EXTENSION,
-                '-o', file_name_format,
-                '--no-cache-dir',
-                '--compat-options', 'no-live-chat',
-                url,
-            )
-            return_code, logs = await self.process_runner(url, cmd, out_dir)
+            if get_downloader_config().in_process:
+                # Download in a fork using the entry that was just extracted.
+                options = self.get_download_options(out_dir)
+                return_code, logs = await self.fork_runner(url, ydl_download, (entry, options))
+            else:
+                file_name_format = '%(uploader)s_%(upload_date)s_%(id)s_%(title)s.%(ext)s'
+                cmd = (
+                    str(YT_DLP_BIN),
+                    '-cw',  # Continue downloads, do not clobber existing files.
+                    '-f', PREFERRED_VIDEO_FORMAT,
+                    '--match-filter', '!is_live',  # Do not attempt to download Live videos.
+                    '--write-subs',
+                    '--write-auto-subs',
+                    '--write-thumbnail',
+                    '--write-info-json',
+                    '--merge-output-format', PREFERRED_VIDEO_EXTENSION,
+                    '-o', file_name_format,
+                    '--no-cache-dir',
+                    '--compat-options', 'no-live-chat',
+                )
+                if bandwidth_limit := self.manager.get_bandwidth_limit():
+                    cmd = (*cmd, '--limit-rate', str(bandwidth_limit))
+                cmd = (*cmd, url)
+                return_code, logs = await self.process_runner(url, cmd, out_dir)
 
             stdout = logs['stdout'].decode() if hasattr(logs['stdout'], 'decode') else logs['stdout']
             stderr = logs['stderr'].decode() if hasattr(logs['stderr'], 'decode') else logs['stderr']
 
+            downloaded_bytes = logs.get('downloaded_bytes')
+
             if return_code != 0:
                 error = f'{stdout}\n\n\n{stderr}\n\nvideo downloader process exited with {return_code}'
                 return DownloadResult(
                     success=False,
                     error=error,
+                    exit_code=return_code,
+                    downloaded_bytes=downloaded_bytes,
                 )
 
             if not video_path.is_file():
@@ -241,6 +355,8 @@ class VideoDownloader(Downloader, ABC):
                 return DownloadResult(
                     success=False,
                     error=error,
+                    exit_code=return_code,
+                    downloaded_bytes=downloaded_bytes,
                 )
 
             with get_db_session(commit=True) as session:
@@ -285,26 +401,42 @@ class VideoDownloader(Downloader, ABC):
         result = DownloadResult(
             success=True,
             location=location,
+            exit_code=return_code,
+            downloaded_bytes=downloaded_bytes,
         )
         return result
 
+    def get_download_options(self, out_dir: pathlib.Path) -> dict:
+        """The YoutubeDL options which match the arguments passed to the yt-dlp CLI."""
+        options = get_ydl_options(out_dir)
+        options.update(
+            cachedir=False,
+            compat_opts={'no-live-chat'},
+            continuedl=True,
+            format=PREFERRED_VIDEO_FORMAT,
+            match_filter=match_filter_func('!is_live'),  # Do not attempt to download Live videos.
+            nooverwrites=True,
+            writeautomaticsub=True,
+            writeinfojson=True,
+            writesubtitles=True,
+            writethumbnail=True,
+        )
+        if bandwidth_limit := self.manager.get_bandwidth_limit():
+            options['ratelimit'] = bandwidth_limit
+        return options
+
     @staticmethod
     def prepare_filename(url: str, out_dir: pathlib.Path) -> Tuple[pathlib.Path, dict]:
         """Get the full path of a video file from its URL."""
         if not out_dir.is_dir():
             raise ValueError(f'Output directory does not exist! {out_dir=}')
 
-        # YoutubeDL expects specific options, add onto the default options
-        options = get_downloader_config().dict()
-        options['outtmpl'] = f'{out_dir}/{options["file_name_format"]}'
-        options['merge_output_format'] = PREFERRED_VIDEO_EXTENSION
+        options = get_ydl_options(out_dir)
 
         logger.debug(f'Downloading {url} to {out_dir}')
 
-        # Create a new YoutubeDL for the output directory.
-        ydl = YoutubeDL(options)
-        ydl.params['logger'] = ydl_logger
-        ydl.add_default_info_extractors()
+        # Use a YoutubeDL for the output directory.
+        ydl = get_ydl(options)
 
         # Get the path where the video will be saved.
         entry = extract_info(url, ydl=ydl, process=True)
@@ -351,87 +483,169 @@ def get_or_create_channel(source_id: str = None, url: str = None, name: str = No
     return channel
 
 
-def update_channel_catalog(channel: Channel, info: dict):
-    """
-    Connect to the Channel's host website and pull a catalog of all videos.  Insert any new videos into the DB.
+# A full catalog of a Channel is fetched after this many days, otherwise only the newest entries are fetched.
+FULL_CATALOG_DAYS = 30
+# An incremental catalog stops when this many known entries have been seen in a row (a page of a Youtube channel).
+KNOWN_ENTRIES_STOP = 30
 
-    It is expected that any missing videos will be downloaded later.
-    """
-    logger.info(f'Downloading video list for {channel.name} at {channel.url}  This may take several minutes.')
 
-    # Resolve all entries to dictionaries.
-    entries = info['entries'] = list(info['entries'])
+def get_catalog_entries(info: dict) -> Iterable[dict]:
+    """Get the entries of a Channel's info.  The entries are not resolved, they are fetched as they are needed."""
+    entries = iter(info['entries'])
+    first = next(entries, None)
+    if first is None:
+        return []
+    entries = chain([first], entries)
 
     # yt-dlp may hand back a list of URLs, lets use the "Uploads" URL, if available.
-    try:
-        entries[0]['id']
-    except Exception:
+    if 'id' not in first:
         logger.warning('yt-dlp did not return a list of URLs')
+        entries = list(entries)
         for entry in entries:
             if entry['title'] == 'Uploads':
                 logger.info('Youtube-DL gave back a list of URLs, found the "Uploads" URL and using it.')
-                info = extract_info(entry['url'])
-                entries = info['entries'] = list(info['entries'])
-                break
+                return extract_info(entry['url'])['entries']
+    return entries
+
+
+def upsert_channel_entries(channel_id: int, entries: List[dict], full: bool = False) -> int:
+    """Insert or update the ChannelEntry of each entry.  Only the entries that have changed are written.
+
+    If `full` is True, then the entries are the entire catalog of the Channel, and any ChannelEntry not in the entries
+    will be deleted.
+
+    Returns the count of entries that were written."""
+    rows = {i['id']: dict(
+        source_id=i['id'],
+        title=i.get('title'),
+        url=i.get('webpage_url') or i.get('url'),
+        view_count=i.get('view_count'),
+        duration=int(i['duration']) if i.get('duration') else None,
+        upload_date=i.get('upload_date'),
+    ) for i in entries}
+
+    with get_db_curs(commit=True) as curs:
+        stmt = '''
+            WITH source AS (
+                SELECT * FROM json_to_recordset(%(entries)s::json)
+                    AS (source_id TEXT, title TEXT, url TEXT, view_count INT, duration INT, upload_date DATE)
+            )
+            INSERT INTO channel_entry (channel_id, source_id, title, url, view_count, duration, upload_date)
+            SELECT %(channel_id)s, s.source_id, s.title, s.url, s.view_count, s.duration, s.upload_date
+            FROM source AS s
+            ON CONFLICT (channel_id, source_id) DO UPDATE
+            SET title=EXCLUDED.title, url=EXCLUDED.url, view_count=EXCLUDED.view_count, duration=EXCLUDED.duration,
+                upload_date=COALESCE(EXCLUDED.upload_date, channel_entry.upload_date)
+            WHERE (channel_entry.title, channel_entry.url, channel_entry.view_count, channel_entry.duration)
+                IS DISTINCT FROM (EXCLUDED.title, EXCLUDED.url, EXCLUDED.view_count, EXCLUDED.duration)
+                OR (
+                    EXCLUDED.upload_date IS NOT NULL
+                    AND EXCLUDED.upload_date IS DISTINCT FROM channel_entry.upload_date
+                )
+            RETURNING source_id
+        '''
+        curs.execute(stmt, dict(entries=json.dumps(list(rows.values())), channel_id=channel_id))
+        count = len(curs.fetchall())
 
-    # This is all the source id's that are currently available.
-    try:
-        all_source_ids = {i['id'] for i in entries}
-    except KeyError as e:
-        logger.warning(f'No ids for entries!  Was the channel update successful?  Is the channel URL correct?')
-        logger.warning(f'entries: {entries}')
-        raise KeyError('No id key for entry!') from e
+        if full:
+            # Entries which are no longer in the catalog have been removed from the Channel.
+            stmt = 'DELETE FROM channel_entry WHERE channel_id=%s AND source_id != ALL(%s)'
+            curs.execute(stmt, (channel_id, list(rows)))
+            count += curs.rowcount
 
-    # In order to store the Video's URL, we will need a quick lookup.
-    urls = {i['id']: i.get('webpage_url') for i in entries}
+    return count
+
+
+def update_channel_catalog(channel: Channel, info: dict):
+    """
+    Connect to the Channel's host website and pull a catalog of all videos.  Insert any new videos into the DB.
+
+    A full catalog is only fetched every `FULL_CATALOG_DAYS`.  Otherwise, the newest entries are fetched until
+    `KNOWN_ENTRIES_STOP` entries in a row are already in the catalog.
+
+    It is expected that any missing videos will be downloaded later.
+    """
+    with get_db_curs() as curs:
+        curs.execute('SELECT source_id FROM channel_entry WHERE channel_id=%s', (channel.id,))
+        known_source_ids = {i[0] for i in curs.fetchall()}
+
+    full = not known_source_ids or not channel.full_catalog_date or \
+        (today() - channel.full_catalog_date).days >= FULL_CATALOG_DAYS
+    if full:
+        logger.info(f'Downloading video list for {channel.name} at {channel.url}  This may take several minutes.')
+    else:
+        logger.info(f'Downloading newest videos for {channel.name} at {channel.url}')
+
+    entries = []
+    known_in_a_row = 0
+    for entry in get_catalog_entries(info):
+        try:
+            source_id = entry['id']
+        except KeyError as e:
+            logger.warning(f'No ids for entries!  Was the channel update successful?  Is the channel URL correct?')
+            logger.warning(f'entry: {entry}')
+            raise KeyError('No id key for entry!') from e
+
+        entries.append(entry)
+        known_in_a_row = known_in_a_row + 1 if source_id in known_source_ids else 0
+        if not full and known_in_a_row >= KNOWN_ENTRIES_STOP:
+            # The rest of the catalog is already known, stop fetching pages.
+            break
+
+    count = upsert_channel_entries(channel.id, entries, full=full)
+    logger.debug(f'Updated {count} catalog entries of {channel.name}')
 
     with get_db_session(commit=True) as session:
         # Get the channel in this new context.
         channel = session.query(Channel).filter_by(id=channel.id).one()
 
-        channel.info_json = info
-        channel.info_date = now()
+        # The entries are stored in the channel_entry table.
+        channel.info_json = {k: v for k, v in info.items() if k != 'entries'}
         channel.source_id = info.get('id')
+        channel.info_date = today()
+        if full:
+            channel.full_catalog_date = today()
 
-        with get_db_curs() as curs:
-            # Get all known videos in this channel.
-            query = 'SELECT source_id FROM video WHERE channel_id=%s AND source_id IS NOT NULL'
-            curs.execute(query, (channel.id,))
-            known_source_ids = {i[0] for i in curs.fetchall()}
-
-        new_source_ids = all_source_ids.difference(known_source_ids)
+        # Get the known videos of the entries that were fetched.
+        source_ids = [i['id'] for i in entries]
+        known_videos = session.query(Video.source_id) \
+            .filter(Video.channel_id == channel.id, Video.source_id.in_(source_ids))
+        new_source_ids = set(source_ids).difference(i for i, in known_videos)
 
         logger.info(f'Got {len(new_source_ids)} new videos for channel {channel.name}')
         channel_id = channel.id
-        for source_id in new_source_ids:
-            url = urls.get(source_id)
-            session.add(Video(source_id=source_id, channel_id=channel_id, url=url))
+        for entry in entries:
+            if entry['id'] in new_source_ids:
+                new_source_ids.remove(entry['id'])
+                session.add(Video(source_id=entry['id'], channel_id=channel_id, url=entry.get('webpage_url')))
 
-    # Write the Channel's info to a JSON file.
-    if channel.directory:
+    # Write the Channel's full catalog to a JSON file.
+    if full and channel.directory:
         info_json_path = channel.directory.path / f'{channel.name}.info.json'
         with info_json_path.open('wt') as fh:
-            json.dump(info, fh, indent=2)
+            json.dump(dict(info, entries=entries), fh, indent=2)
 
-    # Update all view counts using the latest from the Channel's info_json.
+    # Update all view counts using the latest from the Channel's catalog.
     apply_info_json(channel_id)
 
 
 def _find_all_missing_videos(channel_id: id) -> List[Tuple]:
-    """Get all Video entries which don't have the required media files (i.e. hasn't been downloaded)."""
+    """Get all Video entries which don't have the required media files (i.e. hasn't been downloaded), joined to the
+    Channel's catalog entry.  The catalog columns are NULL if the video is not in the catalog."""
     with get_db_curs() as curs:
         query = f'''
             SELECT
-                video.id, video.source_id, video.channel_id
+                video.id, video.source_id, e.source_id AS entry_source_id, e.title, e.url, e.view_count, e.duration,
+                e.upload_date
             FROM
                 video
                 LEFT JOIN channel ON channel.id = video.channel_id
+                LEFT JOIN channel_entry e ON e.channel_id = video.channel_id AND e.source_id = video.source_id
             WHERE
                 channel.url IS NOT NULL
                 AND channel.url != ''
                 AND video.source_id IS NOT NULL
-                AND channel_id = %s
-                AND video.channel_id IS NOT NULL
+                AND video.channel_id = %s
                 AND (video_path IS NULL OR video_path = '' OR poster_path IS NULL OR poster_path = '')
         '''
         params = (channel_id,)
@@ -442,9 +656,9 @@ def _find_all_missing_videos(channel_id: id) -> List[Tuple]:
 
 def find_all_missing_videos(channel_id: int = None) -> Tuple[dict, dict]:
     """
-    Find all videos that don't have a video file, but are found in the DB (taken from the channel's info_json).
+    Find all videos that don't have a video file, but are found in the DB (taken from the channel's catalog).
 
-    Yields a Channel Dict object, our Video id, and the "entry" of the video from the channel's info_json['entries'].
+    Yields our Video id, the source_id, and the "entry" of the video from the channel's catalog.
     """
     channel: Channel = get_channel(channel_id=channel_id, return_dict=False)
     if not channel.url:
@@ -457,22 +671,26 @@ def find_all_missing_videos(channel_id: int = None) -> Tuple[dict, dict]:
 
     match_regex = re.compile(channel.match_regex) if channel.match_regex else None
 
-    # Convert the channel video entries into a form that allows them to be quickly retrieved without searching through
-    # the entire entries list.
-    channel_entries = {i['id']: i for i in channel.info_json['entries']}
     # Yield all videos not skipped.
     missing_videos = _find_all_missing_videos(channel_id)
-    for video_id, source_id, channel_id in missing_videos:
+    for row in missing_videos:
+        video_id, source_id = row['id'], row['source_id']
         if channel.skip_download_videos and source_id in channel.skip_download_videos:
             # This video has been marked to skip.
             continue
 
-        try:
-            missing_video = channel_entries[source_id]
-        except KeyError:
-            logger.warning(f'Video {channel.name} / {source_id} is not in {channel.name} info_json')
+        if not row['entry_source_id']:
+            logger.warning(f'Video {channel.name} / {source_id} is not in {channel.name} catalog')
             continue
 
+        missing_video = ChannelEntry(
+            source_id=source_id,
+            title=row['title'],
+            url=row['url'],
+            view_count=row['view_count'],
+            duration=row['duration'],
+            upload_date=row['upload_date'],
+        ).entry()
         if not match_regex or (match_regex and missing_video['title'] and match_regex.match(missing_video['title'])):
             # No title match regex, or the title matches the regex.
             yield video_id, source_id, missing_video
@@ -0,0 +1,373 @@
+"""Finds the yt-dlp extractors which may be suitable for a URL, without asking every extractor.
+
+An extractor is indexed by the hosts its `_VALID_URL` can match.  Only the host part of `_VALID_URL` is expanded, and
+only when every host it can match is known, otherwise the extractor is a candidate for every URL.  This means the
+candidates of a URL always contain every extractor which is suitable for it.
+"""
+import heapq
+import re
+from collections import defaultdict
+from operator import itemgetter
+from typing import Dict, List, Optional, Set, Tuple, Iterable
+from urllib.parse import urlparse
+
+from yt_dlp.extractor.common import InfoExtractor
+
+from wrolpi.common import logger
+
+logger = logger.getChild(__name__)
+
+try:
+    from yt_dlp.extractor.lazy_extractors import LazyLoadExtractor
+
+    # Extractors which match a URL using only their _VALID_URL.
+    BASE_EXTRACTORS = (InfoExtractor, LazyLoadExtractor)
+except ImportError:
+    BASE_EXTRACTORS = (InfoExtractor,)
+
+# The host of a URL must follow a scheme, or `//`.
+VALID_URL_SCHEME = re.compile(r'^\^?(?:https?\??:|\(\?:https?\??:\)\?)?//')
+# Characters which can be in a host, these cannot end the host of a URL.
+HOST_CHARS = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-._')
+WORD_CHARS = HOST_CHARS - {'-', '.'}
+DIGIT_CHARS = set('0123456789')
+# Any number of HOST_CHARS.
+WILDCARD = '\0'
+# Small character classes are expanded, larger classes are a WILDCARD.
+MAX_CLASS_CHARS = 4
+MAX_HOSTS = 256
+
+
+class HostPatternError(Exception):
+    pass
+
+
+def strip_verbose(pattern: str) -> str:
+    """Remove the whitespace and comments of a verbose regex."""
+    stripped = []
+    i = 0
+    in_class = False
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            stripped.append(pattern[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            if char == ']' and stripped[-1] not in ('[', '[^'):
+                in_class = False
+        elif char == '[':
+            in_class = True
+            if pattern[i + 1:i + 2] == '^':
+                stripped.append('[^')
+                i += 2
+                continue
+        elif char.isspace():
+            i += 1
+            continue
+        elif char == '#':
+            while i < len(pattern) and pattern[i] != '\n':
+                i += 1
+            continue
+        stripped.append(char)
+        i += 1
+    return ''.join(stripped)
+
+
+def has_top_level_alternation(pattern: str) -> bool:
+    """Returns True if the regex is an alternation of other regexes."""
+    depth = 0
+    i = 0
+    in_class = False
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            if char == ']' and pattern[i - 1] != '[' and pattern[i - 2:i] != '[^':
+                in_class = False
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _parse_class(pattern: str, i: int) -> Tuple[Set[str], int]:
+    """Parse a character class which starts at `i`.  Only classes of HOST_CHARS are supported."""
+    chars = set()
+    i += 1
+    if pattern[i:i + 1] == '^':
+        raise HostPatternError('Negated classes can match the end of a host')
+    while i < len(pattern) and pattern[i] != ']':
+        if pattern[i] == '\\':
+            escaped = pattern[i + 1:i + 2]
+            if escaped == 'w':
+                chars |= WORD_CHARS
+            elif escaped == 'd':
+                chars |= DIGIT_CHARS
+            elif escaped in ('.', '-', '_'):
+                chars.add(escaped)
+            else:
+                raise HostPatternError(f'Cannot expand \\{escaped}')
+            i += 2
+        elif pattern[i + 1:i + 2] == '-' and pattern[i + 2:i + 3] not in ('', ']'):
+            chars |= {chr(c) for c in range(ord(pattern[i]), ord(pattern[i + 2]) + 1)}
+            i += 3
+        else:
+            chars.add(pattern[i])
+            i += 1
+    if i >= len(pattern):
+        raise HostPatternError('Class is not closed')
+    if not chars or not chars <= HOST_CHARS:
+        raise HostPatternError('Class can match the end of a host')
+    return chars, i + 1
+
+
+NAMED_GROUP = re.compile(r'\(\?P<\w+>')
+QUANTIFIER = re.compile(r'(?:(\?)|(\*)|(\+)|{(\d*)(?:,\d*)?})\??')
+
+
+def _parse_quantifier(pattern: str, i: int) -> Tuple[bool, bool, int]:
+    """Parse any quantifier at `i`.  Returns whether the atom is optional, and whether it can be repeated."""
+    if not (match := QUANTIFIER.match(pattern, i)):
+        return False, False, i
+    optional, star, plus, minimum = match.groups()
+    if optional:
+        return True, False, match.end()
+    if star or plus:
+        return bool(star), True, match.end()
+    return not int(minimum or 0), True, match.end()
+
+
+def _group_end(pattern: str, i: int) -> int:
+    """Get the index of the ")" which closes the group which starts at `i`."""
+    depth = 0
+    class_start = None
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if class_start is not None:
+            if char == ']' and i > class_start + 1 and pattern[class_start + 1:i] != '^':
+                class_start = None
+        elif char == '[':
+            class_start = i
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise HostPatternError('Group is not closed')
+
+
+def _group_start(pattern: str, i: int) -> Optional[int]:
+    """Get the index of the contents of a group which starts at `i`.  Returns None if the group is a lookaround."""
+    if pattern.startswith('(?:', i):
+        return i + 3
+    elif match := NAMED_GROUP.match(pattern, i):
+        return match.end()
+    elif pattern.startswith('(?', i):
+        return None
+    return i + 1
+
+
+def _split_alternatives(pattern: str) -> List[str]:
+    alternatives = []
+    i = start = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '(':
+            i = _group_end(pattern, i)
+        elif char == '[':
+            i = pattern.index(']', i + 2)
+        elif char == '|':
+            alternatives.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    alternatives.append(pattern[start:])
+    return alternatives
+
+
+def _path_follows(pattern: str, i: int) -> bool:
+    """Returns True if the regex at `i` must match a "/"."""
+    if pattern[i:i + 1] == '/':
+        optional, _, _ = _parse_quantifier(pattern, i + 1)
+        return not optional
+    if pattern[i:i + 1] != '(' or (start := _group_start(pattern, i)) is None:
+        return False
+    try:
+        end = _group_end(pattern, i)
+        optional, _, _ = _parse_quantifier(pattern, end + 1)
+        return not optional and all(i and _path_follows(i, 0) for i in _split_alternatives(pattern[start:end]))
+    except (HostPatternError, ValueError):
+        return False
+
+
+def _tail(host: str) -> str:
+    return host.rsplit(WILDCARD, 1)[-1]
+
+
+def _parse_alternation(pattern: str, i: int) -> Tuple[Set[str], int]:
+    hosts = set()
+    while True:
+        sequence, i = _parse_sequence(pattern, i)
+        hosts |= sequence
+        if i < len(pattern) and pattern[i] == '|':
+            i += 1
+            continue
+        return hosts, i
+
+
+def _parse_sequence(pattern: str, i: int, host: bool = False) -> Tuple[Set[str], int]:
+    """Expand a sequence of atoms.  If `host` is True, the sequence stops at the path of the URL."""
+    hosts = {'', }
+    while i < len(pattern) and pattern[i] not in '|)':
+        if host and _path_follows(pattern, i):
+            break
+        char = pattern[i]
+        if char == '(':
+            if (start := _group_start(pattern, i)) is None:
+                raise HostPatternError('Lookarounds and flags are not supported')
+            atom, i = _parse_alternation(pattern, start)
+            if i >= len(pattern) or pattern[i] != ')':
+                raise HostPatternError('Group is not closed')
+            i += 1
+        elif char == '[':
+            atom, i = _parse_class(pattern, i)
+        elif char == '\\':
+            escaped = pattern[i + 1:i + 2]
+            if escaped == 'w':
+                atom = WORD_CHARS
+            elif escaped == 'd':
+                atom = DIGIT_CHARS
+            elif escaped in ('.', '-'):
+                atom = {escaped, }
+            else:
+                raise HostPatternError(f'Cannot expand \\{escaped}')
+            i += 2
+        elif char in HOST_CHARS and char != '.':
+            atom = {char, }
+            i += 1
+        else:
+            # An unescaped "." can match the end of a host.
+            raise HostPatternError(f'Cannot expand {char}')
+
+        if len(atom) > MAX_CLASS_CHARS and all(len(a) == 1 for a in atom):
+            # A large character class can be any of the host characters.
+            atom = {WILDCARD, }
+        atom = {a.lower() for a in atom}
+
+        optional, repeated, i = _parse_quantifier(pattern, i)
+        if repeated:
+            # Only the end of the last repetition is known.
+            atom = {WILDCARD + _tail(a) for a in atom}
+        if optional:
+            atom = atom | {'', }
+
+        hosts = {a + b for a in hosts for b in atom}
+        if len(hosts) > MAX_HOSTS:
+            raise HostPatternError('Too many hosts')
+    return hosts, i
+
+
+def get_valid_url_hosts(pattern: str) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Get the hosts, and the host suffixes (which start with "."), that a _VALID_URL can match.  Returns None if they
+    cannot be known."""
+    if pattern.startswith('(?x)'):
+        pattern = strip_verbose(pattern[4:])
+    if has_top_level_alternation(pattern) or not (match := VALID_URL_SCHEME.match(pattern)):
+        return None
+
+    # The host is everything between the scheme and the path.
+    pattern = pattern[match.end():]
+    try:
+        expanded, i = _parse_sequence(pattern, 0, host=True)
+    except HostPatternError:
+        return None
+    if i >= len(pattern) or not _path_follows(pattern, i):
+        # The host may not be followed by a "/".
+        return None
+
+    hosts, suffixes = set(), set()
+    for host in expanded:
+        if WILDCARD not in host:
+            hosts.add(host)
+            continue
+        suffix = _tail(host)
+        if not suffix.startswith('.') or len(suffix) < 2:
+            return None
+        suffixes.add(suffix)
+    if '' in hosts:
+        return None
+    return hosts, suffixes
+
+
+def get_extractor_hosts(ie) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Get the hosts, and host suffixes, that an extractor is suitable for.  Returns None if they cannot be known."""
+
+    def defined_by(name: str):
+        return next((i for i in ie.__mro__ if name in i.__dict__), None)
+
+    if not isinstance(ie, type):
+        ie = type(ie)
+    # Do not use getattr, a lazy extractor would load its real class.
+    pattern = ie.__dict__.get('_VALID_URL')
+    if not isinstance(pattern, str) \
+            or defined_by('suitable') not in BASE_EXTRACTORS \
+            or defined_by('_match_valid_url') not in BASE_EXTRACTORS:
+        return None
+    return get_valid_url_hosts(pattern)
+
+
+class ExtractorIndex:
+    """The extractors of a YoutubeDL, indexed by the hosts they are suitable for.  Candidates are in the same order as
+    the extractors they were indexed from."""
+
+    def __init__(self, ies: Iterable[InfoExtractor]):
+        self.hosts: Dict[str, List[Tuple[int, InfoExtractor]]] = defaultdict(list)
+        self.suffixes: Dict[str, List[Tuple[int, InfoExtractor]]] = defaultdict(list)
+        self.any_host: List[Tuple[int, InfoExtractor]] = list()
+        for position, ie in enumerate(ies):
+            if not (hosts := get_extractor_hosts(ie)):
+                self.any_host.append((position, ie))
+                continue
+            for host in hosts[0]:
+                self.hosts[host].append((position, ie))
+            for suffix in hosts[1]:
+                self.suffixes[suffix].append((position, ie))
+        logger.debug(f'Indexed {len(self.hosts)} hosts and {len(self.suffixes)} host suffixes,'
+                     f' {len(self.any_host)} extractors match any host')
+
+    def candidates(self, url: str) -> List[InfoExtractor]:
+        """Get every extractor which may be suitable for the URL."""
+        try:
+            host = urlparse(url).hostname or ''
+        except ValueError:
+            host = ''
+        matches = [self.any_host, self.hosts.get(host, [])]
+        matches.extend(self.suffixes.get(host[i:], []) for i, char in enumerate(host) if char == '.')
+        candidates = []
+        last_position = None
+        for position, ie in heapq.merge(*matches, key=itemgetter(0)):
+            # An extractor may match the host, and a suffix.
+            if position != last_position:
+                candidates.append(ie)
+                last_position = position
+        return candidates
+
+    def suitable(self, url: str) -> Optional[InfoExtractor]:
+        """Get the first extractor which is suitable for the URL."""
+        return next((ie for ie in self.candidates(url) if ie.suitable(url)), None)
@@ -1,23 +1,29 @@
 import html
+import os
 import pathlib
 import re
 from collections import defaultdict
-from typing import Tuple, Optional, List, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from multiprocessing import Queue, cpu_count, Lock
+from queue import Full
+from typing import Tuple, Optional, List, Union, Iterable, Set
 from uuid import uuid1
 
+from psycopg2.extras import execute_values
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from yt_dlp import YoutubeDL
 
-from wrolpi import before_startup
+from wrolpi import before_startup, scan_manifest
 from wrolpi.common import chunks, ConfigFile, get_media_directory, sanitize_link
 from wrolpi.dates import from_timestamp, Seconds
 from wrolpi.db import get_db_curs, get_db_session, optional_session
 from wrolpi.media_path import MediaPath
-from wrolpi.vars import PYTEST
+from wrolpi.vars import PYTEST, DB_POOL_SIZE
+from wrolpi.watcher import watch_handler, delete_paths
 from .captions import get_captions
-from .common import generate_video_paths, remove_duplicate_video_paths, apply_info_json, get_video_duration, \
-    is_valid_poster, convert_image, generate_video_poster, logger, REQUIRED_OPTIONS, ConfigError, \
+from .common import match_video_extensions, VIDEO_EXTENSIONS, remove_duplicate_video_paths, apply_info_json, \
+    get_video_duration, is_valid_poster, convert_image, generate_video_poster, logger, REQUIRED_OPTIONS, ConfigError, \
     get_no_channel_directory, check_for_video_corruption
 from .models import Channel, Video
 
@@ -25,50 +31,66 @@ logger = logger.getChild(__name__)
 
 DEFAULT_DOWNLOAD_FREQUENCY = Seconds.week
 
+# The count of Videos which will be validated and committed together.
+VALIDATION_BATCH_SIZE = 20
+# Validation is resumed after startup, and is performed after each refresh.  Only one may validate at a time.
+VALIDATION_LOCK = Lock()
 
-def refresh_channel_videos(channel: Channel):
+
+def get_video_paths(result: scan_manifest.ScanResult) -> Set[pathlib.Path]:
+    """Get the WROLPi compatible videos from a scan, remove any duplicates (different formats)."""
+    return remove_duplicate_video_paths(i for i in result.paths if match_video_extensions(i.name))
+
+
+def refresh_channel_videos(channel: Channel, full: bool = False):
     """
     Find all video files in a channel's directory.  Add any videos not in the DB to the DB.
-    """
-    # Set the idempotency key, we can remove any videos not touched during this search.
-    with get_db_curs(commit=True) as curs:
-        curs.execute('UPDATE video SET idempotency=NULL WHERE channel_id=%s', (channel.id,))
 
-    idempotency = str(uuid1())
+    The videos are only refreshed if the channel's directory has changed since its previous refresh, unless `full` is
+    True.
+    """
     directory = channel.directory.path
+    result = scan_manifest.scan(f'channel-{channel.id}', directory, full=full)
 
-    # A set of absolute paths that exist in the file system
-    possible_new_paths = generate_video_paths(directory)
-    possible_new_paths = remove_duplicate_video_paths(possible_new_paths)
+    if result.changed or full:
+        # Set the idempotency key, we can remove any videos not touched during this search.
+        with get_db_curs(commit=True) as curs:
+            curs.execute('UPDATE video SET idempotency=NULL WHERE channel_id=%s', (channel.id,))
 
-    # Update all videos that match the current video paths
-    new_paths = [str(i) for i in possible_new_paths]
-    with get_db_curs(commit=True) as curs:
-        query = 'UPDATE video SET idempotency = %s WHERE channel_id = %s AND video_path = ANY(%s) RETURNING video_path'
-        curs.execute(query, (idempotency, channel.id, new_paths))
-        existing_paths = {i for (i,) in curs.fetchall()}
+        idempotency = str(uuid1())
 
-    # Get the paths for any video not yet in the DB
-    # (paths in DB are relative, but we need to pass an absolute path)
-    new_videos = {i for i in possible_new_paths if str(i) not in existing_paths}
+        # A set of absolute paths that exist in the file system
+        possible_new_paths = get_video_paths(result)
 
-    for chunk in chunks(new_videos, 20):
-        with get_db_session(commit=True) as session:
-            for video_path in chunk:
-                video_path = pathlib.Path(video_path)
-                upsert_video(session, video_path, channel, idempotency=idempotency)
-                logger.debug(f'{channel.name}: Added {video_path.name}')
+        # Update all videos that match the current video paths
+        new_paths = [str(i) for i in possible_new_paths]
+        with get_db_curs(commit=True) as curs:
+            query = 'UPDATE video SET idempotency = %s WHERE channel_id = %s AND video_path = ANY(%s) ' \
+                    'RETURNING video_path'
+            curs.execute(query, (idempotency, channel.id, new_paths))
+            existing_paths = {i for (i,) in curs.fetchall()}
 
-    with get_db_curs(commit=True) as curs:
-        stmt = 'DELETE FROM video WHERE channel_id=%s AND idempotency IS NULL AND video_path IS NOT NULL RETURNING id'
-        curs.execute(stmt, (channel.id,))
-        deleted_count = len(curs.fetchall())
+        # Get the paths for any video not yet in the DB
+        # (paths in DB are relative, but we need to pass an absolute path)
+        new_videos = {i for i in possible_new_paths if str(i) not in existing_paths}
 
-    if deleted_count:
-        deleted_status = f'Deleted {deleted_count} video records from channel {channel.name}'
-        logger.info(deleted_status)
+        bulk_upsert_videos(new_videos, channel, idempotency=idempotency)
+
+        with get_db_curs(commit=True) as curs:
+            stmt = 'DELETE FROM video WHERE channel_id=%s AND idempotency IS NULL AND video_path IS NOT NULL ' \
+                   'RETURNING id'
+            curs.execute(stmt, (channel.id,))
+            deleted_count = len(curs.fetchall())
 
-    logger.info(f'{channel.name}: {len(new_videos)} new videos, {len(existing_paths)} already existed. ')
+        if deleted_count:
+            deleted_status = f'Deleted {deleted_count} video records from channel {channel.name}'
+            logger.info(deleted_status)
+
+        logger.info(f'{channel.name}: {len(new_videos)} new videos, {len(existing_paths)} already existed. ')
+    else:
+        logger.info(f'{channel.name}: No changes to video files')
+
+    result.save()
 
     with get_db_session(commit=True) as session:
         channel = session.query(Channel).filter_by(id=channel.id).one()
@@ -77,7 +99,7 @@ def refresh_channel_videos(channel: Channel):
     apply_info_json(channel.id)
 
 
-def refresh_no_channel_videos():
+def refresh_no_channel_videos(full: bool = False):
     """
     Refresh the Videos in the NO CHANNEL directory.
     """
@@ -86,13 +108,16 @@ def refresh_no_channel_videos():
     if not directory.is_dir():
         return
 
+    result = scan_manifest.scan('no-channel', directory, full=full)
+    if not result.changed and not full:
+        logger.info('No changes to NO CHANNEL video files')
+        return
+
     logger.info('Refreshing NO CHANNEL videos')
 
     idempotency = str(uuid1())
 
-    # Get all WROLPi compatible videos, remove any duplicates (different formats).
-    possible_new_paths = generate_video_paths(directory)
-    possible_new_paths = remove_duplicate_video_paths(possible_new_paths)
+    possible_new_paths = get_video_paths(result)
 
     new_paths = [str(i) for i in possible_new_paths]
     with get_db_curs(commit=True) as curs:
@@ -102,11 +127,7 @@ def refresh_no_channel_videos():
 
     new_videos = {i for i in possible_new_paths if str(i) not in existing_paths}
 
-    for chunk in chunks(new_videos, 20):
-        with get_db_session(commit=True) as session:
-            for video_path in chunk:
-                upsert_video(session, pathlib.Path(video_path), idempotency=idempotency)
-                logger.debug(f'Added NO CHANNEL video {video_path}')
+    bulk_upsert_videos(new_videos, idempotency=idempotency)
 
     with get_db_curs(commit=True) as curs:
         curs.execute('DELETE FROM video WHERE channel_id IS NULL AND idempotency IS NULL RETURNING id')
@@ -116,6 +137,146 @@ def refresh_no_channel_videos():
         deleted_status = f'Deleted {deleted_count} video records in NO CHANNEL.'
         logger.info(deleted_status)
 
+    result.save()
+
+
+def bulk_upsert_videos(video_paths: Iterable[pathlib.Path], channel: Channel = None, idempotency: str = None) -> int:
+    """
+    Insert many new video files into the DB using as few statements as possible.  This is the bulk version of
+    `upsert_video`.
+
+    Any Video which shares a source_id with a video file (i.e. a Video from a Channel's catalog) will be given that
+    video file.  All other video files will be inserted as new Videos.
+
+    The Videos are not validated, `validate_videos` should be called after this.
+
+    Returns the count of Videos that were inserted or updated.
+    """
+    video_paths = sorted(pathlib.Path(i) for i in video_paths)
+    if not video_paths:
+        return 0
+
+    channel_directory = str(channel.directory.path) if channel else None
+    channel_id = channel.id if channel else None
+
+    # Meta-files share a directory with their video file, list each directory only once.
+    directory_names = {i: set(os.listdir(i)) for i in {j.parent for j in video_paths}}
+
+    rows = dict()
+    for video_path in video_paths:
+        if not video_path.is_absolute():
+            raise ValueError(f'Video path is not absolute: {video_path}')
+        if channel and not str(video_path).startswith(channel_directory):
+            raise ValueError(f'Video path is not within its channel {video_path=} not in {channel.directory=}')
+
+        poster_path, description_path, caption_path, info_json_path = \
+            find_meta_files(video_path, directory_names[video_path.parent])
+        _, _, source_id, _ = parse_video_file_name(video_path)
+        rows[str(video_path)] = (
+            source_id,
+            str(video_path),
+            str(poster_path) if poster_path else None,
+            str(description_path) if description_path else None,
+            str(caption_path) if caption_path else None,
+            str(info_json_path) if info_json_path else None,
+        )
+
+    with get_db_session(commit=True) as session:
+        # Use the Session's connection so any pending changes of the Session will be used.
+        session.flush()
+        curs = session.connection().connection.cursor()
+
+        # A Video may already be in the DB (from a Channel's catalog), match them by their source_id.  Do not steal a
+        # Video that was already claimed by this refresh.
+        updated_paths = set()
+        matching_rows = [i for i in rows.values() if i[0]]
+        if matching_rows:
+            # `execute_values` only supports one placeholder, the other params are formatted here.
+            stmt = curs.mogrify('''
+                UPDATE video
+                SET
+                    video_path = v.video_path,
+                    poster_path = v.poster_path,
+                    description_path = v.description_path,
+                    caption_path = v.caption_path,
+                    info_json_path = v.info_json_path,
+                    channel_id = COALESCE(%(channel_id)s::INTEGER, video.channel_id),
+                    idempotency = %(idempotency)s,
+                    validated = false,
+                    validation_failed = false
+                FROM (VALUES %%s)
+                    AS v(source_id, video_path, poster_path, description_path, caption_path, info_json_path)
+                WHERE
+                    video.source_id = v.source_id
+                    AND video.idempotency IS DISTINCT FROM %(idempotency)s
+                RETURNING v.video_path
+            ''', dict(channel_id=channel_id, idempotency=idempotency)).decode()
+            updated = execute_values(curs, stmt, matching_rows, page_size=len(matching_rows), fetch=True)
+            updated_paths = {i for (i,) in updated}
+
+        # Insert all videos which could not be matched.
+        new_rows = [(*v, channel_id, idempotency) for k, v in rows.items() if k not in updated_paths]
+        if new_rows:
+            stmt = '''
+                INSERT INTO video (source_id, video_path, poster_path, description_path, caption_path, info_json_path,
+                    channel_id, idempotency, validated, censored)
+                VALUES %s
+            '''
+            template = '(%s, %s, %s, %s, %s, %s, %s, %s, false, false)'
+            execute_values(curs, stmt, new_rows, template=template, page_size=len(new_rows))
+
+    name = channel.name if channel else 'NO CHANNEL'
+    logger.debug(f'{name}: Updated {len(updated_paths)} and inserted {len(new_rows)} videos')
+
+    return len(rows)
+
+
+# The extensions of the files which accompany a video file.
+META_EXTENSIONS = ('.info.json', '.description', '.en.vtt', '.en.srt', '.jpg', '.jpeg', '.webp', '.png')
+
+
+def find_video_of_meta_file(path: pathlib.Path) -> Optional[pathlib.Path]:
+    """Find the video file which the meta file (i.e. poster, info json) accompanies."""
+    for meta_ext in META_EXTENSIONS:
+        if path.name.endswith(meta_ext):
+            stem = path.name[:-len(meta_ext)]
+            for ext in VIDEO_EXTENSIONS:
+                if (video_path := path.with_name(f'{stem}.{ext}')).is_file():
+                    return video_path
+            return None
+    return None
+
+
+@watch_handler
+def videos_watch_handler(created: List[pathlib.Path], deleted: List[pathlib.Path]):
+    """Upsert any videos (or their meta files) that were created in a Channel's directory, or the NO CHANNEL
+    directory.  Delete any Videos whose files were deleted."""
+    video_paths = set()
+    for path in created:
+        if match_video_extensions(path.name):
+            video_paths.add(path)
+        elif video_path := find_video_of_meta_file(path):
+            video_paths.add(video_path)
+
+    if video_paths:
+        no_channel_directory = get_no_channel_directory()
+        with get_db_session(commit=True) as session:
+            channels = session.query(Channel).all()
+            for video_path in sorted(video_paths):
+                channel = next((i for i in channels if i.directory and i.directory.path in video_path.parents), None)
+                if not channel and no_channel_directory not in video_path.parents:
+                    # Videos are only found in these directories.
+                    continue
+                if not video_path.is_file():
+                    continue
+                existing = session.query(Video).filter_by(video_path=video_path).one_or_none()
+                upsert_video(session, video_path, channel, id_=existing.id if existing else None)
+                logger.debug(f'Upserted video {video_path}')
+
+    if deleted:
+        with get_db_curs(commit=True) as curs:
+            delete_paths(curs, 'video', 'video_path', deleted)
+
 
 def process_video_info_json(video: Video):
     """
@@ -133,27 +294,72 @@ def process_video_info_json(video: Video):
     return title, duration, view_count, url
 
 
-def validate_videos():
+def _validate_videos_batch(video_ids: List[int]) -> int:
+    """Validate a batch of Videos in their own session.  The results are committed when the batch is complete."""
+    with get_db_session(commit=True) as session:
+        videos = session.query(Video).filter(Video.id.in_(video_ids)).all()
+        for video in videos:
+            video.validate()
+    return len(video_ids)
+
+
+def validate_videos(progress_queue: Queue = None):
     """
     Validate all Videos not yet validated.  A Video is validated when we have attempted to find its: title, duration,
     view_count, url, caption, size.  A Video is also valid when it has a JPEG poster, if any.  If no poster can be
     found, it will be generated from the video file.
 
     This function marks the Video as validated, even if no data can be found so a Video will not be validated multiple
-    times.
+    times.  A Video which fails validation is marked, so it will not be validated again until its files change.
+
+    Batches of Videos are validated concurrently, each batch is committed when it is complete.  Calling this again
+    will resume validation of any Videos which were not committed.  Progress is sent to `progress_queue`, if provided.
     """
+    with VALIDATION_LOCK:
+        _validate_videos(progress_queue)
+
+
+def _validate_videos(progress_queue: Optional[Queue]):
     with get_db_curs() as curs:
-        curs.execute('SELECT id FROM video WHERE video_path IS NOT NULL AND validated IS FALSE')
+        curs.execute('SELECT id FROM video WHERE video_path IS NOT NULL AND validated IS FALSE'
+                     ' AND validation_failed IS NOT TRUE ORDER BY id')
         video_ids = [i['id'] for i in curs.fetchall()]
-        curs.execute('SELECT id, generate_posters FROM channel')
-        channel_generate_posters = {i['id']: i['generate_posters'] for i in curs.fetchall()}
 
-    logger.info(f'Validating {len(video_ids)} videos.')
-    for chunk in chunks(video_ids, 20):
-        with get_db_session(commit=True) as session:
-            videos = session.query(Video).filter(Video.id.in_(chunk)).all()
-            for video in videos:
-                video.validate()
+    total = len(video_ids)
+    logger.info(f'Validating {total} videos.')
+    if not total:
+        return
+
+    def send_progress(validated: int):
+        if progress_queue:
+            try:
+                progress_queue.put_nowait({'code': 'validating', 'validated': validated, 'total': total})
+            except Full:
+                # Nobody is listening to the feed.
+                pass
+
+    batches = chunks(video_ids, VALIDATION_BATCH_SIZE)
+    validated = 0
+    send_progress(validated)
+    if PYTEST:
+        # Tests share a single session, which cannot be used by multiple threads.
+        for batch in batches:
+            validated += _validate_videos_batch(batch)
+            send_progress(validated)
+    else:
+        # Validation is mostly spent waiting on ffprobe/ffmpeg, so threads can keep each CPU busy.  Each thread uses
+        # its own DB connection, don't use more threads than the pool allows.
+        max_workers = min(cpu_count(), DB_POOL_SIZE)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_validate_videos_batch, i) for i in batches]
+            for future in as_completed(futures):
+                try:
+                    validated += future.result()
+                except Exception as e:
+                    logger.error('Failed to validate batch of videos', exc_info=e)
+                send_progress(validated)
+
+    logger.info(f'Validated {validated} videos.')
 
 
 def validate_video(video: Video, channel_generate_poster: bool):
@@ -162,6 +368,9 @@ def validate_video(video: Video, channel_generate_poster: bool):
     view_count, url, caption, size.  A Video is also valid when it has a JPEG poster, if any.  If no poster can be
     found, it will be generated from the video file.
     """
+    # Store the info json which is used by the API, so the file will not need to be read again.
+    video.set_minimized_info_json()
+
     if not video.title or not video.duration or not video.view_count or not video.url:
         # These properties can be found in the info json.
         title, duration, view_count, url = process_video_info_json(video)
@@ -247,11 +456,32 @@ def convert_or_generate_poster(video: Video) -> Optional[pathlib.Path]:
             logger.error(f'Failed to generate poster for {video}', exc_info=e)
 
 
-def refresh_videos(channel_ids: List[int] = None):
+def fill_minimized_info_json():
+    """Store the minimized info json of any Videos which were validated before it was stored during validation."""
+    with get_db_curs() as curs:
+        curs.execute('SELECT id FROM video WHERE info_json_path IS NOT NULL AND minimized_info_json IS NULL'
+                     ' ORDER BY id')
+        video_ids = [i['id'] for i in curs.fetchall()]
+
+    if not video_ids:
+        return
+
+    logger.info(f'Storing info json of {len(video_ids)} videos.')
+    for batch in chunks(video_ids, VALIDATION_BATCH_SIZE):
+        with get_db_session(commit=True) as session:
+            for video in session.query(Video).filter(Video.id.in_(batch)):
+                video.set_minimized_info_json()
+    logger.info(f'Stored info json of {len(video_ids)} videos.')
+
+
+def refresh_videos(channel_ids: List[int] = None, progress_queue: Queue = None, full: bool = False):
     """
     Find any videos in the channel directories and add them to the DB.  Delete DB records of any videos not in the
     file system.
 
+    Validation progress is sent to `progress_queue`, if provided.  Unchanged directories are skipped unless `full` is
+    True.
+
     Yields status updates to be passed to the UI.
 
     :return:
@@ -272,20 +502,20 @@ def refresh_videos(channel_ids: List[int] = None):
 
     for channel in channels:
         try:
-            refresh_channel_videos(channel)
+            refresh_channel_videos(channel, full=full)
         except Exception as e:
             logger.fatal(f'Failed to refresh videos for channel {channel.name}!', exc_info=e)
             pass
 
     if not channel_ids:
         # Refresh NO CHANNEL videos when not refreshing a specific channel.
-        refresh_no_channel_videos()
+        refresh_no_channel_videos(full=full)
 
     # Fill in any missing data for all videos.
     if not PYTEST:
         import_channels_config()
 
-    validate_videos()
+    validate_videos(progress_queue)
 
     logger.info('Refresh of video files complete')
 
@@ -348,6 +578,7 @@ class VideoDownloaderConfig(ConfigFile):
         continue_dl=True,
         dateafter='19900101',
         file_name_format='%(uploader)s_%(upload_date)s_%(id)s_%(title)s.%(ext)s',
+        in_process=False,
         nooverwrites=True,
         quiet=False,
         writeautomaticsub=True,
@@ -381,6 +612,15 @@ class VideoDownloaderConfig(ConfigFile):
     def file_name_format(self, value: str):
         self.update({'file_name_format': value})
 
+    @property
+    def in_process(self) -> bool:
+        """Download videos in a fork of WROLPi using the info already extracted, rather than running the yt-dlp CLI."""
+        return self._config['in_process']
+
+    @in_process.setter
+    def in_process(self, value: bool):
+        self.update({'in_process': value})
+
     @property
     def nooverwrites(self) -> bool:
         return self._config['nooverwrites']
@@ -747,11 +987,15 @@ def upsert_video(session: Session, video_path: pathlib.Path, channel: Channel =
     return video
 
 
-def find_meta_files(path: pathlib.Path) -> Tuple[pathlib.Path, pathlib.Path, pathlib.Path, pathlib.Path]:
+def find_meta_files(path: pathlib.Path, names: Set[str] = None) \
+        -> Tuple[pathlib.Path, pathlib.Path, pathlib.Path, pathlib.Path]:
     """
     Find all files that share a file's full path, except their extensions.  It is assumed that file with the
     same name, but different extension is related to that file.  A None will be yielded if the meta file doesn't exist.
 
+    `names` may be the names of all files in the path's directory, this avoids checking the file system for each meta
+    file.
+
     Example:
         >>> foo = pathlib.Path('foo.bar')
         >>> find_meta_files(foo)
@@ -764,7 +1008,7 @@ def find_meta_files(path: pathlib.Path) -> Tuple[pathlib.Path, pathlib.Path, pat
     for meta_exts in meta_file_exts:
         for meta_ext in meta_exts:
             meta_path = path.with_suffix(meta_ext)
-            if meta_path.exists():
+            if (meta_path.name in names) if names is not None else meta_path.exists():
                 yield meta_path
                 break
         else:
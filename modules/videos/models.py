@@ -16,6 +16,61 @@ from wrolpi.media_path import MediaPathType, MediaPath
 
 logger = logger.getChild(__name__)
 
+# Stored in `Video.minimized_info_json` when the info_json file could not be read, so it is not read again.
+UNREADABLE_INFO_JSON = False
+
+# The columns of a Video which are sent out the API.
+VIDEO_JSON_COLUMNS = (
+    'caption_path', 'channel_id', 'duration', 'favorite', 'id', 'modification_datetime', 'poster_path', 'size',
+    'source_id', 'title', 'upload_date', 'url', 'validated', 'video_path', 'view_count', 'viewed',
+)
+
+
+def video_json(channel, info_json: Optional[dict], **columns) -> dict:
+    """Build the dict of a Video that is sent out the API.  The columns may be from a Video, or from a row of a query
+    (see `VIDEO_JSON_COLUMNS`)."""
+    d = {i: columns[i] for i in VIDEO_JSON_COLUMNS}
+    video_path = columns['video_path']
+    d.update(
+        channel=channel,
+        info_json=info_json,
+        stem=video_path.path.stem if video_path else None,
+    )
+    return d
+
+
+def read_info_json(info_json_path) -> Optional[dict]:
+    """Read the contents of an info_json file.  Returns None if the file cannot be read."""
+    if not info_json_path:
+        return
+
+    try:
+        info_json_path = info_json_path.path if isinstance(info_json_path, MediaPath) else info_json_path
+        with open(info_json_path, 'rb') as fh:
+            contents = json.load(fh)
+            return contents
+    except UnknownFile:
+        pass
+    except UnknownDirectory:
+        pass
+    except Exception as e:
+        logger.warning(f'Unable to parse info json {info_json_path}', exc_info=e)
+        return None
+
+
+def get_minimized_info_json(minimized_info_json, info_json_path) -> Optional[dict]:
+    """Get the minimized info_json of a Video from its columns.  The info_json file is only read if the minimized
+    info_json has not been stored."""
+    if minimized_info_json is UNREADABLE_INFO_JSON:
+        return None
+    if minimized_info_json is not None:
+        return minimized_info_json
+    if not info_json_path:
+        return None
+
+    from modules.videos.common import minimize_video_info_json
+    return minimize_video_info_json(read_info_json(info_json_path))
+
 
 class Video(ModelHelper, Base):
     __tablename__ = 'video'
@@ -24,6 +79,8 @@ class Video(ModelHelper, Base):
     channel = relationship('Channel', primaryjoin='Video.channel_id==Channel.id', back_populates='videos')
     idempotency = Column(String)
     validated = Column(Boolean, default=False)
+    # Validation raised an error, the Video will not be validated again until its files change.
+    validation_failed = Column(Boolean, default=False)
 
     # File paths
     caption_path = Column(MediaPathType)
@@ -45,6 +102,8 @@ class Video(ModelHelper, Base):
     url = Column(String)
     view_count = Column(Integer)
     viewed = Column(TZDateTime)
+    # The minimized contents of the info_json file, stored during validation.  See `set_minimized_info_json`.
+    minimized_info_json = Column(JSON)
 
     textsearch = deferred(
         Column(tsvector, Computed('''to_tsvector('english'::regconfig,
@@ -62,7 +121,8 @@ class Video(ModelHelper, Base):
         d = super().dict()
         if self.channel_id:
             d['channel'] = self.channel.dict()
-        d['info_json'] = self.get_info_json()
+        del d['minimized_info_json']
+        d['info_json'] = self.get_minimized_info_json()
         return d
 
     def get_minimize(self) -> dict:
@@ -97,6 +157,10 @@ class Video(ModelHelper, Base):
         """
         Remove all files related to this video.  Add it to it's Channel's skip list.
         """
+        if self.video_path:
+            from modules.videos.common import evict_video_probe
+            evict_video_probe(self.video_path.path)
+
         for path in self.my_paths():
             path.unlink(missing_ok=True)
 
@@ -128,29 +192,28 @@ class Video(ModelHelper, Base):
 
     def get_info_json(self) -> Optional[JSON]:
         """If this Video has an info_json file, return it's contents.  Otherwise, return None."""
+        return read_info_json(self.info_json_path)
+
+    def get_minimized_info_json(self) -> Optional[dict]:
+        """Get the minimized info_json of this Video.  The info_json file is only read if it has not been stored."""
+        return get_minimized_info_json(self.minimized_info_json, self.info_json_path)
+
+    def set_minimized_info_json(self):
+        """Store the minimized info_json of this Video, so the info_json file will not need to be read again."""
         if not self.info_json_path:
+            self.minimized_info_json = None
             return
 
-        try:
-            info_json_path = self.info_json_path.path if \
-                isinstance(self.info_json_path, MediaPath) else self.info_json_path
-            with open(info_json_path, 'rb') as fh:
-                contents = json.load(fh)
-                return contents
-        except UnknownFile:
-            pass
-        except UnknownDirectory:
-            pass
-        except Exception as e:
-            logger.warning(f'Unable to parse info json {self.info_json_path}', exc_info=e)
-            return None
+        from modules.videos.common import minimize_video_info_json
+        info_json = minimize_video_info_json(self.get_info_json())
+        self.minimized_info_json = UNREADABLE_INFO_JSON if info_json is None else info_json
 
     def get_video_description(self) -> Optional[str]:
         """
         Get the Video description from the file system.
         """
-        # First try to get description from info_json file.
-        info_json = self.get_info_json()
+        # First try to get description from info_json.
+        info_json = self.get_minimized_info_json()
         if info_json:
             description = info_json.get('description')
             if description:
@@ -228,32 +291,8 @@ class Video(ModelHelper, Base):
         return previous_video, next_video
 
     def __json__(self):
-        from modules.videos.common import minimize_video_info_json
-        info_json = minimize_video_info_json(self.get_info_json()) if self.info_json_path else None
-        stem = self.video_path.path.stem if self.video_path else None
-
-        d = dict(
-            caption_path=self.caption_path,
-            channel=self.channel,
-            channel_id=self.channel_id,
-            modification_datetime=self.modification_datetime,
-            duration=self.duration,
-            favorite=self.favorite,
-            id=self.id,
-            info_json=info_json,
-            poster_path=self.poster_path,
-            size=self.size,
-            source_id=self.source_id,
-            stem=stem,
-            title=self.title,
-            upload_date=self.upload_date,
-            url=self.url,
-            validated=self.validated,
-            video_path=self.video_path,
-            view_count=self.view_count,
-            viewed=self.viewed,
-        )
-        return d
+        columns = {i: getattr(self, i) for i in VIDEO_JSON_COLUMNS}
+        return video_json(self.channel, self.get_minimized_info_json(), **columns)
 
     def validate(self):
         """Perform a validation of this video and it's files.  Mark this video as validated if no errors occur."""
@@ -265,8 +304,10 @@ class Video(ModelHelper, Base):
         try:
             validate_video(self, self.channel.generate_posters if self.channel else False)
             self.validated = True
+            self.validation_failed = False
         except Exception as e:
             logger.warning(f'Failed to validate video {self}', exc_info=e)
+            self.validation_failed = True
 
         return self.validated
 
@@ -296,6 +337,8 @@ class Channel(ModelHelper, Base):
 
     info_json = Column(JSON)
     info_date = Column(Date)
+    # The date of the last full catalog of this Channel, see `update_channel_catalog`.
+    full_catalog_date = Column(Date)
 
     videos: InstrumentedList = relationship('Video', primaryjoin='Channel.id==Video.channel_id')
 
@@ -425,3 +468,31 @@ class Channel(ModelHelper, Base):
             largest_video=largest_video,
         )
         return statistics
+
+
+class ChannelEntry(Base):
+    """A video in the catalog of a Channel.  These are the entries of the Channel's info_json."""
+    __tablename__ = 'channel_entry'
+    channel_id = Column(Integer, ForeignKey('channel.id', ondelete='CASCADE'), primary_key=True)
+    source_id = Column(String, primary_key=True)
+
+    title = Column(String)
+    url = Column(String)
+    view_count = Column(Integer)
+    duration = Column(Integer)
+    upload_date = Column(Date)
+
+    def __repr__(self):
+        return f'<ChannelEntry channel_id={self.channel_id} source_id={repr(self.source_id)}>'
+
+    def entry(self) -> dict:
+        """Get this entry as it would be in a Channel's info_json."""
+        d = dict(
+            id=self.source_id,
+            title=self.title,
+            url=self.url,
+            view_count=self.view_count,
+            duration=self.duration,
+            upload_date=self.upload_date.strftime('%Y%m%d') if self.upload_date else None,
+        )
+        return d
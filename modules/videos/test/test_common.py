@@ -131,7 +131,7 @@ def test_is_valid_poster(ext, expected, test_directory):
     assert is_valid_poster(image_path) == expected, f'is_valid_poster({image_path}) should be {expected}'
 
 
-def test_update_view_count(test_session, channel_factory, video_factory):
+def test_update_view_count(test_session, channel_factory, video_factory, set_channel_catalog):
     def check_view_counts(view_counts):
         for source_id, view_count in view_counts.items():
             video = test_session.query(Video).filter_by(source_id=source_id).one()
@@ -142,10 +142,10 @@ def test_update_view_count(test_session, channel_factory, video_factory):
     video_factory(channel_id=channel2.id, title='vid2')
     video_factory(channel_id=channel3.id, with_poster_ext='jpg', title='vid3')
     video_factory(channel_id=channel3.id, title='vid4')
-    channel1.info_json = {'entries': [{'id': 'vid1', 'view_count': 10}]}
-    channel2.info_json = {'entries': [{'id': 'vid2', 'view_count': 11}, {'id': 'bad_id', 'view_count': 12}]}
-    channel3.info_json = {'entries': [{'id': 'vid3', 'view_count': 13}, {'id': 'vid4', 'view_count': 14}]}
     test_session.commit()
+    set_channel_catalog(channel1, [{'id': 'vid1', 'view_count': 10}])
+    set_channel_catalog(channel2, [{'id': 'vid2', 'view_count': 11}, {'id': 'bad_id', 'view_count': 12}])
+    set_channel_catalog(channel3, [{'id': 'vid3', 'view_count': 13}, {'id': 'vid4', 'view_count': 14}])
 
     # Check all videos are empty.
     check_view_counts({'vid1': None, 'vid2': None, 'vid3': None, 'vid4': None})
@@ -180,7 +180,7 @@ def test_generate_video_poster(video_file):
     assert poster_path.stat().st_size > 0
 
 
-def test_update_censored_videos(test_session, video_factory, simple_channel):
+def test_update_censored_videos(test_session, video_factory, simple_channel, set_channel_catalog):
     vid1 = video_factory(channel_id=simple_channel.id)
     vid2 = video_factory(channel_id=simple_channel.id)
     vid3 = video_factory(channel_id=simple_channel.id)
@@ -197,49 +197,36 @@ def test_update_censored_videos(test_session, video_factory, simple_channel):
     apply_info_json(simple_channel.id)
     check_censored([(vid1.id, False), (vid2.id, False), (vid3.id, False), (vid4.id, False)])
 
-    # All videos are in the info_json.
-    simple_channel.info_json = {
-        'entries': [
-            dict(id=vid1.source_id, view_count=0),
-            dict(id=vid2.source_id, view_count=0),
-            dict(id=vid3.source_id, view_count=0),
-        ]
-    }
-    test_session.commit()
+    # All videos are in the catalog.
+    set_channel_catalog(simple_channel, [
+        dict(id=vid1.source_id, view_count=0),
+        dict(id=vid2.source_id, view_count=0),
+        dict(id=vid3.source_id, view_count=0),
+    ])
 
     apply_info_json(simple_channel.id)
     check_censored([(vid1.id, False), (vid2.id, False), (vid3.id, False), (vid4.id, False)])
 
-    simple_channel.info_json = {
-        'entries': [
-            dict(id=vid1.source_id, view_count=0),  # vid2 is missing
-            dict(id=vid3.source_id, view_count=0),
-        ]
-    }
-    test_session.commit()
+    set_channel_catalog(simple_channel, [
+        dict(id=vid1.source_id, view_count=0),  # vid2 is missing
+        dict(id=vid3.source_id, view_count=0),
+    ])
     apply_info_json(simple_channel.id)
     check_censored([(vid1.id, False), (vid2.id, True), (vid3.id, False), (vid4.id, False)])
 
-    simple_channel.info_json = {
-        'entries': [
-            dict(id=vid1.source_id, view_count=0),  # vid2 is back, vid3 is missing.
-            dict(id=vid2.source_id, view_count=0),
-        ]
-    }
-    test_session.commit()
+    set_channel_catalog(simple_channel, [
+        dict(id=vid1.source_id, view_count=0),  # vid2 is back, vid3 is missing.
+        dict(id=vid2.source_id, view_count=0),
+    ])
     apply_info_json(simple_channel.id)
     check_censored([(vid1.id, False), (vid2.id, False), (vid3.id, True), (vid4.id, False)])
 
-    simple_channel.info_json = {
-        'entries': []  # all videos gone
-    }
-    test_session.commit()
+    set_channel_catalog(simple_channel, [])  # all videos gone
     apply_info_json(simple_channel.id)
     check_censored([(vid1.id, True), (vid2.id, True), (vid3.id, True), (vid4.id, False)])
 
-    # Channels without info json preserve their last censored.
-    simple_channel.info_json = None
-    test_session.commit()
+    # Channels without a catalog preserve their last censored.
+    set_channel_catalog(simple_channel, None)
     apply_info_json(simple_channel.id)
     check_censored([(vid1.id, True), (vid2.id, True), (vid3.id, True), (vid4.id, False)])
 
@@ -433,11 +420,37 @@ def test_check_for_video_corruption(video_file, test_directory):
     assert common.check_for_video_corruption(truncated_video) is True
 
     # Check for specific ffprobe errors.
-    with mock.patch('modules.videos.common.subprocess') as mock_subprocess:
+    with mock.patch('modules.videos.common.get_video_probe') as mock_get_video_probe:
         # `video_file` is ignored for these calls.
-        mock_subprocess.run().stderr = b'Something\nInvalid NAL unit size'
+        mock_get_video_probe.return_value = dict(returncode=0, stderr='Something\nInvalid NAL unit size')
         assert common.check_for_video_corruption(video_file) is True
-        mock_subprocess.run().stderr = b'Something\nError splitting the input into NAL units'
+        mock_get_video_probe.return_value = dict(returncode=0,
+                                                 stderr='Something\nError splitting the input into NAL units')
         assert common.check_for_video_corruption(video_file) is True
-        mock_subprocess.run().stderr = b'Some stderr is fine'
+        mock_get_video_probe.return_value = dict(returncode=0, stderr='Some stderr is fine')
+        assert common.check_for_video_corruption(video_file) is False
+
+
+def test_get_video_probe_cache(video_file, test_directory):
+    """ffprobe is only run once for each version of a video file."""
+    with mock.patch('modules.videos.common.ffprobe_video', wraps=common.ffprobe_video) as mock_ffprobe_video:
+        assert common.get_video_duration(video_file) == 5
         assert common.check_for_video_corruption(video_file) is False
+        info = common.get_video_info(video_file)
+        assert info['duration'] == 5
+        assert (info['width'], info['height']) == (1280, 720)
+        assert info['video_codec'] == 'h264'
+        assert info['bit_rate']
+        assert mock_ffprobe_video.call_count == 1
+
+        # The video file changed, it is probed again.
+        with video_file.open('ab') as fh:
+            fh.write(b'more bytes')
+        common.get_video_duration(video_file)
+        assert mock_ffprobe_video.call_count == 2
+
+        # The cached results are removed.
+        common.evict_video_probe(video_file)
+        assert not common.get_probe_cache_file(video_file).exists()
+        common.get_video_duration(video_file)
+        assert mock_ffprobe_video.call_count == 3
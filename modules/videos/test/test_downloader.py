@@ -1,6 +1,7 @@
 import pathlib
 import shutil
 from copy import copy
+from datetime import timedelta
 from itertools import zip_longest
 from unittest import mock
 
@@ -9,8 +10,11 @@ from yt_dlp.utils import UnsupportedError
 
 from modules.videos.channel.lib import download_channel
 from modules.videos.downloader import find_all_missing_videos, VideoDownloader, \
-    ChannelDownloader, get_or_create_channel, channel_downloader
-from modules.videos.models import Channel, Video
+    ChannelDownloader, get_or_create_channel, channel_downloader, ydl_download, update_channel_catalog, \
+    FULL_CATALOG_DAYS
+from modules.videos.lib import get_downloader_config
+from modules.videos.models import Channel, Video, ChannelEntry
+from wrolpi.dates import today
 from wrolpi.db import get_db_context
 from wrolpi.downloader import DownloadManager, Download, DownloadResult
 from wrolpi.errors import InvalidDownload
@@ -19,10 +23,9 @@ from wrolpi.test.test_downloader import HTTPDownloader
 from wrolpi.vars import PROJECT_DIR
 
 
-def test_find_all_missing_videos(test_session, channel_factory, video_factory):
+def test_find_all_missing_videos(test_session, channel_factory, video_factory, set_channel_catalog):
     channel1 = channel_factory(url='some url')
-    channel1.info_json = {'entries': [{'id': 'foo', 'view_count': 0}]}
-    test_session.commit()
+    set_channel_catalog(channel1, [{'id': 'foo', 'title': 'foo title', 'view_count': 0, 'upload_date': '20220801'}])
 
     # Two videos are already downloaded.
     video_factory()
@@ -44,7 +47,12 @@ def test_find_all_missing_videos(test_session, channel_factory, video_factory):
     # Two videos were created for this test already.
     assert id_ == 3
     # The fake entry we added is regurgitated back.
-    assert entry == channel1.info_json['entries'][0]
+    assert entry == dict(id='foo', title='foo title', url=None, view_count=0, duration=None, upload_date='20220801')
+
+    # A video which is not in the catalog cannot be downloaded.
+    test_session.add(Video(title='not in catalog', channel_id=channel1.id, source_id='bar'))
+    test_session.commit()
+    assert [i[1] for i in find_all_missing_videos(channel1.id)] == ['foo']
 
 
 example_video_json = {
@@ -202,6 +210,60 @@ async def test_download_channel(test_session, simple_channel, video_download_man
         assert download.status == 'complete'
 
 
+def test_update_channel_catalog(test_session, simple_channel, video_factory):
+    """A full catalog of a Channel is fetched the first time, after that only the newest entries are fetched."""
+    fetched = []
+
+    def make_info(source_ids, view_count=0):
+        def entries():
+            for source_id in source_ids:
+                fetched.append(source_id)
+                yield dict(id=source_id, title=f'{source_id} title', url=f'https://example.com/{source_id}',
+                           view_count=view_count)
+
+        return dict(id='channel id', entries=entries())
+
+    def assert_catalog(expected):
+        entries = test_session.query(ChannelEntry).filter_by(channel_id=simple_channel.id)
+        assert {i.source_id: i.view_count for i in entries} == expected
+
+    vid1 = video_factory(channel_id=simple_channel.id, title='1')
+    test_session.commit()
+
+    # The first catalog is a full catalog.  Videos are created for the new entries.
+    update_channel_catalog(simple_channel, make_info([str(i) for i in range(10)]))
+    assert fetched == [str(i) for i in range(10)]
+    assert_catalog({str(i): 0 for i in range(10)})
+    assert (simple_channel.directory.path / 'Simple Channel.info.json').is_file()
+    assert {i.source_id for i in test_session.query(Video)} == {str(i) for i in range(10)}
+    assert 'entries' not in test_session.query(Channel).one().info_json
+
+    # Only the newest entries are fetched.  Catalog entries which were not fetched are not deleted.
+    yesterday = today() - timedelta(days=1)
+    simple_channel.info_date = simple_channel.full_catalog_date = yesterday
+    test_session.commit()
+    fetched.clear()
+    test_session.expire_all()
+    with mock.patch('modules.videos.downloader.KNOWN_ENTRIES_STOP', 3):
+        update_channel_catalog(simple_channel, make_info(['new'] + [str(i) for i in range(2, 10)], view_count=5))
+    assert fetched == ['new', '2', '3', '4']
+    assert_catalog({'new': 5, '0': 0, '1': 0, '2': 5, '3': 5, '4': 5, '5': 0, '6': 0, '7': 0, '8': 0, '9': 0})
+    assert test_session.query(Video).filter_by(source_id='new').count() == 1
+    assert not test_session.query(Video).filter_by(id=vid1.id).one().censored
+    # The catalog was updated, but it was not a full catalog.
+    assert simple_channel.info_date == today()
+    assert simple_channel.full_catalog_date == yesterday
+
+    # A full catalog is fetched again after FULL_CATALOG_DAYS.  Missing entries are deleted, their videos are censored.
+    fetched.clear()
+    simple_channel.full_catalog_date = today() - timedelta(days=FULL_CATALOG_DAYS)
+    test_session.commit()
+    update_channel_catalog(simple_channel, make_info(['new'] + [str(i) for i in range(2, 10)]))
+    assert fetched == ['new'] + [str(i) for i in range(2, 10)]
+    assert_catalog({i: 0 for i in ['new'] + [str(i) for i in range(2, 10)]})
+    assert test_session.query(Video).filter_by(id=vid1.id).one().censored
+
+
 def test_get_or_create_channel(test_session):
     """
     A Channel may need to be created for an arbitrary download.  Attempt to use an existing Channel if we can
@@ -392,6 +454,38 @@ async def test_video_download_1(test_session, test_directory, simple_channel, vi
     assert video.video_path.path.is_absolute()
 
 
+@pytest.mark.asyncio
+async def test_video_download_in_process(test_session, test_directory, video_download_manager,
+                                         mock_video_process_runner, mock_video_extract_info, test_downloader_config):
+    """The yt-dlp CLI is not used when downloading in process, the extracted entry is downloaded in a fork."""
+    get_downloader_config().in_process = True
+
+    channel_directory = test_directory / 'videos/channel name'
+    channel_directory.mkdir(parents=True)
+    video_file = channel_directory / 'the video.mp4'
+    shutil.copy(PROJECT_DIR / 'test/big_buck_bunny_720p_1mb.mp4', video_file)
+
+    mock_video_extract_info.return_value = example_video_json
+    entry = {'id': 'foo'}
+    with mock.patch('modules.videos.downloader.VideoDownloader.prepare_filename') as mock_prepare_filename, \
+            mock.patch('modules.videos.downloader.VideoDownloader.fork_runner') as mock_fork_runner:
+        mock_prepare_filename.return_value = [video_file, entry]
+        mock_fork_runner.return_value = (0, {'stdout': b'', 'stderr': b'', 'downloaded_bytes': 1024})
+        video_download_manager.create_download('https://example.com')
+        await video_download_manager.wait_for_all_downloads()
+
+    mock_video_process_runner.assert_not_called()
+    url, target, (entry_, options) = mock_fork_runner.call_args[0]
+    assert url == 'https://example.com' and target == ydl_download and entry_ is entry
+    assert options['outtmpl'].startswith(str(channel_directory))
+    assert 'in_process' not in options
+
+    download: Download = test_session.query(Download).one()
+    assert download.status == 'complete'
+    attempt, = video_download_manager.get_download_attempts(download.id)
+    assert attempt.downloaded_bytes == 1024
+
+
 @pytest.mark.asyncio
 async def test_download_result(test_session, test_directory, video_download_manager, mock_video_process_runner,
                                mock_video_extract_info):
@@ -0,0 +1,64 @@
+import re
+
+import pytest
+
+from ..extractor_index import get_valid_url_hosts, ExtractorIndex
+
+
+@pytest.mark.parametrize('pattern,expected', [
+    (r'https?://(?:www\.)?youtube\.com/watch', ({'youtube.com', 'www.youtube.com'}, set())),
+    (r'https?://(?:www|m)\.example\.com/(?P<id>\d+)', ({'www.example.com', 'm.example.com'}, set())),
+    (r'https?://[a-z]+\.cbslocal\.com/', (set(), {'.cbslocal.com'})),
+    (r'''(?x)https?://(?:www\.)?example\.com  # The host.
+        (?:/videos)+/(?P<id>\d+)''', ({'example.com', 'www.example.com'}, set())),
+    # Anything may match.
+    (r'.*', None),
+    (r'https?://.+/video', None),
+    # The host may be followed by a query.
+    (r'https?://example\.com/?', None),
+    # "." matches any character.
+    (r'https?://t.co/', None),
+    # Some patterns do not require a URL.
+    (r'https?://(?:www\.)?youtube\.com/feed/recommended|:ytrec', None),
+])
+def test_get_valid_url_hosts(pattern, expected):
+    assert get_valid_url_hosts(pattern) == expected
+
+
+class FakeIE:
+    _VALID_URL = None
+
+    @classmethod
+    def suitable(cls, url):
+        return re.match(cls._VALID_URL, url) is not None
+
+    @classmethod
+    def _match_valid_url(cls, url):
+        return re.match(cls._VALID_URL, url)
+
+
+def make_ie(pattern: str):
+    return type('TestIE', (FakeIE,), {'_VALID_URL': pattern})
+
+
+def test_extractor_index(monkeypatch):
+    """Candidates of a URL are in the same order as the extractors."""
+    from modules.videos import extractor_index
+    monkeypatch.setattr(extractor_index, 'BASE_EXTRACTORS', (FakeIE,))
+
+    foo = make_ie(r'https?://(?:www\.)?foo\.com/(?P<id>\d+)')
+    any_host = make_ie(r'https?://.+/video/(?P<id>\d+)')
+    sub = make_ie(r'https?://[a-z]+\.foo\.com/(?P<id>\d+)')
+    bar = make_ie(r'https?://bar\.com/')
+    generic = make_ie(r'.*')
+    index = ExtractorIndex([foo, any_host, sub, bar, generic])
+
+    assert index.candidates('https://foo.com/1') == [foo, any_host, generic]
+    assert index.candidates('https://www.foo.com/1') == [foo, any_host, sub, generic]
+    assert index.candidates('https://a.b.foo.com/1') == [any_host, sub, generic]
+    assert index.candidates('https://bar.com/') == [any_host, bar, generic]
+    assert index.candidates('not a url') == [any_host, generic]
+
+    assert index.suitable('https://www.foo.com/1') == foo
+    assert index.suitable('https://bar.com/video/1') == any_host
+    assert index.suitable('https://baz.com/') == generic
@@ -1,11 +1,11 @@
 import json
 import pathlib
+import queue
 import shutil
 from datetime import datetime
 from unittest import mock
 
 import pytest
-import sqlalchemy
 
 from modules.videos import lib
 from modules.videos.common import apply_info_json
@@ -16,7 +16,7 @@ from wrolpi.dates import local_timezone
 from wrolpi.vars import PROJECT_DIR
 
 
-def test_search_censored_videos(test_session, simple_channel):
+def test_search_censored_videos(test_session, simple_channel, set_channel_catalog):
     for i in map(str, range(50)):
         test_session.add(Video(source_id=i, channel=simple_channel, video_path='foo'))
     vid = Video(source_id='51', video_path='bar')  # this should never be modified because it has no channel
@@ -24,9 +24,7 @@ def test_search_censored_videos(test_session, simple_channel):
     test_session.commit()
 
     def set_entries(entries):
-        simple_channel.info_json = {
-            'entries': [{'id': j, 'view_count': 0} for j in entries]} if entries else sqlalchemy.null()
-        test_session.commit()
+        set_channel_catalog(simple_channel, [{'id': j, 'view_count': 0} for j in entries])
         apply_info_json(simple_channel.id)
         test_session.commit()
 
@@ -49,6 +47,29 @@ def test_search_censored_videos(test_session, simple_channel):
     assert total == 25
 
 
+def test_video_search_json(test_session, simple_channel, video_factory):
+    """Search results are the same as `Video.__json__`, but are fetched in one query without the ORM."""
+    vid1 = video_factory(simple_channel.id, with_info_json={'description': 'foo', 'formats': []})
+    vid2 = video_factory()
+    test_session.commit()
+
+    def expected_json(video: Video) -> dict:
+        d = video.__json__()
+        d['channel'] = d['channel'].__json__() if d['channel'] else None
+        return d
+
+    videos, total = video_search(order_by='id')
+    assert total == 2
+    assert videos == [expected_json(vid1), expected_json(vid2)]
+    assert videos[0]['info_json'] == {'description': 'foo'}
+    assert videos[0]['channel'] == dict(id=simple_channel.id, name='Simple Channel',
+                                        directory=simple_channel.directory, url='https://example.com/channel1')
+
+    videos, total = video_search(order_by='-id', offset=1)
+    assert total == 2
+    assert [i['id'] for i in videos] == [vid1.id]
+
+
 def test_validate_videos(test_session, simple_channel, video_factory):
     """
     Videos that aren't validated should have their data filled in while being validated.
@@ -100,6 +121,13 @@ def test_validate_videos(test_session, simple_channel, video_factory):
     assert str(vid8.poster_path).endswith('.jpg')
     assert str(vid9.poster_path).endswith('.jpg')  # this was generated from the video file.
 
+    # The info json used by the API is stored, the file does not need to be read.
+    assert vid5.minimized_info_json == {'view_count': 42}
+    assert vid7.minimized_info_json is None
+    with mock.patch('modules.videos.models.read_info_json') as mock_read_info_json:
+        assert vid6.__json__()['info_json'] == {'webpage_url': 'https://example.com/webpage'}
+        mock_read_info_json.assert_not_called()
+
     vid1.title = None
     vid3.duration = None
     vid5.view_count = None
@@ -133,6 +161,30 @@ def test_validate_videos(test_session, simple_channel, video_factory):
     assert str(vid9.poster_path).endswith('.jpg')  # the generated file was rediscovered.
 
 
+def test_fill_minimized_info_json(test_session, simple_channel, video_factory):
+    """Videos which were validated before the info json was stored have their info json stored."""
+    vid1 = video_factory(simple_channel.id, with_info_json={'description': 'foo', 'formats': [1, 2, 3]})
+    vid2 = video_factory(simple_channel.id)
+    vid3 = video_factory(simple_channel.id, with_info_json=True)
+    vid3.info_json_path.write_text('not json')
+    test_session.commit()
+    assert vid1.minimized_info_json is None
+    # The file is read until the info json is stored.
+    assert vid1.__json__()['info_json'] == {'description': 'foo'}
+
+    lib.fill_minimized_info_json()
+    test_session.expire_all()
+    assert vid1.minimized_info_json == {'description': 'foo'}
+    assert vid2.minimized_info_json is None
+    assert vid1.get_video_description() == 'foo'
+
+    # An info json file which cannot be read is not read again.
+    assert vid3.minimized_info_json is False
+    with mock.patch('modules.videos.models.read_info_json') as mock_read_info_json:
+        assert vid3.__json__()['info_json'] is None
+        mock_read_info_json.assert_not_called()
+
+
 def test_validate_video_exception(test_session, simple_channel, video_factory):
     """
     Test that even if a Video cannot be validated, the other Videos will still be validated.
@@ -160,6 +212,80 @@ def test_validate_video_exception(test_session, simple_channel, video_factory):
     assert vid2.validated
     assert not vid3.validated
 
+    # A Video which failed validation is not validated again.
+    assert vid1.validation_failed
+    with mock.patch('modules.videos.lib.process_video_info_json') as mock_process_video_info_json:
+        validate_videos()
+        mock_process_video_info_json.assert_not_called()
+
+
+def test_validate_videos_progress(test_session, simple_channel, video_factory):
+    """Validation progress is reported after each batch is committed."""
+    for _ in range(3):
+        video_factory(simple_channel.id, with_video_file=True)
+    test_session.commit()
+
+    progress_queue = queue.Queue()
+    with mock.patch('modules.videos.lib.VALIDATION_BATCH_SIZE', 2):
+        validate_videos(progress_queue)
+    assert all([i.validated for i in test_session.query(Video)])
+
+    messages = [progress_queue.get_nowait() for _ in range(progress_queue.qsize())]
+    assert messages == [
+        {'code': 'validating', 'validated': 0, 'total': 3},
+        {'code': 'validating', 'validated': 2, 'total': 3},
+        {'code': 'validating', 'validated': 3, 'total': 3},
+    ]
+
+    # Nothing is left to validate.
+    validate_videos(progress_queue)
+    assert progress_queue.empty()
+
+
+def test_bulk_upsert_videos(test_session, test_directory, simple_channel):
+    """Video files are inserted with their meta files, a Video from a Channel's catalog is given its video file."""
+    # This Video is in the catalog of the Channel, but it has not been downloaded.
+    catalog_video = Video(source_id='12345678910', channel_id=simple_channel.id)
+    test_session.add(catalog_video)
+    test_session.commit()
+
+    vid1 = test_directory / 'channel_20000101_12345678910_ some title.mp4'
+    vid2 = test_directory / 'channel_20000102_10987654321_ other title.mp4'
+    vid1_meta = [vid1.with_suffix(i) for i in ('.jpg', '.description', '.en.vtt', '.info.json')]
+    for path in (vid1, vid2, *vid1_meta):
+        path.touch()
+
+    assert lib.bulk_upsert_videos([vid1, vid2], simple_channel, idempotency='refresh') == 2
+    test_session.expire_all()
+    video1, video2 = test_session.query(Video).order_by(Video.id).all()
+    # The catalog Video was updated, not duplicated.
+    assert video1.id == catalog_video.id
+    assert video1.video_path.path == vid1
+    assert [video1.poster_path.path, video1.description_path.path, video1.caption_path.path,
+            video1.info_json_path.path] == vid1_meta
+    assert video1.channel_id == simple_channel.id
+    # The new Video has no meta files.
+    assert video2.source_id == '10987654321'
+    assert video2.video_path.path == vid2
+    assert not any([video2.poster_path, video2.description_path, video2.caption_path, video2.info_json_path])
+    assert video2.channel_id == simple_channel.id
+    assert not video1.validated and not video2.validated
+
+    # Videos without a Channel are inserted without a Channel.
+    (test_directory / 'videos/NO CHANNEL').mkdir(parents=True)
+    vid3 = test_directory / 'videos/NO CHANNEL/some video.mp4'
+    vid3.touch()
+    assert lib.bulk_upsert_videos([vid3]) == 1
+    test_session.expire_all()
+    video3 = test_session.query(Video).filter(Video.id.notin_([video1.id, video2.id])).one()
+    assert video3.video_path.path == vid3
+    assert video3.channel_id is None
+    assert video3.source_id is None
+    assert test_session.query(Video).count() == 3
+
+    # Nothing to upsert.
+    assert lib.bulk_upsert_videos([]) == 0
+
 
 @pytest.mark.parametrize('file_name,expected', [
     ('channel_20000101_12345678910_ some title.mp4', ('channel', '20000101', '12345678910', 'some title')),
@@ -1,15 +1,17 @@
 from datetime import datetime
 from typing import Tuple, Optional, List
 
-import psycopg2
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import NoResultFound
 
 from wrolpi.common import run_after, logger
-from wrolpi.db import get_db_session, get_db_curs, get_ranked_models
+from wrolpi.dates import TZDateTime
+from wrolpi.db import get_db_session
+from wrolpi.media_path import MediaPathType
 from wrolpi.errors import UnknownVideo
 from ..lib import save_channels_config
-from ..models import Video
+from ..models import Video, VIDEO_JSON_COLUMNS, video_json, get_minimized_info_json
 
 logger.getChild(__name__)
 
@@ -76,6 +78,44 @@ DEFAULT_VIDEO_ORDER = 'rank'
 VIDEO_QUERY_LIMIT = 20
 
 
+# The columns of a video search, these are the columns used by `Video.__json__`.
+VIDEO_SEARCH_COLUMNS = '''
+    video.caption_path, video.channel_id, video.duration, video.favorite, video.info_json_path,
+    video.minimized_info_json, video.modification_datetime, video.poster_path, video.size, video.source_id,
+    video.title, video.upload_date, video.url, video.validated, video.video_path, video.view_count, video.viewed,
+    channel.name AS channel_name, channel.directory AS channel_directory, channel.url AS channel_url
+'''
+# The types of the search columns, so they match the attributes of a Video.
+VIDEO_SEARCH_TYPES = dict(
+    caption_path=MediaPathType,
+    channel_directory=MediaPathType,
+    favorite=TZDateTime,
+    info_json_path=MediaPathType,
+    modification_datetime=TZDateTime,
+    poster_path=MediaPathType,
+    upload_date=TZDateTime,
+    video_path=MediaPathType,
+    viewed=TZDateTime,
+)
+
+
+def video_search_row_json(row) -> dict:
+    """Convert a row of `video_search` to the same dict as `Video.__json__` without creating a Video."""
+    # The info json file is only read if it has not been stored yet.
+    info_json = get_minimized_info_json(row['minimized_info_json'], row['info_json_path'])
+
+    channel = None
+    if row['channel_id']:
+        channel = dict(
+            id=row['channel_id'],
+            name=row['channel_name'],
+            directory=row['channel_directory'],
+            url=row['channel_url'],
+        )
+
+    return video_json(channel, info_json, **{i: row[i] for i in VIDEO_JSON_COLUMNS})
+
+
 def video_search(
         search_str: str = None,
         offset: int = None,
@@ -84,70 +124,64 @@ def video_search(
         order_by: str = None,
         filters: List[str] = None,
 ) -> Tuple[List[dict], int]:
-    with get_db_curs() as curs:
-        params = dict(search_str=search_str, offset=offset)
-        channel_where = ''
-        if channel_id:
-            channel_where = 'AND channel_id = %(channel_id)s'
-            params['channel_id'] = channel_id
-
-        # Filter for/against favorites, if it was provided
-        favorites_where = ''
-        if isinstance(filters, list) and 'favorite' in filters:
-            favorites_where = 'AND favorite IS NOT NULL'
-
-        censored_where = ''
-        if isinstance(filters, list) and 'censored' in filters:
-            censored_where = 'AND censored = true'
-
-        where = ''
-        if search_str:
-            # A search_str was provided by the user, modify the query to filter by it.
-            columns = 'id, ts_rank_cd(textsearch, websearch_to_tsquery(%(search_str)s)), COUNT(*) OVER() AS total'
-            where = 'AND textsearch @@ websearch_to_tsquery(%(search_str)s)'
-            params['search_str'] = search_str
-        else:
-            # No search_str provided.  Get id and total only.
-            columns = 'id, COUNT(*) OVER() AS total'
-
-        # Convert the user-friendly order by into a real order by, restrict what can be interpolated by using the
-        # whitelist.
-        order = VIDEO_ORDERS[DEFAULT_VIDEO_ORDER]
-        if order_by:
-            try:
-                order = VIDEO_ORDERS[order_by]
-            except KeyError:
-                raise
-            if order_by in NO_NULL_ORDERS:
-                where += NO_NULL_ORDERS[order_by]
-
-        query = f'''
-            SELECT
-                {columns}
-            FROM video
-            WHERE
-                video_path IS NOT NULL
-                {where}
-                {channel_where}
-                {favorites_where}
-                {censored_where}
-            ORDER BY {order}
-            OFFSET %(offset)s LIMIT {int(limit)}
-        '''.strip()
-        logger.debug(query)
-
-        curs.execute(query, params)
+    params = dict(search_str=search_str, offset=offset)
+    channel_where = ''
+    if channel_id:
+        channel_where = 'AND video.channel_id = :channel_id'
+        params['channel_id'] = channel_id
+
+    # Filter for/against favorites, if it was provided
+    favorites_where = ''
+    if isinstance(filters, list) and 'favorite' in filters:
+        favorites_where = 'AND favorite IS NOT NULL'
+
+    censored_where = ''
+    if isinstance(filters, list) and 'censored' in filters:
+        censored_where = 'AND censored = true'
+
+    where = ''
+    if search_str:
+        # A search_str was provided by the user, modify the query to filter by it.
+        columns = 'video.id, ts_rank_cd(textsearch, websearch_to_tsquery(:search_str)), COUNT(*) OVER() AS total'
+        where = 'AND textsearch @@ websearch_to_tsquery(:search_str)'
+        params['search_str'] = search_str
+    else:
+        # No search_str provided.
+        columns = 'video.id, COUNT(*) OVER() AS total'
+
+    # Convert the user-friendly order by into a real order by, restrict what can be interpolated by using the
+    # whitelist.
+    order = VIDEO_ORDERS[DEFAULT_VIDEO_ORDER]
+    if order_by:
         try:
-            results = [dict(i) for i in curs.fetchall()]
-        except psycopg2.ProgrammingError:
-            # No videos
-            return [], 0
-        total = results[0]['total'] if results else 0
-        ranked_ids = [i['id'] for i in results]
+            order = VIDEO_ORDERS[order_by]
+        except KeyError:
+            raise
+        if order_by in NO_NULL_ORDERS:
+            where += NO_NULL_ORDERS[order_by]
+
+    # The Videos and their Channels are fetched in one query, in the order of the search.
+    query = f'''
+        SELECT
+            {columns},
+            {VIDEO_SEARCH_COLUMNS}
+        FROM video
+            LEFT JOIN channel ON channel.id = video.channel_id
+        WHERE
+            video_path IS NOT NULL
+            {where}
+            {channel_where}
+            {favorites_where}
+            {censored_where}
+        ORDER BY {order}
+        OFFSET :offset LIMIT {int(limit)}
+    '''.strip()
+    logger.debug(query)
 
     with get_db_session() as session:
-        results = get_ranked_models(ranked_ids, Video, session=session)
-        results = [i.__json__() for i in results]
+        rows = session.execute(text(query).columns(**VIDEO_SEARCH_TYPES), params).fetchall()
+        results = [video_search_row_json(i) for i in rows]
+    total = rows[0]['total'] if rows else 0
 
     return results, total
 
@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+"""
+Compare the previous Path.iterdir() walk to the os.scandir walk on a synthetic directory tree.
+
+    python3 scripts/benchmark_walk.py --files 500000
+
+The tree is created in a temporary directory (use --directory to re-use a tree between runs).
+"""
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+from wrolpi.common import walk_entries  # noqa
+
+
+def iterdir_walk(path: Path):
+    """The previous implementation of `wrolpi.common.walk`."""
+    for path in path.iterdir():
+        yield path
+        if path.is_dir():
+            yield from iterdir_walk(path)
+
+
+def make_tree(root: Path, files: int, files_per_directory: int):
+    """Create `files` empty files, `files_per_directory` in each directory, and 10 directories in each directory."""
+    directories = [root]
+    created = 0
+    while created < files:
+        directory = directories.pop(0)
+        for i in range(10):
+            child = directory / f'dir{i}'
+            child.mkdir(exist_ok=True)
+            directories.append(child)
+        for i in range(min(files_per_directory, files - created)):
+            (directory / f'file{i}.mp4').touch()
+            created += 1
+
+
+def benchmark(name: str, func: callable):
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    print(f'{name:>10}: {count} files in {elapsed:.2f}s')
+
+
+def main(args):
+    root = Path(args.directory or tempfile.mkdtemp())
+    if not any(root.iterdir()):
+        print(f'Creating {args.files} files in {root}')
+        make_tree(root, args.files, args.files_per_directory)
+
+    # Both walks must find every file (and check that it is a file).
+    for _ in range(args.runs):
+        benchmark('iterdir', lambda: sum(1 for i in iterdir_walk(root) if i.is_file()))
+        benchmark('scandir', lambda: sum(1 for i in walk_entries(root) if i.is_file()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=500_000)
+    parser.add_argument('--files-per-directory', type=int, default=100)
+    parser.add_argument('--directory', help='Directory of the tree, it will be created if it is empty.')
+    parser.add_argument('--runs', type=int, default=3)
+    main(parser.parse_args())
@@ -17,7 +17,7 @@ from functools import wraps
 from itertools import islice, filterfalse, tee
 from multiprocessing import Event, Queue, Lock, Manager
 from pathlib import Path
-from typing import Union, Callable, Tuple, Dict, List, Iterable, Optional, Generator, Any
+from typing import Union, Callable, Tuple, Dict, List, Iterable, Optional, Generator, Any, Iterator
 from urllib.parse import urlunsplit, urlparse
 
 import aiohttp
@@ -265,6 +265,7 @@ class WROLPiConfig(ConfigFile):
         hotspot_ssid='WROLPi',
         throttle_on_startup=False,
         timezone=str(DEFAULT_TIMEZONE),
+        watch_media_directory=False,
         wrol_mode=False,
     )
 
@@ -332,6 +333,14 @@ class WROLPiConfig(ConfigFile):
     def timezone(self, value: str):
         self.update({'timezone': value})
 
+    @property
+    def watch_media_directory(self) -> bool:
+        return self._config['watch_media_directory']
+
+    @watch_media_directory.setter
+    def watch_media_directory(self, value: bool):
+        self.update({'watch_media_directory': value})
+
     @property
     def wrol_mode(self) -> bool:
         return self._config['wrol_mode']
@@ -730,12 +739,60 @@ def zig_zag(low: ZIG_TYPE, high: ZIG_TYPE) -> Generator[ZIG_TYPE, None, None]:
             num = low + (diff / divisor)
 
 
+def zig_zag_slot(low: ZIG_TYPE, high: ZIG_TYPE, index: int) -> ZIG_TYPE:
+    """
+    Get the `index` result of `zig_zag(low, high)` without generating the results before it.
+
+    >>> zig_zag_slot(0, 10, 3)
+    7
+    >>> zig_zag_slot(50.0, 100.0, 10)
+    65.625
+    """
+    if not isinstance(high, type(low)):
+        raise ValueError(f'high and low must be same type')
+    if index < 0:
+        raise ValueError(f'index must be positive')
+    if index == 0:
+        return low
+
+    # The results after `low` are the odd multiples of `diff / 2 ** (depth + 1)`.  Each depth has `2 ** depth` results.
+    depth = index.bit_length() - 1
+    numerator = 2 * (index - 2 ** depth) + 1
+    result = low + (high - low) * numerator / 2 ** (depth + 1)
+    return type(low)(result) if isinstance(low, int) else result
+
+
+def walk_entries(path: Union[str, Path]) -> Generator[os.DirEntry, None, None]:
+    """Walk a directory structure yielding an `os.DirEntry` for all files and directories.
+
+    DirEntry caches the file type (and stat, once requested) so the file system is not asked again.  Directories are
+    walked depth-first without recursion, so deep directories cannot exceed the recursion limit.  Each directory is read
+    entirely before its contents are walked, so only one directory is open at a time (like `os.walk`)."""
+
+    def scandir(directory) -> Iterator[os.DirEntry]:
+        with os.scandir(directory) as it:
+            return iter(list(it))
+
+    stack = [scandir(path)]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+
+        yield entry
+        try:
+            if entry.is_dir():
+                stack.append(scandir(entry.path))
+        except (FileNotFoundError, NotADirectoryError):
+            # Directory was removed during the walk.
+            pass
+
+
 def walk(path: Path) -> Generator[Path, None, None]:
     """Recursively Walk a directory structure yielding all files and directories."""
-    for path in path.iterdir():
-        yield path
-        if path.is_dir():
-            yield from walk(path)
+    for entry in walk_entries(path):
+        yield Path(entry.path)
 
 
 # These characters are invalid in Windows or Linux.
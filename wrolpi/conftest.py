@@ -16,7 +16,8 @@ from sqlalchemy.orm import Session, sessionmaker
 from wrolpi.common import set_test_media_directory, Base, set_test_config
 from wrolpi.dates import set_test_now
 from wrolpi.db import postgres_engine, get_db_args
-from wrolpi.downloader import DownloadManager, DownloadResult, set_test_download_manager_config, Download
+from wrolpi.downloader import DownloadManager, DownloadResult, set_test_download_manager_config, Download, \
+    download_manager
 from wrolpi.root_api import BLUEPRINTS, api_app
 
 
@@ -45,6 +46,8 @@ def test_db() -> Tuple[Engine, Session]:
     # Create all tables.  No need to check if they exist because this is a test DB.
     Base.metadata.create_all(test_engine, checkfirst=False)
     session = sessionmaker(bind=test_engine)()
+    # Each test DB starts at the same download version, the previous test's downloads must not be used.
+    download_manager.clear_fe_cache()
     return test_engine, session
 
 
@@ -1,15 +1,19 @@
+import os
 from contextlib import contextmanager
 from functools import wraps
 from typing import ContextManager, Tuple, List, Union
 
 import psycopg2
 import sqlalchemy.exc
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DisconnectionError
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 
 from wrolpi.common import logger, Base, partition
-from wrolpi.vars import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DOCKERIZED, PYTEST
+from wrolpi.vars import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DOCKERIZED, PYTEST, DB_POOL, \
+    DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT
 
 logger = logger.getChild(__name__)
 
@@ -39,11 +43,51 @@ postgres_args = get_db_args('postgres')
 postgres_engine = create_engine('postgresql://{user}:{password}@{host}:{port}/{dbname}'.format(**postgres_args),
                                 execution_options={'isolation_level': 'AUTOCOMMIT'}, connect_args=connect_args)
 
+
+def get_pool_args(pool: str = DB_POOL) -> dict:
+    """Get the `create_engine` arguments for the requested pool mode."""
+    if pool == 'null':
+        # A new connection is opened (and closed) for every session.
+        return dict(poolclass=NullPool)
+    elif pool == 'queue':
+        return dict(
+            poolclass=QueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_POOL_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+            # Connections may have been closed by the DB while sitting in the pool.
+            pool_pre_ping=True,
+        )
+    raise ValueError(f'Unknown DB pool: {pool}')
+
+
+def protect_pool_from_fork(engine_: Engine):
+    """Sanic forks its workers after the engine has been created.  A pooled connection must never be shared between
+    processes, so each worker will open its own connections."""
+
+    @event.listens_for(engine_, 'connect')
+    def connect(_, connection_record):
+        connection_record.info['pid'] = os.getpid()
+
+    @event.listens_for(engine_, 'checkout')
+    def checkout(_, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info['pid'] != pid:
+            # This connection was created by the parent process, discard it and create a new one.
+            connection_record.connection = connection_proxy.connection = None
+            raise DisconnectionError(
+                f'Connection record belongs to pid {connection_record.info["pid"]}, '
+                f'attempting to check out in pid {pid}')
+
+
 # This engine is used for all normal tasks (except testing).
 db_args = get_db_args()
 connect_args = dict(application_name='wrolpi_api')
 uri = 'postgresql://{user}:{password}@{host}:{port}/{dbname}'.format(**db_args)
-engine = create_engine(uri, poolclass=NullPool, connect_args=connect_args)
+engine = create_engine(uri, connect_args=connect_args, **get_pool_args())
+if isinstance(engine.pool, QueuePool):
+    protect_pool_from_fork(engine)
 session_maker = sessionmaker(bind=engine)
 
 LOGGED_ARGS = False
@@ -113,6 +157,25 @@ def get_db_curs(commit: bool = False):
         # Rollback only if a transaction hasn't been committed.
         if session.transaction.is_active:
             connection.rollback()
+        # Return the connection to the pool.
+        connection.close()
+
+
+def get_db_pool_status(local_engine: Engine = None) -> dict:
+    """Get statistics about the DB connection pool of this process."""
+    local_engine = local_engine or engine
+    pool = local_engine.pool
+    if isinstance(pool, QueuePool):
+        return dict(
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            max_overflow=pool._max_overflow,  # noqa
+            mode='queue',
+            overflow=pool.overflow(),
+            pid=os.getpid(),
+            size=pool.size(),
+        )
+    return dict(mode='null', pid=os.getpid())
 
 
 def optional_session(commit: Union[callable, bool] = False):
@@ -161,5 +224,6 @@ def get_ranked_models(ranked_ids: List[int], model: Base, session: Session = Non
     Get all objects whose ids are in the `ranked_ids`, order them by their position in `ranked_ids`.
     """
     results = session.query(model).filter(model.id.in_(ranked_ids)).all()
-    results = sorted(results, key=lambda i: ranked_ids.index(i.id))
+    positions = {id_: position for position, id_ in enumerate(ranked_ids)}
+    results = sorted(results, key=lambda i: positions[i.id])
     return results
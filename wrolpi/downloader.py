@@ -1,32 +1,136 @@
 import asyncio
+import gzip
+import hashlib
+import json
 import multiprocessing
+import os
 import pathlib
+import re
+import signal
+import sys
+import time
 import traceback
 from abc import ABC
-from asyncio import Queue, Task, QueueEmpty
+from collections import deque
+from asyncio import Queue, Task
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, timezone
 from enum import Enum
 from functools import partial
 from operator import attrgetter
-from typing import List, Dict, Generator
+from typing import List, Dict, Generator, Set, Callable
 from typing import Tuple, Optional
 from urllib.parse import urlparse
 
 import feedparser
+import psycopg2
 from feedparser import FeedParserDict
-from sqlalchemy import Column, Integer, String, Text
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extras import execute_values
+from sqlalchemy import Column, Integer, String, Text, text, Computed, DDL, event, BigInteger, Boolean, \
+    ForeignKey, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, validates
 
-from wrolpi.common import Base, ModelHelper, logger, wrol_mode_check, zig_zag, ConfigFile, WROLPI_CONFIG
-from wrolpi.dates import TZDateTime, now, Seconds, local_timezone, recursive_replace_tz
-from wrolpi.db import get_db_session, get_db_curs, optional_session
+from wrolpi.common import Base, ModelHelper, logger, wrol_mode_check, zig_zag_slot, ConfigFile, WROLPI_CONFIG
+from wrolpi.dates import TZDateTime, now, Seconds, local_timezone
+from wrolpi.db import get_db_session, get_db_curs, optional_session, get_db_args
 from wrolpi.errors import InvalidDownload, UnrecoverableDownloadError
 from wrolpi.vars import PYTEST
 
 logger = logger.getChild(__name__)
 
+# Postgres channel which is notified when Downloads are created.  This wakes the DownloadManager in the process which is
+# running the download workers.
+DOWNLOAD_CHANNEL = 'wrolpi_download'
+# The scheduler will check for recurring downloads at least this often (seconds).
+MAX_SCHEDULER_SLEEP = 3600
+
+# The threads which find the Downloader of submitted URLs.
+RESOLVE_WORKERS = 4
+# The seconds a URL may take to be resolved.
+RESOLVE_TIMEOUT = 60
+# The resolved URLs are recorded in batches of this size.
+RESOLVE_BATCH_SIZE = 20
+
+# Only the last lines of a download process' output are kept.
+PROCESS_LOG_LINES = 1000
+# A line longer than this will be split.
+PROCESS_MAX_LINE = 64 * 1024
+# Progress of a download is published at most this often (seconds).
+PROGRESS_INTERVAL = 1.0
+
+# yt-dlp overwrites its progress line using carriage returns.
+LINE_SEPARATORS = re.compile(rb'\r\n|\r|\n')
+# [download]  45.3% of ~10.00MiB at  1.23MiB/s ETA 00:05
+PROGRESS_PATTERN = re.compile(
+    r'^\[download\]\s+(?P<percent>[\d.]+)%\s+of\s+~?\s*(?P<total>[\d.]+\s*[KMGTPE]?i?B)'
+    r'(?:\s+at\s+(?P<speed>[\d.]+\s*[KMGTPE]?i?B)/s)?'
+    r'(?:\s+ETA\s+(?P<eta>[\d:]+))?'
+)
+SIZE_PATTERN = re.compile(r'^(?P<number>[\d.]+)\s*(?P<prefix>[KMGTPE]?)(?P<binary>i?)B$')
+SIZE_PREFIXES = 'KMGTPE'
+
+
+def parse_size(size: str) -> Optional[int]:
+    """Convert a size (10.5MiB, 300KB) to bytes."""
+    if not (match := SIZE_PATTERN.match(size.strip())):
+        return None
+    number, prefix, binary = match.groups()
+    base = 1024 if binary else 1000
+    exponent = SIZE_PREFIXES.index(prefix) + 1 if prefix else 0
+    return int(float(number) * base ** exponent)
+
+
+def parse_eta(eta: str) -> Optional[int]:
+    """Convert an ETA (01:02:03) to seconds."""
+    seconds = 0
+    for part in eta.split(':'):
+        if not part.isdigit():
+            return None
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def parse_progress(line: str) -> Optional[dict]:
+    """Parse a yt-dlp progress line.  Returns None if the line is not a progress line."""
+    if not (match := PROGRESS_PATTERN.match(line)):
+        return None
+    percent = float(match['percent'])
+    total_bytes = parse_size(match['total'])
+    return dict(
+        downloaded_bytes=int(total_bytes * percent / 100) if total_bytes else None,
+        eta=parse_eta(match['eta']) if match['eta'] else None,
+        percent=percent,
+        speed=parse_size(match['speed']) if match['speed'] else None,
+        total_bytes=total_bytes,
+    )
+
+
+async def read_lines(stream: asyncio.StreamReader, lines: deque, progress: Callable[[dict], None] = None):
+    """Read a process' output stream line by line, until the process closes it.  Lines are kept in `lines`, unless
+    the line reports progress."""
+
+    def handle_line(line: bytes):
+        if not line.strip():
+            return
+        if progress and (progress_ := parse_progress(line.decode(errors='replace'))):
+            progress(progress_)
+            return
+        lines.append(line)
+
+    buffer = b''
+    while chunk := await stream.read(4096):
+        buffer += chunk
+        *complete, buffer = LINE_SEPARATORS.split(buffer)
+        for line_ in complete:
+            handle_line(line_)
+        if len(buffer) > PROCESS_MAX_LINE:
+            handle_line(buffer)
+            buffer = b''
+    handle_line(buffer)
+
 
 class DownloadFrequency(int, Enum):
     hourly = 3600
@@ -42,19 +146,35 @@ class DownloadFrequency(int, Enum):
 @dataclass
 class DownloadResult:
     downloads: List[str] = field(default_factory=list)
+    downloaded_bytes: int = None
     error: str = None
+    exit_code: int = None
     info_json: dict = field(default_factory=dict)
     location: str = None
     success: bool = False
 
 
+# Downloads should be sorted by their status in a particular order.
+STATUS_ORDER = '''CASE
+    WHEN (status = 'pending') THEN 0
+    WHEN (status = 'failed') THEN 1
+    WHEN (status = 'new') THEN 2
+    WHEN (status = 'resolving') THEN 3
+    WHEN (status = 'deferred') THEN 4
+    WHEN (status = 'complete') THEN 5
+    ELSE 6
+END'''
+
+
 class Download(ModelHelper, Base):
     """Model that is used to schedule downloads."""
     __tablename__ = 'download'  # noqa
     id = Column(Integer, primary_key=True)
-    url = Column(String, nullable=False)
+    url = Column(String, nullable=False, unique=True)
 
     attempts = Column(Integer, default=0)
+    # The netloc of the URL, downloads are limited per domain.
+    domain = Column(Text)
     downloader = Column(Text)
     error = Column(Text)
     frequency = Column(Integer)
@@ -63,7 +183,9 @@ class Download(ModelHelper, Base):
     location = Column(Text)
     next_download = Column(TZDateTime)
     status = Column(String, default='new')
+    status_order = Column(Integer, Computed(STATUS_ORDER))
     sub_downloader = Column(Text)
+    version = Column(BigInteger)
     _manager = None
 
     def __init__(self, *args, **kwargs):
@@ -123,9 +245,10 @@ class Download(ModelHelper, Base):
 
         return self.manager.get_downloader(self.url)
 
-    @property
-    def domain(self):
-        return urlparse(self.url).netloc
+    @validates('url')
+    def validate_url(self, key, url: str):
+        self.domain = urlparse(url).netloc
+        return url
 
     @property
     def manager(self):
@@ -138,6 +261,96 @@ class Download(ModelHelper, Base):
         self._manager = value
 
 
+# Only the end of an error is stored in the `download` table, the entire error is stored in `download_attempt`.
+ERROR_SUMMARY_LENGTH = 2000
+
+
+def summarize_error(error: Optional[str]) -> Optional[str]:
+    """Get the end of an error, this is where the exception of a traceback will be."""
+    if error and len(error) > ERROR_SUMMARY_LENGTH:
+        return '...' + error[-ERROR_SUMMARY_LENGTH:]
+    return error or None
+
+
+class DownloadAttempt(ModelHelper, Base):
+    """An append-only log of every attempt of a Download.  Old attempts are deleted, see
+    `DownloadManager.delete_old_attempts`."""
+    __tablename__ = 'download_attempt'  # noqa
+    id = Column(Integer, primary_key=True)
+    download_id = Column(Integer, ForeignKey('download.id', ondelete='CASCADE'), nullable=False)
+
+    started_at = Column(TZDateTime, nullable=False)
+    ended_at = Column(TZDateTime)
+    success = Column(Boolean, nullable=False, default=False)
+    exit_code = Column(Integer)
+    downloaded_bytes = Column(BigInteger)
+    # The gzip compressed error of this attempt.
+    error_gz = Column(LargeBinary)
+
+    def __repr__(self):
+        return f'<DownloadAttempt id={self.id} download_id={self.download_id} success={self.success} ' \
+               f'exit_code={self.exit_code}>'
+
+    @property
+    def error(self) -> Optional[str]:
+        if self.error_gz:
+            return gzip.decompress(self.error_gz).decode()
+
+    @error.setter
+    def error(self, value: Optional[str]):
+        self.error_gz = gzip.compress(value.encode()) if value else None
+
+    def __json__(self):
+        d = dict(
+            id=self.id,
+            download_id=self.download_id,
+            started_at=self.started_at,
+            ended_at=self.ended_at,
+            success=self.success,
+            exit_code=self.exit_code,
+            downloaded_bytes=self.downloaded_bytes,
+            error=self.error,
+        )
+        return d
+
+
+# Each Download is given a new version (from a sequence) whenever it is inserted or updated.  The count and sum of the
+# versions is the version of the download table, it changes whenever any Download is inserted, updated or deleted.  This
+# is used to cache the downloads which are displayed to the user.  A sequence does not lock, so writers do not wait for
+# each other.
+DOWNLOAD_VERSION_DDL = '''
+    CREATE SEQUENCE IF NOT EXISTS download_version_seq;
+
+    CREATE OR REPLACE FUNCTION set_download_version() RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.version := nextval('download_version_seq');
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER download_version BEFORE INSERT OR UPDATE ON download
+        FOR EACH ROW EXECUTE PROCEDURE set_download_version();
+
+    -- A delete does not take a version, deletes are counted instead.
+    CREATE TABLE download_delete_version (version BIGINT NOT NULL);
+    INSERT INTO download_delete_version (version) VALUES (0);
+
+    CREATE OR REPLACE FUNCTION bump_download_delete_version() RETURNS TRIGGER AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM deleted_downloads) THEN
+            UPDATE download_delete_version SET version = version + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER download_delete_version AFTER DELETE ON download
+        REFERENCING OLD TABLE AS deleted_downloads
+        FOR EACH STATEMENT EXECUTE PROCEDURE bump_download_delete_version();
+'''
+event.listen(Download.__table__, 'after_create', DDL(DOWNLOAD_VERSION_DDL))
+
+
 class Downloader:
     name: str = None
     pretty_name: str = None
@@ -206,6 +419,10 @@ class Downloader:
         """
         Run a subprocess using the provided arguments.  This process can be killed by the Download Manager.
 
+        The output of the process is read while it runs.  Only the last `PROCESS_LOG_LINES` lines of stdout and stderr
+        are returned.  yt-dlp's progress lines are published to the manager (see `DownloadManager.get_progress`), the
+        last reported `downloaded_bytes` is returned in the logs.
+
         Global timeout takes precedence over the timeout argument, unless it is 0.  (Smaller global timeout wins)
         """
         logger.debug(f'{self} launching download process with args: {" ".join(cmd)}')
@@ -222,21 +439,18 @@ class Downloader:
         timeout = WROLPI_CONFIG.download_timeout or timeout or self.timeout
         logger.debug(f'{self} launched download process {pid=} {timeout=} for {url}')
 
-        stdout, stderr = None, None
+        publish_progress = ProgressPublisher(self._manager, url)
+        stdout, stderr = deque(maxlen=PROCESS_LOG_LINES), deque(maxlen=PROCESS_LOG_LINES)
+        readers = [
+            asyncio.create_task(read_lines(proc.stdout, stdout, publish_progress)),
+            asyncio.create_task(read_lines(proc.stderr, stderr)),
+        ]
+        wait = asyncio.create_task(proc.wait())
         try:
             while True:
-                task = asyncio.Task(proc.communicate())
-                done, pending = await asyncio.wait([task, ], timeout=1)
-                # Cancel communicate.
-                if pending:
-                    pending.pop().cancel()
+                done, _ = await asyncio.wait([wait, ], timeout=1)
                 if done:
-                    # Process finished, get the result of proc.communicate().
-                    stdout, stderr = done.pop().result()
-                    break
-                if proc.returncode:
-                    # Process died.
-                    stdout, stderr = await proc.communicate()
+                    # Process finished.
                     break
 
                 elapsed = (now() - start).total_seconds()
@@ -247,27 +461,193 @@ class Downloader:
                 if self._kill.is_set():
                     logger.warning(f'Killing download {pid=}, {elapsed} seconds elapsed (timeout was not exceeded).')
                     proc.kill()
+                    await wait
                     break
+            # Read any remaining output.
+            await asyncio.wait(readers, timeout=5)
         except Exception as e:
             logger.error(f'{self}.process_runner had a download error', exc_info=e)
             raise
         finally:
             self.clear()
+            for task in (*readers, wait):
+                task.cancel()
+            if self._manager:
+                self._manager.clear_progress(url)
 
-            # Output all logs from the process.
-            # TODO is there a way to stream this output while the process is running?
             logger.debug(f'Download exited with {proc.returncode}')
-            logs = {'stdout': stdout, 'stderr': stderr}
+            logs = {'stdout': b'\n'.join(stdout), 'stderr': b'\n'.join(stderr),
+                    'downloaded_bytes': publish_progress.downloaded_bytes}
 
         return proc.returncode, logs
 
+    async def fork_runner(self, url: str, target: Callable, args: tuple = (), timeout: int = None) \
+            -> Tuple[int, dict]:
+        """
+        Run `target(connection, *args)` in a forked process.  The fork has everything this process has already
+        imported, so it starts quickly.  This process can be killed by the Download Manager.
+
+        `target` sends its output to the connection as `('stdout', line)` or `('stderr', line)`, and its progress as
+        `('progress', dict)` (see `parse_progress`).  The exit code of the process and the logs are returned just like
+        `process_runner`.
+        """
+        logger.debug(f'{self} forking download process for {url}')
+        start = now()
+        recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+        # The webserver workers are daemon processes, `multiprocessing` refuses to start a child of a daemon.
+        pid = os.fork()
+        if pid == 0:
+            # This is the fork.
+            exit_code = 1
+            try:
+                recv_conn.close()
+                target(send_conn, *args)
+                exit_code = 0
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                # Do not run anything this process registered to run at exit.
+                os._exit(exit_code)
+
+        # Only the fork sends messages.  The pipe is closed when the fork exits.
+        send_conn.close()
+        exit_code = None
+
+        timeout = WROLPI_CONFIG.download_timeout or timeout or self.timeout
+        logger.debug(f'{self} forked download process {pid=} {timeout=} for {url}')
+
+        publish_progress = ProgressPublisher(self._manager, url)
+        outputs = dict(stdout=deque(maxlen=PROCESS_LOG_LINES), stderr=deque(maxlen=PROCESS_LOG_LINES))
+        loop = asyncio.get_running_loop()
+        closed = loop.create_future()
+
+        def read_messages():
+            try:
+                while recv_conn.poll():
+                    kind, value = recv_conn.recv()
+                    if kind == 'progress':
+                        publish_progress(value)
+                    else:
+                        outputs[kind].append(value.encode() if isinstance(value, str) else value)
+            except (EOFError, OSError):
+                loop.remove_reader(recv_conn.fileno())
+                if not closed.done():
+                    closed.set_result(True)
+
+        loop.add_reader(recv_conn.fileno(), read_messages)
+        try:
+            while True:
+                done, _ = await asyncio.wait([closed, ], timeout=1)
+                if done:
+                    # Process finished.
+                    break
+
+                elapsed = (now() - start).total_seconds()
+                if timeout and elapsed > timeout:
+                    logger.warning(f'Download has exceeded its timeout {elapsed=}')
+                    self.kill()
+
+                if self._kill.is_set():
+                    logger.warning(f'Killing download {pid=}, {elapsed} seconds elapsed (timeout was not exceeded).')
+                    os.kill(pid, signal.SIGKILL)
+                    break
+
+            exit_code = await wait_for_exit(pid)
+        except Exception as e:
+            logger.error(f'{self}.fork_runner had a download error', exc_info=e)
+            raise
+        finally:
+            if exit_code is None:
+                # The fork must not outlive this download.
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            self.clear()
+            if not closed.done():
+                loop.remove_reader(recv_conn.fileno())
+            recv_conn.close()
+            if self._manager:
+                self._manager.clear_progress(url)
+
+            logger.debug(f'Download exited with {exit_code}')
+            logs = {'stdout': b'\n'.join(outputs['stdout']), 'stderr': b'\n'.join(outputs['stderr']),
+                    'downloaded_bytes': publish_progress.downloaded_bytes}
+
+        return exit_code, logs
+
+
+async def wait_for_exit(pid: int) -> int:
+    """Wait for a forked process to exit without blocking the event loop.  Returns the exit code of the process, which
+    is negative if it was killed by a signal."""
+    while True:
+        exited, status = os.waitpid(pid, os.WNOHANG)
+        if exited:
+            break
+        await asyncio.sleep(0.1)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class ProgressPublisher:
+    """Publishes the progress of a download to the manager at most every `PROGRESS_INTERVAL` seconds.  The completed
+    progress is always published."""
+
+    def __init__(self, manager: Optional['DownloadManager'], url: str):
+        self.manager = manager
+        self.url = url
+        self.last_published = 0
+        self.downloaded_bytes = None
+
+    def __call__(self, progress: dict):
+        self.downloaded_bytes = progress['downloaded_bytes'] or self.downloaded_bytes
+        if self.manager and (time.monotonic() - self.last_published >= PROGRESS_INTERVAL or progress['percent'] == 100):
+            self.last_published = time.monotonic()
+            self.manager.set_progress(self.url, progress)
+
+
+class TokenBucket:
+    """Allows `rate` requests per second, with bursts of up to `capacity` requests."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def __repr__(self):
+        return f'<TokenBucket rate={self.rate} capacity={self.capacity} tokens={self.tokens}>'
+
+    def _refill(self):
+        now_ = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now_ - self.updated) * self.rate)
+        self.updated = now_
+
+    def wait_time(self) -> float:
+        """The seconds until a token is available."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> bool:
+        """Take a token, if one is available."""
+        if self.wait_time():
+            return False
+        self.tokens -= 1
+        return True
+
 
 class DownloadManager:
     """
     Runs a collection of workers which will download any URLs in the `download` table.
 
-    Only one download from each domain will be downloaded at a time.  If we only have one domain (example.com) in the
-    URLs to be downloaded, then only one worker will be busy.
+    Downloads from each domain are limited by the domain's concurrency, and by its requests per minute (see
+    `DownloadMangerConfig`).  By default, only one download from each domain will be downloaded at a time.  If we only
+    have one domain (example.com) in the URLs to be downloaded, then only one worker will be busy.
     """
     priority_sorter = partial(sorted, key=attrgetter('priority'))
 
@@ -279,9 +659,35 @@ class DownloadManager:
         self.download_queue: Queue = Queue()
         self.workers: List[Task] = []
         self.worker_count: int = 4
-        self.data = multiprocessing.Manager().dict()
-        # We haven't started downloads yet, so no domains are downloading.
-        self.data['processing_domains'] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scheduler: Optional[Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._listener = None
+        # The count of queued/running downloads of each domain.
+        self.domain_downloads: Dict[str, int] = dict()
+        # The IDs of Downloads which are queued/running, these should not be queued again.
+        self.queued_downloads: Set[int] = set()
+        # The requests per minute of each domain.
+        self.domain_buckets: Dict[str, TokenBucket] = dict()
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+        # The progress of running downloads, by URL.  This is shared with the other processes, so the progress can be
+        # displayed by any of them.
+        self.progress = multiprocessing.Manager().dict()
+        self._resolver: Optional[Task] = None
+        # The results of `get_fe_downloads` for the current version of the download table.
+        self._fe_cache: Dict[tuple, Tuple[List[dict], List[dict]]] = dict()
+        self._fe_cache_version: Optional[str] = None
+        self._resolve_pool: Optional[ThreadPoolExecutor] = None
+
+    def set_progress(self, url: str, progress: dict):
+        self.progress[url] = progress
+
+    def clear_progress(self, url: str):
+        self.progress.pop(url, None)
+
+    def get_progress(self) -> Dict[str, dict]:
+        """Get the progress of all running downloads."""
+        return self.progress.copy()
 
     def register_downloader(self, instance: Downloader):
         if not isinstance(instance, Downloader):
@@ -308,8 +714,15 @@ class DownloadManager:
                 return
 
             try:
-                download: Download = queue.get_nowait()
-                download_id, url = download.id, download.url
+                # Sleep until a download is queued.
+                download: Download = await queue.get()
+            except asyncio.CancelledError:
+                logger.warning(f'download_worker canceled!')
+                return
+
+            download_id, domain = download.id, download.domain
+            try:
+                url = download.url
                 logger.debug(f'Download worker {num} got download {download}')
 
                 downloader: Downloader = download.get_downloader()
@@ -321,9 +734,8 @@ class DownloadManager:
                     download = session.query(Download).filter_by(id=download_id).one()
                     download.started()
 
-                self.data['processing_domains'].append(download.domain)
-
                 try_again = True
+                started_at = now()
                 try:
                     if asyncio.iscoroutinefunction(downloader.do_download):
                         result = await downloader.do_download(download)
@@ -348,7 +760,17 @@ class DownloadManager:
                     # clear out an outdated location.
                     download.location = result.location or download.location or None
                     # Clear any old errors if the download succeeded.
-                    download.error = result.error if result.error else None
+                    download.error = summarize_error(result.error)
+                    attempt = DownloadAttempt(
+                        download_id=download_id,
+                        started_at=started_at,
+                        ended_at=now(),
+                        success=result.success,
+                        exit_code=result.exit_code,
+                        downloaded_bytes=result.downloaded_bytes,
+                    )
+                    attempt.error = result.error
+                    session.add(attempt)
                     download.next_download = self.calculate_next_download(download, session)
 
                     if result.downloads:
@@ -364,39 +786,105 @@ class DownloadManager:
                     else:
                         download.defer()
 
-                queue.task_done()
-                # Remove this domain from the running list.
-                self._remove_domain(download.domain)
-                # Request any new downloads be added to the queue.
-                asyncio.create_task(self.queue_downloads())
             except asyncio.CancelledError:
                 logger.warning(f'download_worker canceled!')
-                queue.task_done()
                 return
-            except QueueEmpty:
-                # No work yet.
-                await asyncio.sleep(0.1)
-                continue
             except Exception as e:
                 logger.warning(f'Download worker had unexpected error', exc_info=e)
+            finally:
+                queue.task_done()
+                # Remove this download from the domain's running downloads.
+                self._remove_domain(domain, download_id)
 
-    def _add_domain(self, domain: str):
-        """Add a domain to the processing list.
+            # Request any new downloads be added to the queue, the next download may also have changed.
+            self.wake()
+
+    @staticmethod
+    def get_domain_limits(domain: str) -> Tuple[int, float]:
+        """Get the (concurrency, requests_per_minute) of a domain.  The limits of a domain also apply to its
+        sub-domains, unless the sub-domain has its own limits."""
+        if not DOWNLOAD_MANAGER_CONFIG:
+            return 1, 0
+
+        concurrency = DOWNLOAD_MANAGER_CONFIG.domain_concurrency
+        requests_per_minute = DOWNLOAD_MANAGER_CONFIG.requests_per_minute
+        domain_limits = DOWNLOAD_MANAGER_CONFIG.domain_limits
+        parts = domain.split(':')[0].split('.')
+        for idx in range(len(parts)):
+            if limits := domain_limits.get('.'.join(parts[idx:])):
+                concurrency = limits.get('concurrency', concurrency)
+                requests_per_minute = limits.get('requests_per_minute', requests_per_minute)
+                break
+        return concurrency, requests_per_minute
+
+    def _domain_wait_time(self, domain: str) -> Optional[float]:
+        """Returns the seconds until a download of this domain can be started.  Returns None if the domain is already
+        downloading as many downloads as it can."""
+        concurrency, requests_per_minute = self.get_domain_limits(domain)
+        if self.domain_downloads.get(domain, 0) >= concurrency:
+            return None
+        if not requests_per_minute:
+            self.domain_buckets.pop(domain, None)
+            return 0
+
+        rate = requests_per_minute / 60
+        bucket = self.domain_buckets.get(domain)
+        if not bucket or bucket.rate != rate:
+            bucket = self.domain_buckets[domain] = TokenBucket(rate, max(concurrency, 1))
+        return bucket.wait_time()
+
+    def _add_domain(self, domain: str, download_id: int):
+        """Add a download to the domain's running downloads."""
+        if bucket := self.domain_buckets.get(domain):
+            bucket.take()
+        self.domain_downloads[domain] = self.domain_downloads.get(domain, 0) + 1
+        self.queued_downloads.add(download_id)
+
+    def _remove_domain(self, domain: str, download_id: int):
+        """Remove a download from the domain's running downloads."""
+        self.queued_downloads.discard(download_id)
+        count = self.domain_downloads.get(domain, 0) - 1
+        if count > 0:
+            self.domain_downloads[domain] = count
+        else:
+            self.domain_downloads.pop(domain, None)
 
-        Raises ValueError if the domain is already processing."""
-        processing_domains = self.data['processing_domains']
-        if domain in processing_domains:
-            raise ValueError(f'Domain already being downloaded! {domain}')
-        self.data['processing_domains'] = [*processing_domains, domain]
+    @property
+    def running_downloads(self) -> int:
+        return sum(self.domain_downloads.values())
+
+    def get_bandwidth_limit(self) -> Optional[int]:
+        """Get the bandwidth (bytes per second) a download may use.  The global bandwidth limit is split between all
+        running downloads."""
+        limit = DOWNLOAD_MANAGER_CONFIG.bandwidth_limit if DOWNLOAD_MANAGER_CONFIG else 0
+        if not limit:
+            return None
+        return max(limit // max(self.running_downloads, 1), 1)
 
-    def _remove_domain(self, domain: str):
-        """Remove a domain from the processing list."""
-        self.data['processing_domains'] = [i for i in self.data['processing_domains'] if i != domain]
+    def _retry_queue_later(self, seconds: float):
+        """Queue downloads again when a rate limited domain can be downloaded."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        when = loop.time() + seconds
+        if self._retry_handle and not self._retry_handle.cancelled() and self._retry_handle.when() <= when:
+            # A retry will already happen in time.
+            return
+        if self._retry_handle:
+            self._retry_handle.cancel()
+        self._retry_handle = loop.call_at(when, self.wake)
 
     @wrol_mode_check
     def start_workers(self, loop=None):
         """Start all download worker tasks.  Does nothing if they are already running."""
-        if not self.workers:
+        if not self.workers_running():
+            if self.workers:
+                # Workers were stopped, forget any downloads they did not finish.
+                self.workers = []
+                self.download_queue = Queue()
+                self.domain_downloads.clear()
+                self.queued_downloads.clear()
             if not loop:
                 try:
                     loop = asyncio.get_running_loop()
@@ -410,6 +898,122 @@ class DownloadManager:
                 task = loop.create_task(coro)
                 self.workers.append(task)
 
+    def start_scheduler(self, loop: asyncio.AbstractEventLoop):
+        """Start the task which queues downloads when they are created, or when a recurring download is due.  Does
+        nothing if it is already running."""
+        if self._scheduler and not self._scheduler.done():
+            return
+
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._scheduler = loop.create_task(self.scheduler())
+
+    async def scheduler(self):
+        """Queue new downloads, then sleep until woken (see `wake`) or until the next recurring download is due."""
+        while not self.stopped:
+            self._wake.clear()
+            try:
+                await self.do_downloads()
+            except Exception as e:
+                logger.error('Download scheduler failed to queue downloads', exc_info=e)
+
+            try:
+                timeout = self.seconds_until_next_download()
+            except Exception as e:
+                logger.error('Download scheduler failed to find the next download', exc_info=e)
+                timeout = MAX_SCHEDULER_SLEEP
+            logger.debug(f'Download scheduler sleeping for {timeout} seconds')
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                # A recurring download is due.
+                pass
+
+    def wake(self):
+        """Wake the scheduler so any new downloads will be queued.  This is safe to call from any thread.
+
+        New downloads will be queued immediately if the scheduler is not running (testing)."""
+        if self._scheduler and not self._scheduler.done():
+            self._loop.call_soon_threadsafe(self._wake.set)
+            return
+
+        try:
+            asyncio.create_task(self.queue_downloads())
+        except RuntimeError:
+            # Event loop isn't running.  Probably testing?
+            if not PYTEST:
+                logger.info(f'Unable to queue downloads.')
+
+    @staticmethod
+    def seconds_until_next_download() -> float:
+        """Get the seconds until the next recurring download should be renewed."""
+        with get_db_curs() as curs:
+            # New and pending downloads are already being handled.
+            curs.execute('''
+                SELECT MIN(next_download) AS next_download
+                FROM download
+                WHERE frequency IS NOT NULL AND status != 'new' AND status != 'pending'
+            ''')
+            next_download = curs.fetchone()['next_download']
+        if not next_download:
+            return MAX_SCHEDULER_SLEEP
+        if not next_download.tzinfo:
+            # Timestamps are stored as UTC.
+            next_download = next_download.replace(tzinfo=timezone.utc)
+        seconds = (next_download - now()).total_seconds()
+        # Wait a moment past the next download so it will be renewed.
+        return min(max(seconds + 1, 1), MAX_SCHEDULER_SLEEP)
+
+    @staticmethod
+    def notify_downloads(session: Session):
+        """Notify the process running the download workers that there are new downloads.  The notification is only
+        sent when the session's transaction is committed."""
+        session.execute("SELECT pg_notify(:channel, '')", dict(channel=DOWNLOAD_CHANNEL))
+
+    def listen_for_downloads(self, loop: asyncio.AbstractEventLoop):
+        """Wake the scheduler when any process creates downloads (see `notify_downloads`)."""
+        if self._listener:
+            return
+
+        try:
+            listener = psycopg2.connect(**get_db_args(), application_name='wrolpi_download_listener')
+            listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with listener.cursor() as curs:
+                curs.execute(f'LISTEN {DOWNLOAD_CHANNEL}')
+        except psycopg2.OperationalError as e:
+            logger.error('Unable to listen for new downloads, will try again later', exc_info=e)
+            loop.call_later(60, self.listen_for_downloads, loop)
+            return
+
+        self._listener = listener
+        loop.add_reader(listener.fileno(), self._read_notifications, loop)
+
+    def _read_notifications(self, loop: asyncio.AbstractEventLoop):
+        try:
+            self._listener.poll()
+        except psycopg2.OperationalError as e:
+            logger.error('Lost connection while listening for new downloads', exc_info=e)
+            self.stop_listening(loop)
+            loop.call_later(60, self.listen_for_downloads, loop)
+            return
+
+        if self._listener.notifies:
+            self._listener.notifies.clear()
+            self.wake()
+
+    def stop_listening(self, loop: asyncio.AbstractEventLoop = None):
+        if not self._listener:
+            return
+
+        loop = loop or self._loop
+        try:
+            if loop:
+                loop.remove_reader(self._listener.fileno())
+            self._listener.close()
+        except Exception as e:
+            logger.warning('Failed to close download listener', exc_info=e)
+        self._listener = None
+
     def workers_running(self):
         for task in self.workers:
             if not task.done():
@@ -458,49 +1062,80 @@ class DownloadManager:
 
     @optional_session
     def create_downloads(self, urls: List[str], session: Session = None, downloader: str = None,
-                         reset_attempts: bool = False, sub_downloader: str = None) \
+                         reset_attempts: bool = False, sub_downloader: str = None, resolve: bool = True) \
             -> List[Download]:
-        """Schedule all URLs for download.  If one cannot be downloaded, none will be added."""
+        """Schedule all URLs for download.  If one cannot be downloaded, none will be added.
+
+        If `resolve` is False, and no `downloader` is provided, the Downloader of each URL will be found later in the
+        resolver process pool (see `resolve_downloads`).  This returns immediately."""
         if not all(urls):
             raise ValueError('Download must have a URL')
 
-        downloads = []
         shared_downloader = self.get_downloader_by_name(downloader) if downloader else None
         if downloader and not shared_downloader:
             # Could not look up the downloader.
             raise InvalidDownload(f'Unknown downloader {downloader}')
 
+        # Ignore duplicate URLs.
+        urls = list(dict.fromkeys(urls))
+        skip_urls = set(DOWNLOAD_MANAGER_CONFIG.skip_urls)
+        if reset_attempts and (unskipped := [i for i in urls if i in skip_urls]):
+            # User manually entered these downloads, remove them from the skip list.
+            self.remove_from_skip_list(*unskipped)
+            skip_urls = skip_urls - set(unskipped)
+        for url in urls:
+            if url in skip_urls:
+                logger.warning(f'Skipping {url} because it is in the download_manager.yaml skip list.')
+        urls = [i for i in urls if i not in skip_urls]
+
+        # Find the Downloader of every URL before any are added.
+        downloaders = dict()
+        for url in urls:
+            if shared_downloader:
+                # One Downloader provided for all URLs, use it.
+                downloaders[url] = (shared_downloader, None)
+            elif resolve:
+                # User has requested automatic downloader selection, try and find it.
+                downloaders[url] = self.get_downloader(url)
+
+        downloads = []
         with session.transaction:
-            for url in urls:
-                if url in DOWNLOAD_MANAGER_CONFIG.skip_urls and reset_attempts:
-                    # User manually entered this download, remove it from the skip list.
-                    self.remove_from_skip_list(url)
-                elif url in DOWNLOAD_MANAGER_CONFIG.skip_urls:
-                    logger.warning(f'Skipping {url} because it is in the download_manager.yaml skip list.')
-                    continue
-                info_json = None
-                if not shared_downloader:
-                    # User has requested automatic downloader selection, try and find it.
-                    local_downloader, info_json = self.get_downloader(url)
-                else:
-                    # One Downloader provided for all URLs, use it.
-                    local_downloader = shared_downloader
+            if urls:
+                # Insert all new URLs at once, existing Downloads are updated below.
+                session.flush()
+                curs = session.connection().connection.cursor()
+                stmt = '''
+                    INSERT INTO download (url, domain, status, attempts)
+                    VALUES %s
+                    ON CONFLICT (url) DO NOTHING
+                '''
+                rows = [(i, urlparse(i).netloc) for i in urls]
+                execute_values(curs, stmt, rows, template="(%s, %s, 'new', 0)", page_size=1000)
+
+                existing = session.query(Download).filter(text('url = ANY(:urls)')).params(urls=urls)
+                existing = {i.url: i for i in existing}
+                downloads = [existing[i] for i in urls]
 
-                download = self.get_or_create_download(url, session)
+            for download in downloads:
+                download.manager = self
+                local_downloader, info_json = downloaders.get(download.url, (None, None))
                 # Download may have failed, try again.
                 download.renew(reset_attempts=reset_attempts)
-                download.downloader = local_downloader.name
+                if local_downloader:
+                    download.downloader = local_downloader.name
+                else:
+                    # The Downloader will be found by the resolver.
+                    download.status = 'resolving'
+                    download.downloader = None
                 download.info_json = info_json or download.info_json
                 download.sub_downloader = sub_downloader
-                downloads.append(download)
+
+            if downloads:
+                # The download workers may be running in another process.
+                self.notify_downloads(session)
 
         # Start downloading ASAP.
-        try:
-            asyncio.create_task(self.queue_downloads())
-        except RuntimeError:
-            # Event loop isn't running.  Probably testing?
-            if not PYTEST:
-                logger.info(f'Unable to queue downloads after creating {len(downloads)} download(s).')
+        self.wake()
 
         return downloads
 
@@ -517,32 +1152,150 @@ class DownloadManager:
 
         return download
 
+    def _resolve_url(self, url: str) -> Tuple[Optional[str], Optional[dict], Optional[str]]:
+        """Find the Downloader of a URL.  Returns the name of the Downloader, its info_json, and any error."""
+        try:
+            downloader, info_json = self.get_downloader(url)
+            return downloader.name, info_json, None
+        except InvalidDownload as e:
+            return None, None, str(e)
+
+    def get_resolve_pool(self) -> ThreadPoolExecutor:
+        if not self._resolve_pool:
+            # Threads are used because the webserver workers are daemons, which cannot start child processes.
+            self._resolve_pool = ThreadPoolExecutor(RESOLVE_WORKERS, thread_name_prefix='resolver')
+        return self._resolve_pool
+
+    def shutdown_resolve_pool(self):
+        """Abandon the resolver threads, any URLs they are resolving have timed out."""
+        if not self._resolve_pool:
+            return
+
+        pool, self._resolve_pool = self._resolve_pool, None
+        # A thread cannot be killed.  The abandoned threads finish on their own (the lookups have their own socket
+        # timeouts), new lookups will use a new pool.
+        pool.shutdown(wait=False)
+
+    def start_resolver(self):
+        """Resolve any "resolving" Downloads in the background.  Does nothing if the resolver is already running."""
+        if self._resolver and not self._resolver.done():
+            return
+        self._resolver = asyncio.create_task(self.resolve_downloads())
+
+    async def resolve_downloads(self):
+        """Find the Downloader of every "resolving" Download.  The lookups (`Downloader.valid_url`) may fetch from the
+        internet, so they are run in a thread pool with a timeout, and the results are recorded in bulk.  Resolved
+        downloads are queued after each batch."""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(RESOLVE_WORKERS)
+        timed_out = False
+
+        async def resolve(id_: int, url: str) -> tuple:
+            nonlocal timed_out
+            async with semaphore:
+                try:
+                    coro = loop.run_in_executor(self.get_resolve_pool(), self._resolve_url, url)
+                    name, info_json, error = await asyncio.wait_for(coro, RESOLVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    name, info_json, error = None, None, f'Timed out after {RESOLVE_TIMEOUT} seconds finding the ' \
+                                                         f'Downloader of {url}'
+                except Exception as e:
+                    logger.warning(f'Failed to resolve {url}', exc_info=e)
+                    name, info_json, error = None, None, str(traceback.format_exc())
+            return id_, name, json.dumps(info_json) if info_json else None, error
+
+        while True:
+            with get_db_session() as session:
+                stmt = "SELECT id, url FROM download WHERE status = 'resolving' ORDER BY id LIMIT :limit"
+                rows = session.execute(stmt, dict(limit=RESOLVE_BATCH_SIZE)).fetchall()
+            if not rows:
+                break
+
+            results = await asyncio.gather(*(resolve(id_, url) for id_, url in rows))
+            if timed_out:
+                self.shutdown_resolve_pool()
+                timed_out = False
+
+            with get_db_session(commit=True) as session:
+                curs = session.connection().connection.cursor()
+                # A URL without a Downloader cannot be downloaded.
+                stmt = '''
+                    UPDATE download
+                    SET
+                        downloader = v.downloader,
+                        info_json = CAST(v.info_json AS JSONB),
+                        error = v.error,
+                        status = CASE WHEN v.downloader IS NULL THEN 'failed' ELSE 'new' END
+                    FROM (VALUES %s) AS v (id, downloader, info_json, error)
+                    WHERE download.id = v.id AND download.status = 'resolving'
+                '''
+                template = '(%s::INTEGER, %s::TEXT, %s::TEXT, %s::TEXT)'
+                execute_values(curs, stmt, results, template=template, page_size=len(results))
+            logger.info(f'Resolved {len(results)} downloads')
+
+            self.wake()
+
     @wrol_mode_check
     @optional_session
     async def queue_downloads(self, session: Session = None):
-        """Put all downloads in queue.  Will only queue downloads if there are workers to take them.  Each worker
-        only receives one domain, this is to prevent downloading from one domain many times at once."""
+        """Put all downloads in queue.  Will only queue downloads if there are workers to take them.  Downloads of
+        a domain are only queued when the domain's concurrency and requests per minute allow it (see
+        `get_domain_limits`)."""
         if self.disabled.is_set():
             raise InvalidDownload('DownloadManager is disabled')
 
-        if len(self.data['processing_domains']) >= len(self.workers):
-            return
-
-        # Find download whose domain isn't already being downloaded.
-        new_downloads = session.query(Download).filter(
-            Download.status == 'new',
-            Download.domain not in self.data['processing_domains'],
-        ).order_by(Download.id)  # noqa
+        available_workers = len(self.workers) - self.running_downloads
         count = 0
-        for download in new_downloads:
-            download.manager = self  # Assign this Download to this manager.
-            domain = download.domain
-            if domain not in self.data['processing_domains']:
-                self._add_domain(domain)
+        retry = None
+        while count < available_workers:
+            # Skip domains which cannot start another download.
+            excluded_domains = []
+            for domain in set(self.domain_downloads) | set(self.domain_buckets):
+                wait_time = self._domain_wait_time(domain)
+                if wait_time is None or wait_time:
+                    excluded_domains.append(domain)
+                if wait_time:
+                    # Domain has exceeded its requests per minute.
+                    retry = min(retry or wait_time, wait_time)
+
+            # Get the oldest new download of each domain, start the oldest of those first.
+            stmt = '''
+                SELECT id FROM (
+                    SELECT DISTINCT ON (domain) id
+                    FROM download
+                    WHERE
+                        status = 'new'
+                        AND domain <> ALL(CAST(:excluded_domains AS TEXT[]))
+                        AND id <> ALL(CAST(:queued AS INTEGER[]))
+                    ORDER BY domain, id
+                ) AS d
+                ORDER BY id
+                LIMIT :limit
+            '''
+            params = dict(excluded_domains=excluded_domains, queued=list(self.queued_downloads),
+                          limit=available_workers - count)
+            ids = [i for i, in session.execute(stmt, params)]
+            if not ids:
+                break
+
+            new_downloads = session.query(Download).filter(Download.id.in_(ids)).order_by(Download.id)
+            queued = count
+            for download in new_downloads:
+                if self._domain_wait_time(download.domain) != 0:
+                    # The domain's requests per minute were not yet known.
+                    continue
+                download.manager = self  # Assign this Download to this manager.
+                self._add_domain(download.domain, download.id)
                 await self.download_queue.put(download)
                 count += 1
+            if count == queued:
+                break
+
         if count:
             logger.debug(f'Added {count} downloads to queue.')
+        if retry:
+            self._retry_queue_later(retry)
 
     async def do_downloads(self):
         """Schedule any downloads that are new.
@@ -562,7 +1315,13 @@ class DownloadManager:
         except Exception as e:
             logger.error(f'Unable to delete old downloads!', exc_info=e)
 
+        try:
+            self.delete_old_attempts()
+        except Exception as e:
+            logger.error(f'Unable to delete old download attempts!', exc_info=e)
+
         await self.queue_downloads()
+        self.start_resolver()
 
     async def wait_for_all_downloads(self):
         """Wait for all Downloads in queue AND any new Downloads to complete.
@@ -575,6 +1334,7 @@ class DownloadManager:
             if not self.workers_running():
                 raise ValueError('No workers are running!')
 
+            await self.resolve_downloads()
             await self.queue_downloads()
 
             try:
@@ -594,7 +1354,7 @@ class DownloadManager:
         with get_db_curs(commit=True) as curs:
             curs.execute("UPDATE download SET status='new' WHERE status='pending' OR status='deferred'")
 
-    DOWNLOAD_SORT = ('pending', 'failed', 'new', 'deferred', 'complete')
+    DOWNLOAD_SORT = ('pending', 'failed', 'new', 'resolving', 'deferred', 'complete')
 
     @optional_session
     def get_new_downloads(self, session: Session) -> Generator[Download, None, None]:
@@ -647,16 +1407,35 @@ class DownloadManager:
         """Mark any recurring downloads that are due for download as "new".  Start a download."""
         now_ = now()
 
-        recurring = self.get_recurring_downloads(session)
-        renewed = False
-        for download in recurring:
-            # A new download may not have a `next_download`, create it if necessary.
-            download.next_download = download.next_download or self.calculate_next_download(download, session=session)
-            if download.next_download < now_:
-                download.renew()
-                renewed = True
-
-        if renewed:
+        # Renew all due downloads, and find any which have not been scheduled.  Pending downloads are running.
+        stmt = '''
+            WITH renewed AS (
+                UPDATE download
+                SET status = 'new'
+                WHERE
+                    frequency IS NOT NULL
+                    AND next_download < :now
+                    AND status != 'new'
+                    AND status != 'pending'
+                RETURNING id
+            )
+            SELECT id, true AS renewed FROM renewed
+            UNION ALL
+            SELECT id, false AS renewed FROM download WHERE frequency IS NOT NULL AND next_download IS NULL
+        '''
+        session.flush()
+        results = session.execute(stmt, dict(now=now_)).fetchall()
+        renewed = any(i for _, i in results)
+
+        unscheduled = [id_ for id_, renewed_ in results if not renewed_]
+        if unscheduled:
+            for download in session.query(Download).filter(Download.id.in_(unscheduled)):
+                # A new download may not have a `next_download`, create it.
+                download.next_download = self.calculate_next_download(download, session=session)
+                if download.next_download < now_:
+                    download.renew()
+
+        if renewed or unscheduled:
             session.commit()
 
     def get_downloads(self, session: Session) -> List[Download]:
@@ -692,10 +1471,9 @@ class DownloadManager:
         """Fail a Download. If it is pending, kill the Downloader so the download stops."""
         with get_db_session(commit=True) as session:
             download = self.get_download(session, id_=download_id)
-            downloader = download.get_downloader()
-            logger.warning(f'Killing download {download_id} in {downloader}')
+            logger.warning(f'Killing download {download_id}')
             if download.status == 'pending':
-                downloader.kill()
+                download.get_downloader().kill()
             download.fail()
 
     def stop(self):
@@ -707,6 +1485,12 @@ class DownloadManager:
         for download in self.get_pending_downloads():
             download.defer()
         self.cancel_workers()
+        if self._scheduler:
+            self._scheduler.cancel()
+        if self._resolver:
+            self._resolver.cancel()
+        self.shutdown_resolve_pool()
+        self.stop_listening()
 
     def kill(self):
         """Kill all downloads.  Do not start new downloads."""
@@ -722,8 +1506,13 @@ class DownloadManager:
         for downloader in self.instances:
             downloader.clear()
         self.disabled.clear()
-        self.start_workers()
-        asyncio.create_task(self.do_downloads())
+        self.stopped = False
+        loop = asyncio.get_running_loop()
+        self.start_workers(loop)
+        self.start_scheduler(loop)
+        if not PYTEST:
+            self.listen_for_downloads(loop)
+        self.wake()
 
     FINISHED_STATUSES = ('complete', 'failed')
 
@@ -732,80 +1521,194 @@ class DownloadManager:
 
         Do not delete downloads that are new, or should be tried again."""
         with get_db_session(commit=True) as session:
-            downloads = self.get_once_downloads(session)
+            stmt = '''
+                DELETE FROM download
+                WHERE
+                    frequency IS NULL
+                    AND status = ANY(:statuses)
+                    AND last_successful_download < :one_month
+            '''
             one_month = now() - timedelta(days=30)
-            for download in downloads:
-                if download.status in self.FINISHED_STATUSES and download.last_successful_download and \
-                        download.last_successful_download < one_month:
-                    session.delete(download)
+            session.execute(stmt, dict(statuses=list(self.FINISHED_STATUSES), one_month=one_month))
+
+    @staticmethod
+    def delete_old_attempts():
+        """Delete download attempts which are older than the retention, or which exceed the attempts kept for each
+        Download (see `DownloadMangerConfig`)."""
+        retention_days = DOWNLOAD_MANAGER_CONFIG.attempt_retention_days if DOWNLOAD_MANAGER_CONFIG else 30
+        attempts_per_download = DOWNLOAD_MANAGER_CONFIG.attempts_per_download if DOWNLOAD_MANAGER_CONFIG else 10
+        with get_db_session(commit=True) as session:
+            stmt = '''
+                DELETE FROM download_attempt
+                WHERE
+                    started_at < :oldest
+                    OR id IN (
+                        SELECT id FROM (
+                            SELECT id, ROW_NUMBER() OVER (PARTITION BY download_id ORDER BY id DESC) AS row_num
+                            FROM download_attempt
+                        ) AS a
+                        WHERE row_num > :attempts_per_download
+                    )
+            '''
+            oldest = now() - timedelta(days=retention_days)
+            session.execute(stmt, dict(oldest=oldest, attempts_per_download=attempts_per_download))
+
+    @staticmethod
+    @optional_session
+    def get_download_attempts(download_id: int, session: Session = None) -> List[DownloadAttempt]:
+        """Get the attempts of a Download, newest first."""
+        attempts = session.query(DownloadAttempt).filter_by(download_id=download_id) \
+            .order_by(DownloadAttempt.id.desc()).all()
+        return attempts
 
     def list_downloaders(self) -> List[Downloader]:
         """Return a list of the Downloaders available on this Download Manager."""
         return [i for i in self.instances if i.listable]
 
-    # Downloads should be sorted by their status in a particular order.
-    _status_order = '''CASE
-                        WHEN (status = 'pending') THEN 0
-                        WHEN (status = 'failed') THEN 1
-                        WHEN (status = 'new') THEN 2
-                        WHEN (status = 'deferred') THEN 3
-                        WHEN (status = 'complete') THEN 4
-                    END'''
-
-    def get_fe_downloads(self):
-        """Get downloads for the Frontend."""
-        # Use custom SQL because SQLAlchemy is slow.
+    @staticmethod
+    def get_downloads_version() -> str:
+        """Get the version of the download table.  This changes whenever any Download changes."""
+        with get_db_curs() as curs:
+            # Every insert or update takes a new value from the sequence, and every delete bumps the delete counter, so
+            # the version can be read without reading the download table.
+            curs.execute('SELECT (SELECT last_value FROM download_version_seq),'
+                         ' (SELECT version FROM download_delete_version)')
+            last_value, deletes = curs.fetchone()
+            return f'{last_value}-{deletes}'
+
+    def clear_fe_cache(self):
+        self._fe_cache.clear()
+        self._fe_cache_version = None
+
+    @staticmethod
+    def get_fe_downloads_etag(version: str, progress: dict, **params) -> str:
+        """The ETag of `get_fe_downloads`, it changes when any Download changes, or when the progress changes."""
+        key = json.dumps([version, progress, params], sort_keys=True)
+        return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+    def get_fe_downloads(self, once_limit: Optional[int] = 100, once_after: Tuple[int, str] = None,
+                         recurring_limit: Optional[int] = None, recurring_after: Tuple[int, str] = None,
+                         version: str = None, progress: dict = None):
+        """Get downloads for the Frontend.
+
+        Downloads are paginated using the ID and status of the last Download of the previous page (`once_after`/
+        `recurring_after`).  The "id:status" of the last Download of each page is returned when there may be another
+        page.  The first page is returned if the last Download of the previous page was deleted, or its status
+        changed, because its position in the listing is no longer known.
+
+        The results are cached until the version of the download table changes."""
+        version = self.get_downloads_version() if version is None else version
+        progress = self.get_progress() if progress is None else progress
+
+        if version != self._fe_cache_version or len(self._fe_cache) >= 32:
+            self._fe_cache_version = version
+            self._fe_cache.clear()
+        key = (once_limit, once_after, recurring_limit, recurring_after)
+        if key not in self._fe_cache:
+            self._fe_cache[key] = self._get_fe_downloads(*key)
+        recurring_downloads, once_downloads = self._fe_cache[key]
+
+        # Copy the cached downloads, only the progress is added.
+        recurring_downloads, once_downloads = [dict(i) for i in recurring_downloads], [dict(i) for i in once_downloads]
+        for download in (*recurring_downloads, *once_downloads):
+            if download['status'] == 'pending':
+                download['progress'] = progress.get(download['url'])
+
+        data = dict(
+            recurring_downloads=recurring_downloads,
+            recurring_downloads_next=f'{recurring_downloads[-1]["id"]}:{recurring_downloads[-1]["status"]}'
+            if recurring_limit and len(recurring_downloads) == recurring_limit else None,
+            once_downloads=once_downloads,
+            once_downloads_next=f'{once_downloads[-1]["id"]}:{once_downloads[-1]["status"]}'
+            if once_limit and len(once_downloads) == once_limit else None,
+        )
+        return data
+
+    @staticmethod
+    def _get_fe_downloads(once_limit: Optional[int], once_after: Optional[Tuple[int, str]],
+                          recurring_limit: Optional[int], recurring_after: Optional[Tuple[int, str]]) \
+            -> Tuple[List[dict], List[dict]]:
+        # Use custom SQL because SQLAlchemy is slow.  Timestamps are converted to seconds by the DB.
         with get_db_curs() as curs:
-            stmt = f'''
+            stmt = '''
+                WITH after AS (
+                    SELECT status_order, COALESCE(next_download, 'infinity') AS next_download, frequency, id
+                    FROM download
+                    WHERE id = %(after_id)s AND status = %(after_status)s AND frequency IS NOT NULL
+                )
                 SELECT
                     downloader,
                     frequency,
                     id,
-                    last_successful_download,
-                    next_download,
+                    EXTRACT(EPOCH FROM last_successful_download)::FLOAT8 AS last_successful_download,
+                    EXTRACT(EPOCH FROM next_download)::FLOAT8 AS next_download,
                     status,
                     url,
                     location,
                     error
                 FROM download
-                WHERE frequency IS NOT NULL
+                WHERE
+                    frequency IS NOT NULL
+                    AND (
+                        NOT EXISTS (SELECT 1 FROM after)
+                        OR (status_order, COALESCE(next_download, 'infinity'), frequency, id)
+                            > (SELECT status_order, next_download, frequency, id FROM after)
+                    )
                 ORDER BY
-                    {self._status_order},
-                    next_download,
-                    frequency
+                    status_order,
+                    COALESCE(next_download, 'infinity'),
+                    frequency,
+                    id
+                LIMIT %(limit)s
             '''
-            curs.execute(stmt)
+            after_id, after_status = recurring_after or (None, None)
+            curs.execute(stmt, dict(after_id=after_id, after_status=after_status, limit=recurring_limit))
             recurring_downloads = list(map(dict, curs.fetchall()))
-            recurring_downloads = recursive_replace_tz(recurring_downloads)
 
-            stmt = f'''
+            # Once-downloads are sorted by their most recent download, so the keyset is compared one column at a time.
+            stmt = '''
+                WITH after AS (
+                    SELECT status_order, COALESCE(last_successful_download, 'infinity') AS last_successful_download, id
+                    FROM download
+                    WHERE id = %(after_id)s AND status = %(after_status)s AND frequency IS NULL
+                )
                 SELECT
                     downloader,
                     error,
                     frequency,
                     id,
-                    last_successful_download,
+                    EXTRACT(EPOCH FROM last_successful_download)::FLOAT8 AS last_successful_download,
                     location,
-                    next_download,
+                    EXTRACT(EPOCH FROM next_download)::FLOAT8 AS next_download,
                     status,
                     url
-                FROM download
-                WHERE frequency IS NULL
+                FROM download d
+                WHERE
+                    frequency IS NULL
+                    AND (
+                        NOT EXISTS (SELECT 1 FROM after)
+                        OR EXISTS (
+                            SELECT 1 FROM after a
+                            WHERE
+                                d.status_order > a.status_order
+                                OR (d.status_order = a.status_order AND (
+                                    COALESCE(d.last_successful_download, 'infinity') < a.last_successful_download
+                                    OR (COALESCE(d.last_successful_download, 'infinity') = a.last_successful_download
+                                        AND d.id > a.id)
+                                ))
+                        )
+                    )
                 ORDER BY
-                    {self._status_order},
-                    last_successful_download DESC,
+                    status_order,
+                    COALESCE(last_successful_download, 'infinity') DESC,
                     id
-                LIMIT 100
+                LIMIT %(limit)s
             '''
-            curs.execute(stmt)
+            after_id, after_status = once_after or (None, None)
+            curs.execute(stmt, dict(after_id=after_id, after_status=after_status, limit=once_limit))
             once_downloads = list(map(dict, curs.fetchall()))
-            once_downloads = recursive_replace_tz(once_downloads)
 
-        data = dict(
-            recurring_downloads=recurring_downloads,
-            once_downloads=once_downloads,
-        )
-        return data
+        return recurring_downloads, once_downloads
 
     @optional_session
     def get_pending_downloads(self, session: Session) -> List[Download]:
@@ -841,8 +1744,8 @@ class DownloadManager:
         freq = download.frequency
 
         # Keep this Download in it's position within the like-frequency downloads.
-        downloads = [i.id for i in session.query(Download).filter_by(frequency=freq).order_by(Download.id)]
-        index = downloads.index(download.id)
+        stmt = 'SELECT COUNT(*) FROM download WHERE frequency = :frequency AND id < :id'
+        index = session.execute(stmt, dict(frequency=freq, id=download.id)).scalar()
 
         # Download was successful.  Spread the same-frequency downloads out over their iteration.
         start_date = local_timezone(datetime(2000, 1, 1))
@@ -855,8 +1758,7 @@ class DownloadManager:
         end_date = start_date + timedelta(seconds=freq)
         # Get this downloads position in the next iteration.  If a download is performed at the 3rd slot this week,
         # it will be downloaded the 3rd slot of next week.
-        zagger = zig_zag(start_date, end_date)
-        next_download = [i for i, j in zip(zagger, range(len(downloads)))][index]
+        next_download = zig_zag_slot(start_date, end_date, index)
         next_download = local_timezone(next_download)
         return next_download
 
@@ -891,8 +1793,9 @@ class DownloadManager:
         DOWNLOAD_MANAGER_CONFIG.save()
 
     @staticmethod
-    def remove_from_skip_list(url: str):
-        DOWNLOAD_MANAGER_CONFIG.skip_urls = [i for i in DOWNLOAD_MANAGER_CONFIG.skip_urls if i != url]
+    def remove_from_skip_list(*urls: str):
+        urls = set(urls)
+        DOWNLOAD_MANAGER_CONFIG.skip_urls = [i for i in DOWNLOAD_MANAGER_CONFIG.skip_urls if i not in urls]
         DOWNLOAD_MANAGER_CONFIG.save()
 
 
@@ -903,9 +1806,71 @@ download_manager = DownloadManager()
 class DownloadMangerConfig(ConfigFile):
     file_name = 'download_manager.yaml'
     default_config = dict(
+        attempt_retention_days=30,
+        attempts_per_download=10,
+        bandwidth_limit=0,
+        domain_concurrency=1,
+        domain_limits={},
+        requests_per_minute=0,
         skip_urls=[],
     )
 
+    @property
+    def attempt_retention_days(self) -> int:
+        """The days each download attempt is kept."""
+        return self._config['attempt_retention_days']
+
+    @attempt_retention_days.setter
+    def attempt_retention_days(self, value: int):
+        self.update({'attempt_retention_days': value})
+
+    @property
+    def attempts_per_download(self) -> int:
+        """The most recent attempts which are kept for each Download."""
+        return self._config['attempts_per_download']
+
+    @attempts_per_download.setter
+    def attempts_per_download(self, value: int):
+        self.update({'attempts_per_download': value})
+
+    @property
+    def bandwidth_limit(self) -> int:
+        """The bytes per second all downloads may use.  0 is unlimited."""
+        return self._config['bandwidth_limit']
+
+    @bandwidth_limit.setter
+    def bandwidth_limit(self, value: int):
+        self.update({'bandwidth_limit': value})
+
+    @property
+    def domain_concurrency(self) -> int:
+        """The downloads of a domain which can run at once."""
+        return self._config['domain_concurrency']
+
+    @domain_concurrency.setter
+    def domain_concurrency(self, value: int):
+        self.update({'domain_concurrency': value})
+
+    @property
+    def domain_limits(self) -> Dict[str, dict]:
+        """The `concurrency` and `requests_per_minute` of specific domains.  Example:
+            {'example.com': {'concurrency': 4, 'requests_per_minute': 0}}
+        """
+        return self._config['domain_limits']
+
+    @domain_limits.setter
+    def domain_limits(self, value: Dict[str, dict]):
+        self.update({'domain_limits': value})
+
+    @property
+    def requests_per_minute(self) -> float:
+        """The downloads of a domain which can be started each minute.  0 is unlimited."""
+        return self._config['requests_per_minute']
+
+    @requests_per_minute.setter
+    def requests_per_minute(self, value: float):
+        self.update({'requests_per_minute': value})
+
     @property
     def skip_urls(self) -> List[str]:
         return self._config['skip_urls']
@@ -6,7 +6,7 @@ from decimal import Decimal
 from functools import wraps
 from http import HTTPStatus
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional, Tuple
 
 from pytz import UnknownTimeZoneError
 from sanic import Sanic, response, Blueprint, __version__ as sanic_version
@@ -21,6 +21,7 @@ from wrolpi.admin import HotspotStatus
 from wrolpi.common import set_sanic_url_parts, logger, get_config, wrol_mode_enabled, Base, get_media_directory, \
     wrol_mode_check, native_only, set_wrol_mode
 from wrolpi.dates import set_timezone
+from wrolpi.db import get_db_pool_status
 from wrolpi.downloader import download_manager
 from wrolpi.errors import WROLModeEnabled, InvalidTimezone, API_ERRORS, APIError, ValidationError, HotspotError
 from wrolpi.media_path import MediaPath
@@ -130,6 +131,7 @@ def get_settings(_: Request):
         'throttle_status': admin.throttle_status().name,
         'timezone': config.timezone,
         'version': __version__,
+        'watch_media_directory': config.watch_media_directory,
         'wrol_mode': config.wrol_mode,
     }
     return json_response(settings)
@@ -209,16 +211,76 @@ async def post_download(_: Request, body: DownloadRequest):
         download_manager.recurring_download(urls[0], body.frequency, downloader=downloader,
                                             sub_downloader=body.sub_downloader, reset_attempts=True)
     else:
+        # Downloaders will be found in the background, finding them may take a long time.
         download_manager.create_downloads(urls, downloader=downloader, sub_downloader=body.sub_downloader,
-                                          reset_attempts=True)
+                                          reset_attempts=True, resolve=False)
     return response.empty()
 
 
+def get_int_arg(request: Request, name: str, default: int = None) -> Optional[int]:
+    value = request.args.get(name)
+    if value in (None, '', 'null'):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError(f'{name} must be an integer') from None
+    if value < 0:
+        raise ValidationError(f'{name} cannot be negative')
+    return value
+
+
+def get_bool_arg(request: Request, name: str, default: bool = False) -> bool:
+    value = request.args.get(name)
+    if value in (None, '', 'null'):
+        return default
+    value = value.lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValidationError(f'{name} must be a boolean')
+
+
+def get_download_after_arg(request: Request, name: str) -> Optional[Tuple[int, str]]:
+    """Get the ID and status of the last Download of the previous page (formatted as "id:status")."""
+    value = request.args.get(name)
+    if value in (None, '', 'null'):
+        return None
+    id_, _, status = value.partition(':')
+    try:
+        return int(id_), status
+    except ValueError:
+        raise ValidationError(f'{name} must be the ID and status of a download') from None
+
+
 @root_api.get('/download')
-@openapi.description('Get all Downloads that need to be processed.')
-async def get_downloads(_: Request):
-    data = download_manager.get_fe_downloads()
-    return json_response(data)
+@openapi.description('Get Downloads that need to be processed.  Pages of Downloads are requested using the values'
+                     ' which were returned in `once_downloads_next` and `recurring_downloads_next`.')
+async def get_downloads(request: Request):
+    params = dict(
+        once_limit=get_int_arg(request, 'once_limit', 100),
+        once_after=get_download_after_arg(request, 'once_after'),
+        recurring_limit=get_int_arg(request, 'recurring_limit'),
+        recurring_after=get_download_after_arg(request, 'recurring_after'),
+    )
+    # The downloads have not changed since the last request, the frontend can use what it already has.
+    version = download_manager.get_downloads_version()
+    progress = download_manager.get_progress()
+    etag = download_manager.get_fe_downloads_etag(version, progress, **params)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if request.headers.get('If-None-Match') == etag:
+        return response.empty(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+    data = download_manager.get_fe_downloads(**params, version=version, progress=progress)
+    return json_response(data, headers=headers)
+
+
+@root_api.get('/download/<download_id:int>/attempts')
+@openapi.description('Get the most recent attempts of a Download, and their entire errors.')
+async def get_download_attempts(_: Request, download_id: int):
+    attempts = download_manager.get_download_attempts(download_id)
+    return json_response({'attempts': [i.__json__() for i in attempts]})
 
 
 @root_api.post('/download/<download_id:int>/kill')
@@ -319,7 +381,8 @@ async def get_status(_: Request):
     cpu_info = await status.get_cpu_info()
     load = await status.get_load()
     drives = await status.get_drives_info()
-    ret = dict(cpu_info=cpu_info, load=load, drives=drives)
+    db_pool = get_db_pool_status()
+    ret = dict(cpu_info=cpu_info, load=load, drives=drives, db_pool=db_pool)
     return json_response(ret)
 
 
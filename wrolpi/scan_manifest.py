@@ -0,0 +1,190 @@
+"""
+A persistent record of what was found during the previous scan of a directory tree.
+
+Each directory that is scanned is stored with its modification time, its sub-directories, and the signature
+(inode, size, modification time) of each of its files.  A directory's modification time changes when an entry is
+added, removed or renamed, so a directory whose modification time has not changed does not need to be listed again.
+A scan only lists the directories which have changed, and reports which files are new/modified, or deleted.
+
+A file which is modified in place does not change the modification time of its directory.  Use `full=True` to list
+every directory and compare every file's signature.
+"""
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from psycopg2.extras import execute_values
+from sqlalchemy import Column, Integer, Text, BigInteger, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+
+from wrolpi.common import Base, ModelHelper, logger
+from wrolpi.db import get_db_curs
+
+logger = logger.getChild(__name__)
+
+# Modification times this close to the start of a scan cannot be trusted, the file system may not have ticked since.
+RACY_NS = 2_000_000_000
+
+
+class ScanDirectory(ModelHelper, Base):
+    """A directory that was listed during a scan."""
+    __tablename__ = 'scan_directory'  # noqa
+    __table_args__ = (UniqueConstraint('scanner', 'path'),)
+    id = Column(Integer, primary_key=True)
+    scanner = Column(Text, nullable=False)
+    path = Column(Text, nullable=False)
+
+    # NULL when the directory must be listed during the next scan.
+    mtime_ns = Column(BigInteger)
+    # The names of the sub-directories of this directory.
+    directories = Column(JSONB, nullable=False)
+    # {name: [inode, size, mtime_ns]} of each file in this directory.
+    files = Column(JSONB, nullable=False)
+
+    def __repr__(self):
+        return f'<ScanDirectory id={self.id} scanner={self.scanner} path={self.path}>'
+
+
+@dataclass
+class ScanResult:
+    scanner: str
+    directory: Path
+    # No manifest existed for this directory, all files are new.
+    first_scan: bool = False
+    # All files that currently exist.
+    paths: List[Path] = field(default_factory=list)
+    # Files that are new, or whose signature has changed.
+    modified: List[Path] = field(default_factory=list)
+    # Files that existed during the previous scan.
+    deleted: List[Path] = field(default_factory=list)
+    # The directory rows that will be written when this scan is saved.
+    changed_directories: Dict[str, tuple] = field(default_factory=dict)
+    removed_directories: List[str] = field(default_factory=list)
+
+    def __repr__(self):
+        return f'<ScanResult scanner={self.scanner} directory={self.directory} first_scan={self.first_scan} ' \
+               f'paths={len(self.paths)} modified={len(self.modified)} deleted={len(self.deleted)}>'
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.first_scan or self.modified or self.deleted)
+
+    def save(self):
+        """Write the manifest of this scan.  This should only be called after the results have been processed, so an
+        interrupted refresh will find the same changes again."""
+        if not self.changed_directories and not self.removed_directories:
+            return
+
+        # Use a separate connection, the pending changes of the caller's Session must not be committed.
+        with get_db_curs(commit=True) as curs:
+            if self.changed_directories:
+                stmt = '''
+                    INSERT INTO scan_directory (scanner, path, mtime_ns, directories, files)
+                    VALUES %s
+                    ON CONFLICT (scanner, path) DO UPDATE SET
+                        mtime_ns = EXCLUDED.mtime_ns,
+                        directories = EXCLUDED.directories,
+                        files = EXCLUDED.files
+                '''
+                rows = [(self.scanner, path, mtime_ns, json_dumps(directories), json_dumps(files))
+                        for path, (mtime_ns, directories, files) in self.changed_directories.items()]
+                execute_values(curs, stmt, rows, template='(%s, %s, %s, %s::JSONB, %s::JSONB)')
+            if self.removed_directories:
+                curs.execute('DELETE FROM scan_directory WHERE scanner = %s AND path = ANY(%s)',
+                             (self.scanner, self.removed_directories))
+
+
+def json_dumps(obj) -> str:
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def _get_manifest(scanner: str, directory: Path) -> Dict[str, tuple]:
+    # Use a separate connection, a Session would rollback the pending changes of the caller.
+    with get_db_curs() as curs:
+        directory = str(directory)
+        like = directory.rstrip('/').replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%'
+        curs.execute('SELECT path, mtime_ns, directories, files FROM scan_directory '
+                     'WHERE scanner = %s AND (path = %s OR path LIKE %s)', (scanner, directory, like))
+        return {path: (mtime_ns, directories, files) for (path, mtime_ns, directories, files) in curs.fetchall()}
+
+
+def _list_directory(directory: str, scan_start: int) -> Optional[tuple]:
+    """List a directory, return its sub-directories, and the signature of each of its files."""
+    directories, files = list(), dict()
+    try:
+        entries = list(os.scandir(directory))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    except PermissionError as e:
+        logger.warning(f'Unable to scan {directory}', exc_info=e)
+        return None
+
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                directories.append(entry.name)
+            elif entry.is_file():
+                stat = entry.stat()
+                # The file may change again without changing its modification time.
+                mtime_ns = stat.st_mtime_ns if stat.st_mtime_ns < scan_start - RACY_NS else None
+                files[entry.name] = [stat.st_ino, stat.st_size, mtime_ns]
+        except FileNotFoundError:
+            # File was deleted during the scan.
+            pass
+    return sorted(directories), files
+
+
+def scan(scanner: str, directory: Path, full: bool = False) -> ScanResult:
+    """Scan `directory` for files.  Compare the files found to the previous scan of the same `scanner`.
+
+    Call `ScanResult.save` after the results have been processed."""
+    directory = Path(directory).absolute()
+    manifest = _get_manifest(scanner, directory)
+    result = ScanResult(scanner, directory, first_scan=not manifest)
+    scan_start = time.time_ns()
+
+    visited = set()
+    stack = [str(directory)]
+    while stack:
+        path = stack.pop()
+        old = manifest.get(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+        if not full and old and old[0] is not None and old[0] == mtime_ns:
+            # Directory has not changed, use the previous listing.
+            _, directories, files = old
+        else:
+            listing = _list_directory(path, scan_start)
+            if listing is None:
+                continue
+            directories, files = listing
+            old_files = old[2] if old else dict()
+            for name, signature in files.items():
+                old_signature = old_files.get(name)
+                if not old_signature or None in old_signature or old_signature != signature:
+                    result.modified.append(Path(path) / name)
+            result.deleted.extend(Path(path) / i for i in old_files if i not in files)
+            # A recently modified directory may change again without changing its modification time.  List it again
+            # during the next scan, so its recently modified files will be checked again.
+            racy = mtime_ns >= scan_start - RACY_NS or any(i[2] is None for i in files.values())
+            mtime_ns = None if racy else mtime_ns
+            result.changed_directories[path] = (mtime_ns, directories, files)
+
+        visited.add(path)
+        result.paths.extend(Path(path) / i for i in files)
+        stack.extend(os.path.join(path, i) for i in directories)
+
+    # Any directory which was not visited no longer exists, all of its files were deleted.
+    for path, (_, _, files) in manifest.items():
+        if path not in visited:
+            result.deleted.extend(Path(path) / i for i in files)
+            result.removed_directories.append(path)
+
+    logger.debug(result)
+    return result
@@ -25,6 +25,7 @@ class SettingsRequest:
     throttle_on: Optional[bool] = None
     throttle_on_startup: Optional[bool] = None
     timezone: Optional[str] = None
+    watch_media_directory: Optional[bool] = None
     wrol_mode: Optional[bool] = None
 
 
@@ -1,5 +1,6 @@
 import os
 import pathlib
+import sys
 import tempfile
 import unittest
 from datetime import date, datetime
@@ -8,7 +9,7 @@ from decimal import Decimal
 import pytest
 
 from wrolpi.common import insert_parameter, date_range, api_param_limiter, chdir, zig_zag, \
-    escape_file_name
+    escape_file_name, walk, walk_entries, zig_zag_slot
 from wrolpi.dates import set_timezone, now
 from wrolpi.errors import InvalidTimezone
 from wrolpi.test.common import build_test_directories
@@ -271,10 +272,12 @@ def test_chdir():
 ])
 def test_zig_zag(low, high, expected):
     zagger = zig_zag(low, high)
-    for i in expected:
+    for idx, i in enumerate(expected):
         result = next(zagger)
         assert result == i
         assert low <= result < high
+        # Any result can be calculated directly.
+        assert zig_zag_slot(low, high, idx) == i
 
 
 @pytest.mark.parametrize(
@@ -296,3 +299,36 @@ def test_zig_zag(low, high, expected):
 )
 def test_escape_file_name(name, expected):
     assert escape_file_name(name) == expected
+
+
+def test_walk(test_directory):
+    root = test_directory / 'walk'
+    (root / 'foo/bar').mkdir(parents=True)
+    (root / 'foo/bar/baz.txt').touch()
+    (root / 'qux.txt').touch()
+
+    assert sorted(walk(root)) == [
+        root / 'foo',
+        root / 'foo/bar',
+        root / 'foo/bar/baz.txt',
+        root / 'qux.txt',
+    ]
+
+    # A directory is always yielded before its contents.
+    paths = list(walk(root))
+    assert paths.index(root / 'foo') < paths.index(root / 'foo/bar') < paths.index(root / 'foo/bar/baz.txt')
+
+    # Deep directories do not exceed the recursion limit.
+    depth = sys.getrecursionlimit() + 100
+    path = root / 'deep'
+    path.mkdir()
+    for _ in range(depth):
+        path = path / 'd'
+        path.mkdir()
+    try:
+        assert len([i for i in walk_entries(root / 'deep') if i.name == 'd']) == depth
+    finally:
+        # shutil.rmtree also recurses.
+        for _ in range(depth):
+            path.rmdir()
+            path = path.parent
@@ -1,6 +1,7 @@
+from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
-from wrolpi.db import optional_session, get_db_session
+from wrolpi.db import optional_session, get_db_session, get_db_pool_status, get_pool_args, get_db_args
 
 
 def test_optional_session(test_session):
@@ -35,3 +36,25 @@ def test_optional_session(test_session):
     func(session=test_session)
     func(test_session)
 
+
+def test_get_db_pool_status(test_session):
+    """The status of the connection pool can be reported."""
+    # Tests use a NullPool.
+    assert get_db_pool_status()['mode'] == 'null'
+
+    uri = 'postgresql://{user}:{password}@{host}:{port}/{dbname}'.format(**get_db_args('postgres'))
+    pooled_engine = create_engine(uri, **get_pool_args('queue'))
+    try:
+        status = get_db_pool_status(pooled_engine)
+        assert status['mode'] == 'queue'
+        assert status['checked_out'] == 0
+
+        with pooled_engine.connect():
+            assert get_db_pool_status(pooled_engine)['checked_out'] == 1
+
+        # Connection was returned to the pool.
+        status = get_db_pool_status(pooled_engine)
+        assert status['checked_out'] == 0
+        assert status['checked_in'] == 1
+    finally:
+        pooled_engine.dispose()
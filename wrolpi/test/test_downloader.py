@@ -1,6 +1,9 @@
 import asyncio
+import multiprocessing
+import threading
+import time
 from abc import ABC
-from datetime import datetime
+from datetime import datetime, timedelta
 from itertools import zip_longest
 from typing import Tuple, Optional
 from unittest import mock
@@ -10,7 +13,8 @@ import pytest
 
 from wrolpi.dates import local_timezone, Seconds, now
 from wrolpi.db import get_db_context
-from wrolpi.downloader import Downloader, Download, DownloadFrequency, DownloadResult
+from wrolpi.downloader import Downloader, Download, DownloadFrequency, DownloadResult, MAX_SCHEDULER_SLEEP, \
+    parse_progress
 from wrolpi.errors import UnrecoverableDownloadError, InvalidDownload, WROLModeEnabled
 from wrolpi.test.common import assert_dict_contains
 
@@ -118,6 +122,83 @@ async def test_ensure_download(test_session, test_download_manager):
     assert test_download_manager.get_download(test_session, 'https://example.com/not downloading') is None
 
 
+@pytest.mark.asyncio
+async def test_download_scheduler(test_session, test_download_manager):
+    """The scheduler queues a download as soon as it is created, and sleeps until a recurring download is due."""
+    http_downloader = HTTPDownloader()
+    http_downloader.do_download = MagicMock()
+    http_downloader.do_download.return_value = DownloadResult(success=True)
+    test_download_manager.register_downloader(http_downloader)
+
+    # No downloads are due.
+    assert test_download_manager.seconds_until_next_download() == MAX_SCHEDULER_SLEEP
+
+    test_download_manager.start_scheduler(asyncio.get_running_loop())
+    try:
+        download = test_download_manager.create_download('https://example.com')
+        await asyncio.sleep(0.5)
+        http_downloader.do_download.assert_called_once()
+        test_session.refresh(download)
+        assert download.status == 'complete'
+
+        # A recurring download is due in 10 minutes.
+        download.frequency = DownloadFrequency.daily
+        download.next_download = now() + timedelta(minutes=10)
+        test_session.commit()
+        assert 599 < test_download_manager.seconds_until_next_download() <= 601
+    finally:
+        test_download_manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_resolve_downloads(test_session, test_download_manager):
+    """The Downloader of a URL can be found after the Download is created."""
+    http_downloader = HTTPDownloader()
+    http_downloader.do_download = MagicMock()
+    http_downloader.do_download.return_value = DownloadResult(success=True)
+    test_download_manager.register_downloader(http_downloader)
+
+    with mock.patch.object(test_download_manager, 'get_downloader', wraps=test_download_manager.get_downloader) as \
+            mock_get_downloader:
+        d1, d2 = test_download_manager.create_downloads(['https://example.com', 'ftp://example.com'], resolve=False)
+        mock_get_downloader.assert_not_called()
+    assert (d1.status, d1.downloader) == (d2.status, d2.downloader) == ('resolving', None)
+
+    await test_download_manager.resolve_downloads()
+    test_session.expire_all()
+    assert (d1.status, d1.downloader, d1.error) == ('new', 'http', None)
+    # A URL without a Downloader cannot be downloaded.
+    assert (d2.status, d2.downloader) == ('failed', None)
+    assert 'Invalid URL' in d2.error
+
+
+@pytest.mark.asyncio
+async def test_resolve_downloads_pool(test_session, test_download_manager):
+    """URLs are resolved in the resolver threads.  A URL which takes too long to resolve fails."""
+    http_downloader = HTTPDownloader()
+    test_download_manager.register_downloader(http_downloader)
+
+    threads = set()
+    get_downloader = test_download_manager.get_downloader
+
+    def slow_get_downloader(url):
+        threads.add(threading.current_thread().name)
+        if url.endswith('slow'):
+            time.sleep(1)
+        return get_downloader(url)
+
+    d1, d2 = test_download_manager.create_downloads(['https://example.com', 'https://example.com/slow'],
+                                                    resolve=False)
+    with mock.patch.object(test_download_manager, 'get_downloader', slow_get_downloader), \
+            mock.patch('wrolpi.downloader.RESOLVE_TIMEOUT', 0.2):
+        await test_download_manager.resolve_downloads()
+    test_session.expire_all()
+    assert threads and all(i.startswith('resolver') for i in threads)
+    assert (d1.status, d1.downloader) == ('new', 'http')
+    assert (d2.status, d2.downloader) == ('failed', None)
+    assert 'Timed out' in d2.error
+
+
 @pytest.mark.asyncio
 async def test_create_downloads(test_session, test_download_manager):
     """Multiple downloads can be scheduled using DownloadManager.create_downloads."""
@@ -136,6 +217,43 @@ async def test_create_downloads(test_session, test_download_manager):
     downloads = test_download_manager.get_downloads(test_session)
     assert {i.url for i in downloads} == {'https://example.com/1', 'https://example.com/2'}
 
+    # Existing Downloads are renewed, duplicate URLs are ignored.
+    downloads[0].status = 'failed'
+    test_session.commit()
+    d1, d3, d2 = test_download_manager.create_downloads(
+        ['https://example.com/1', 'https://example.com/3', 'https://example.com/1', 'https://example.com/2'])
+    assert [i.url for i in (d1, d2, d3)] == ['https://example.com/1', 'https://example.com/2', 'https://example.com/3']
+    assert {i.id for i in (d1, d2)} == {i.id for i in downloads}
+    assert d1.status == d3.status == 'new'
+    assert test_session.query(Download).count() == 3
+
+
+def test_get_downloads_version(test_session, test_download_manager):
+    """The version of the download table changes when a Download is inserted, updated or deleted."""
+    version = test_download_manager.get_downloads_version()
+    assert test_download_manager.get_downloads_version() == version
+
+    download = Download(url='https://example.com/1')
+    test_session.add(download)
+    test_session.commit()
+    assert test_download_manager.get_downloads_version() != version
+    version = test_download_manager.get_downloads_version()
+
+    download.status = 'failed'
+    test_session.commit()
+    assert test_download_manager.get_downloads_version() != version
+    version = test_download_manager.get_downloads_version()
+
+    test_session.delete(download)
+    test_session.commit()
+    assert test_download_manager.get_downloads_version() != version
+    version = test_download_manager.get_downloads_version()
+
+    # Deleting nothing does not change the version.
+    test_session.query(Download).filter_by(url='https://example.com/1').delete()
+    test_session.commit()
+    assert test_download_manager.get_downloads_version() == version
+
 
 def test_downloader_must_have_name():
     """
@@ -310,6 +428,53 @@ async def test_max_attempts(test_session, test_download_manager):
     assert download.status == 'failed'
 
 
+@pytest.mark.asyncio
+async def test_download_attempts(test_session, test_download_manager, test_download_manager_config):
+    """Every attempt of a Download is logged with its entire error.  Old attempts are deleted."""
+    from wrolpi.downloader import DOWNLOAD_MANAGER_CONFIG
+
+    http_downloader = HTTPDownloader()
+    http_downloader.do_download = MagicMock()
+    error = 'x' * 5000 + ' the exception'
+    http_downloader.do_download.return_value = DownloadResult(success=False, error=error, exit_code=1,
+                                                              downloaded_bytes=1024)
+    test_download_manager.register_downloader(http_downloader)
+
+    test_download_manager.create_download('https://example.com')
+    await test_download_manager.wait_for_all_downloads()
+    http_downloader.do_download.return_value = DownloadResult(success=True, exit_code=0)
+    test_download_manager.create_download('https://example.com')
+    await test_download_manager.wait_for_all_downloads()
+
+    download = test_session.query(Download).one()
+    assert download.error is None
+    success, failure = test_download_manager.get_download_attempts(download.id)
+    assert success.success is True and success.exit_code == 0 and success.error is None
+    assert failure.success is False and failure.exit_code == 1 and failure.downloaded_bytes == 1024
+    # The entire error is compressed.
+    assert failure.error == error and len(failure.error_gz) < len(error)
+    assert failure.started_at <= failure.ended_at <= success.started_at
+
+    # Only the end of an error is kept in the Download.
+    http_downloader.do_download.return_value = DownloadResult(success=False, error=error)
+    test_download_manager.create_download('https://example.com')
+    await test_download_manager.wait_for_all_downloads()
+    test_session.expire_all()
+    assert test_session.query(Download).one().error.endswith(' the exception')
+    assert len(test_session.query(Download).one().error) < len(error)
+
+    # Only the newest attempts are kept.
+    DOWNLOAD_MANAGER_CONFIG.attempts_per_download = 2
+    test_download_manager.delete_old_attempts()
+    assert len(test_download_manager.get_download_attempts(download.id)) == 2
+
+    # Old attempts are deleted.
+    with mock.patch('wrolpi.downloader.now') as mock_now:
+        mock_now.return_value = now() + timedelta(days=31)
+        test_download_manager.delete_old_attempts()
+    assert test_download_manager.get_download_attempts(download.id) == []
+
+
 @pytest.mark.asyncio
 async def test_skip_urls(test_session, test_download_manager, test_client, assert_download_urls):
     """The DownloadManager will not create downloads for URLs in it's skip list."""
@@ -366,6 +531,76 @@ async def test_process_runner_timeout(test_directory):
     assert 2 < elapsed.total_seconds() < 4
 
 
+def fork_target(conn, lines: int, sleep: int):
+    for i in range(lines):
+        conn.send(('stdout', f'line {i}'))
+    conn.send(('progress', dict(downloaded_bytes=512, eta=None, percent=100, speed=None, total_bytes=512)))
+    conn.send(('stderr', 'error'))
+    time.sleep(sleep)
+
+
+def exit_target(conn, code: int):
+    raise SystemExit(code)
+
+
+@pytest.mark.asyncio
+async def test_fork_runner(test_directory):
+    """A function can be run in a fork, its output and progress is sent back.  The fork can be killed."""
+    downloader = Downloader(0, 'downloader', timeout=1)
+
+    with mock.patch('wrolpi.downloader.PROCESS_LOG_LINES', 3):
+        return_code, logs = await downloader.fork_runner('https://example.com', fork_target, (5, 0))
+    assert return_code == 0
+    assert logs == {'stdout': b'line 2\nline 3\nline 4', 'stderr': b'error', 'downloaded_bytes': 512}
+
+    # Timeout is obeyed.
+    start = datetime.now()
+    return_code, logs = await downloader.fork_runner('https://example.com', fork_target, (1, 8))
+    elapsed = datetime.now() - start
+    assert 1 < elapsed.total_seconds() < 5
+    assert return_code != 0
+    assert logs['stdout'] == b'line 0'
+
+    # The fork exits with the code of the target.
+    return_code, logs = await downloader.fork_runner('https://example.com', exit_target, (3,))
+    assert return_code == 3
+
+    # The webserver workers are daemon processes, they can still fork a download.
+    with mock.patch.dict(multiprocessing.current_process()._config, daemon=True):
+        assert multiprocessing.current_process().daemon
+        return_code, logs = await downloader.fork_runner('https://example.com', fork_target, (1, 0))
+    assert return_code == 0
+    assert logs['stdout'] == b'line 0'
+
+
+@pytest.mark.parametrize('line,expected', [
+    ('[download]  45.3% of ~10.00MiB at  1.23MiB/s ETA 00:05',
+     dict(downloaded_bytes=4750049, eta=5, percent=45.3, speed=1289748, total_bytes=10485760)),
+    ('[download] 100% of 300.00KB in 00:02',
+     dict(downloaded_bytes=300000, eta=None, percent=100, speed=None, total_bytes=300000)),
+    ('[download] Destination: video.mp4', None),
+])
+def test_parse_progress(line, expected):
+    assert parse_progress(line) == expected
+
+
+@pytest.mark.asyncio
+async def test_process_runner_output(test_directory):
+    """Output of a download process is streamed, only the last lines are kept.  Progress is published."""
+    downloader = Downloader(0, 'downloader')
+    progress = []
+    output = ''.join(f'line {i}\\n' for i in range(5)) + '[download]  50.0%% of 1.00KiB\\r[download] 100%% of 1.00KiB'
+    cmd = ('sh', '-c', f'printf "{output}"; printf "error" >&2')
+    with mock.patch('wrolpi.downloader.PROCESS_LOG_LINES', 3), \
+            mock.patch.object(downloader.manager, 'set_progress', lambda url, i: progress.append(i['percent'])):
+        return_code, logs = await downloader.process_runner('https://example.com', cmd, test_directory)
+    assert return_code == 0
+    assert logs == {'stdout': b'line 2\nline 3\nline 4', 'stderr': b'error', 'downloaded_bytes': 1024}
+    # Progress is published at most every second, but the completed progress is always published.
+    assert progress == [50.0, 100.0]
+    assert 'https://example.com' not in downloader.manager.get_progress()
+
+
 @pytest.mark.asyncio
 async def test_multi_domain_download(test_session, test_directory, test_download_manager):
     class TestDownloader(Downloader, ABC):
@@ -402,3 +637,76 @@ async def test_multi_domain_download(test_session, test_directory, test_download
     # Downloading more domains that workers is possible.
     urls = [f'https://example.{i}' for i in range(test_download_manager.worker_count + 2)]
     await wait_and_assert(urls, 3)
+
+
+@pytest.mark.asyncio
+async def test_queue_downloads_domain(test_session, test_download_manager):
+    """The domain of a Download is stored, only the oldest download of each free domain is queued."""
+    http_downloader = HTTPDownloader()
+    test_download_manager.register_downloader(http_downloader)
+
+    d1, d2, d3 = test_download_manager.create_downloads(
+        ['https://example.com/1', 'https://example.com/2', 'https://example.org:8080/1'])
+    test_session.commit()
+    assert [i.domain for i in (d1, d2, d3)] == ['example.com', 'example.com', 'example.org:8080']
+    d1.url = 'https://example.net/1'
+    assert d1.domain == 'example.net'
+    test_session.commit()
+
+    # Don't start the downloads.
+    test_download_manager.cancel_workers()
+    test_download_manager._add_domain('example.com', 0)
+    await test_download_manager.queue_downloads()
+    queued = [test_download_manager.download_queue.get_nowait() for _ in
+              range(test_download_manager.download_queue.qsize())]
+    assert [i.id for i in queued] == [d1.id, d3.id]
+
+
+@pytest.mark.asyncio
+async def test_domain_limits(test_session, test_download_manager):
+    """The concurrency and requests per minute of a domain can be configured."""
+    from wrolpi.downloader import DOWNLOAD_MANAGER_CONFIG
+    DOWNLOAD_MANAGER_CONFIG.domain_limits = {'example.com': {'concurrency': 2}}
+
+    class TestDownloader(Downloader, ABC):
+        name = 'test_downloader'
+
+        @classmethod
+        def valid_url(cls, url: str) -> Tuple[bool, Optional[dict]]:
+            return True, {}
+
+        async def do_download(self, download: Download) -> DownloadResult:
+            await asyncio.sleep(1)
+            return DownloadResult(success=True)
+
+    test_downloader = TestDownloader()
+    test_download_manager.register_downloader(test_downloader)
+
+    # Sub-domains share the limits of their domain.
+    assert test_download_manager.get_domain_limits('www.example.com:443') == (2, 0)
+    assert test_download_manager.get_domain_limits('example.org') == (1, 0)
+
+    # Two downloads of example.com can run at once.
+    urls = [f'https://example.com/{i}' for i in range(4)]
+    test_download_manager.create_downloads(urls, downloader=test_downloader.name)
+    start = now()
+    await test_download_manager.wait_for_all_downloads()
+    assert 2 <= (now() - start).total_seconds() < 3
+    assert test_download_manager.domain_downloads == dict()
+
+    # Only 30 downloads of example.org can start each minute, one every two seconds.
+    DOWNLOAD_MANAGER_CONFIG.domain_limits = {'example.org': {'concurrency': 2, 'requests_per_minute': 30}}
+    assert test_download_manager._domain_wait_time('example.org') == 0
+    test_download_manager._add_domain('example.org', 1)
+    assert test_download_manager._domain_wait_time('example.org') == 0
+    test_download_manager._add_domain('example.org', 2)
+    # Concurrency has been reached.
+    assert test_download_manager._domain_wait_time('example.org') is None
+    test_download_manager._remove_domain('example.org', 1)
+    assert 1.9 < test_download_manager._domain_wait_time('example.org') <= 2
+
+    # The bandwidth limit is split between running downloads.
+    assert test_download_manager.get_bandwidth_limit() is None
+    DOWNLOAD_MANAGER_CONFIG.bandwidth_limit = 1000
+    test_download_manager._add_domain('example.net', 3)
+    assert test_download_manager.get_bandwidth_limit() == 500
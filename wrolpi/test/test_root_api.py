@@ -116,8 +116,8 @@ class TestRootAPI(TestAPI):
                 dict(status='failed'),
                 dict(status='failed', last_successful_download=strptime('2020-01-01 00:00:01')),
             ]
-            for download in downloads:
-                session.add(Download(url=download.pop('url', 'https://example.com'), **download))
+            for idx, download in enumerate(downloads):
+                session.add(Download(url=download.pop('url', f'https://example.com/{idx}'), **download))
 
         expected = [
             dict(status='pending', last_successful_download=strptime('2020-01-01 00:00:04').timestamp()),
@@ -146,8 +146,8 @@ class TestRootAPI(TestAPI):
                 dict(status='failed', frequency=1),
                 dict(status='failed', frequency=1),
             ]
-            for download in downloads:
-                session.add(Download(url='https://example.com', **download))
+            for idx, download in enumerate(downloads):
+                session.add(Download(url=f'https://example.com/{idx}', **download))
 
         expected = [
             dict(status='pending', frequency=1),
@@ -301,6 +301,64 @@ def test_clear_downloads(test_session, test_client, test_config, test_download_m
     assert DOWNLOAD_MANAGER_CONFIG.skip_urls == ['https://example.com/5', ]
 
 
+def test_get_downloads_pages(test_session, test_client):
+    """Downloads can be requested in pages.  A download listing is not sent again if the downloads have not changed."""
+    with get_db_session(commit=True) as session:
+        session.add_all([Download(url=f'https://example.com/{i}', status='complete') for i in range(5)])
+        session.add(Download(url='https://example.com/pending', status='pending'))
+        session.add_all([Download(url=f'https://example.com/r{i}', frequency=60) for i in range(3)])
+
+    request, response = test_client.get('/api/download?once_limit=4&recurring_limit=2')
+    assert response.status_code == HTTPStatus.OK
+    assert [i['url'] for i in response.json['once_downloads']] == \
+           ['https://example.com/pending'] + [f'https://example.com/{i}' for i in range(3)]
+    assert [i['url'] for i in response.json['recurring_downloads']] == \
+           ['https://example.com/r0', 'https://example.com/r1']
+    once_next, recurring_next = response.json['once_downloads_next'], response.json['recurring_downloads_next']
+    etag = response.headers['ETag']
+
+    # Next page continues after the last download of the previous page.
+    request, response = test_client.get(f'/api/download?once_limit=4&once_after={once_next}'
+                                        f'&recurring_limit=2&recurring_after={recurring_next}')
+    assert [i['url'] for i in response.json['once_downloads']] == ['https://example.com/3', 'https://example.com/4']
+    assert [i['url'] for i in response.json['recurring_downloads']] == ['https://example.com/r2']
+    assert response.json['once_downloads_next'] is None
+    assert response.json['recurring_downloads_next'] is None
+
+    # Nothing changed.
+    request, response = test_client.get('/api/download?once_limit=4&recurring_limit=2',
+                                        headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    # A download changed, the listing is sent again.
+    with get_db_session(commit=True) as session:
+        session.query(Download).filter_by(url='https://example.com/0').one().status = 'failed'
+    request, response = test_client.get('/api/download?once_limit=4&recurring_limit=2',
+                                        headers={'If-None-Match': etag})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['ETag'] != etag
+    assert [i['url'] for i in response.json['once_downloads']][:2] == \
+           ['https://example.com/pending', 'https://example.com/0']
+
+    # The last download of the previous page changed status, or was deleted, the first page is sent.
+    with get_db_session(commit=True) as session:
+        session.query(Download).filter_by(url='https://example.com/2').one().status = 'new'
+    request, response = test_client.get(f'/api/download?once_limit=4&once_after={once_next}'
+                                        f'&recurring_limit=2&recurring_after={recurring_next}')
+    assert [i['url'] for i in response.json['once_downloads']] == \
+           ['https://example.com/pending', 'https://example.com/0', 'https://example.com/2', 'https://example.com/1']
+    with get_db_session(commit=True) as session:
+        session.query(Download).filter_by(url='https://example.com/r1').delete()
+    request, response = test_client.get(f'/api/download?recurring_limit=2&recurring_after={recurring_next}')
+    assert [i['url'] for i in response.json['recurring_downloads']] == \
+           ['https://example.com/r0', 'https://example.com/r2']
+
+    request, response = test_client.get('/api/download?once_limit=foo')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    request, response = test_client.get('/api/download?once_after=foo')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
 def test_get_status(test_client):
     """Get the server status information."""
     request, response = test_client.get('/api/status')
@@ -68,13 +68,13 @@ async def test_rss_download(test_session, test_download_manager):
         test_download_manager.create_download('https://example.com/feed', sub_downloader='http')
         await test_download_manager.wait_for_all_downloads()
 
-    # Only the new URLs are Archived.
+    # Only the new URLs are Archived.  The conflicting insert of the feed used id 5.
     check_downloads([
         dict(id=1, status='complete', url='https://example.com/feed', attempts=2),
         dict(id=2, status='complete', url='https://example.com/a', attempts=1),
         dict(id=3, status='complete', url='https://example.com/b', attempts=1),
         dict(id=4, status='complete', url='https://example.com/c', attempts=1),
-        dict(id=5, status='complete', url='https://example.com/d', attempts=1),
+        dict(id=6, status='complete', url='https://example.com/d', attempts=1),
     ])
 
 
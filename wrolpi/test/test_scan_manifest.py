@@ -0,0 +1,82 @@
+import os
+from unittest import mock
+
+from wrolpi import scan_manifest
+
+
+def touch_directory(path):
+    """Change the modification time of a directory, file systems may not tick between quick changes."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@mock.patch('wrolpi.scan_manifest.RACY_NS', 0)
+def test_scan(test_session, test_directory):
+    root = test_directory / 'scan'
+    root.mkdir()
+    foo, bar, baz = root / 'foo.txt', root / 'dir/bar.txt', root / 'dir/sub/baz.txt'
+    baz.parent.mkdir(parents=True)
+    for path in (foo, bar, baz):
+        path.touch()
+
+    # All files are new during the first scan.
+    result = scan_manifest.scan('test', root)
+    assert result.first_scan
+    assert sorted(result.paths) == sorted(result.modified) == sorted([foo, bar, baz])
+    assert result.deleted == []
+    result.save()
+
+    # Nothing has changed, no directories are listed.
+    with mock.patch('wrolpi.scan_manifest._list_directory') as mock_list_directory:
+        result = scan_manifest.scan('test', root)
+        mock_list_directory.assert_not_called()
+    assert not result.first_scan and not result.changed
+    assert sorted(result.paths) == sorted([foo, bar, baz])
+
+    # Other scanners have their own manifest.
+    assert scan_manifest.scan('other', root).first_scan
+
+    # A new file is found.
+    qux = root / 'dir/sub/qux.txt'
+    qux.touch()
+    touch_directory(qux.parent)
+    result = scan_manifest.scan('test', root)
+    assert result.modified == [qux]
+    assert result.deleted == []
+    result.save()
+
+    # A full scan finds files that were modified in place.
+    foo.write_text('foo')
+    assert scan_manifest.scan('test', root).modified == []
+    result = scan_manifest.scan('test', root, full=True)
+    assert result.modified == [foo]
+    result.save()
+
+    # Deleted directories are found.
+    for path in (bar, baz, qux):
+        path.unlink()
+    baz.parent.rmdir()
+    bar.parent.rmdir()
+    touch_directory(root)
+    result = scan_manifest.scan('test', root)
+    assert result.paths == [foo]
+    assert result.modified == []
+    assert sorted(result.deleted) == sorted([bar, baz, qux])
+    result.save()
+
+    result = scan_manifest.scan('test', root)
+    assert not result.changed
+    assert test_session.query(scan_manifest.ScanDirectory).filter_by(scanner='test').count() == 1
+
+
+def test_scan_racy(test_session, test_directory):
+    """Recently modified files are checked again during the next scan."""
+    foo = test_directory / 'foo.txt'
+    foo.touch()
+
+    result = scan_manifest.scan('test', test_directory)
+    assert foo in result.modified
+    result.save()
+
+    result = scan_manifest.scan('test', test_directory)
+    assert foo in result.modified
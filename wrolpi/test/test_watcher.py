@@ -0,0 +1,77 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from wrolpi.watcher import MediaWatcher
+
+
+@pytest.mark.asyncio
+async def test_media_watcher(test_directory):
+    calls = []
+
+    def handler(created, deleted):
+        calls.append((created, deleted))
+
+    (test_directory / 'existing').mkdir()
+
+    watcher = MediaWatcher(test_directory, debounce=0.3)
+    watcher.start(asyncio.get_running_loop())
+
+    async def changes():
+        # Wait for the debounce, and the handlers to run in the executor.
+        await asyncio.sleep(1)
+        result = list(calls)
+        calls.clear()
+        return result
+
+    try:
+        with mock.patch('wrolpi.watcher.WATCH_HANDLERS', [handler]):
+            # Files in existing directories are found.
+            foo = test_directory / 'existing/foo.txt'
+            foo.write_text('foo')
+            # Partial downloads are ignored.
+            (test_directory / 'existing/video.mp4.part').write_text('foo')
+            assert await changes() == [([foo], [])]
+
+            # New directories are watched.
+            bar = test_directory / 'new/bar.txt'
+            bar.parent.mkdir()
+            await asyncio.sleep(0.1)
+            bar.write_text('bar')
+            baz = bar.parent / 'baz'
+            baz.mkdir()
+            await asyncio.sleep(0.1)
+            (baz / 'qux.txt').touch()
+            assert await changes() == [([bar, baz / 'qux.txt'], [])]
+
+            # Moves are a deletion and a creation.
+            moved = test_directory / 'moved.txt'
+            foo.rename(moved)
+            assert await changes() == [([moved], [foo])]
+
+            # Links are never written, they are reported when they are created.
+            link, hard_link = test_directory / 'link.txt', test_directory / 'hard link.txt'
+            link.symlink_to(moved)
+            os.link(moved, hard_link)
+            assert await changes() == [([hard_link, link], [])]
+
+            # Deleted directories are reported.
+            shutil.rmtree(bar.parent)
+            created, deleted = (await changes())[0]
+            assert created == []
+            assert bar.parent in deleted
+
+            # Directories moved out of the media directory are no longer watched.
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                outside = Path(tmp_dir) / 'existing'
+                (test_directory / 'existing').rename(outside)
+                assert await changes() == [([], [test_directory / 'existing'])]
+                (outside / 'outside.txt').write_text('outside')
+                assert await changes() == []
+    finally:
+        watcher.stop()
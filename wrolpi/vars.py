@@ -22,6 +22,8 @@ if not MEDIA_DIRECTORY.is_dir() and not PYTEST:
     print(f'Media directory does not exist!  {MEDIA_DIRECTORY}')
 
 CONFIG_DIR: Path = MEDIA_DIRECTORY / 'config'
+# Files which can be regenerated, these should not be stored with the media.
+CACHE_DIR: Path = Path(os.environ.get('CACHE_DIR', Path.home() / '.cache/wrolpi'))
 MODULES_DIR: Path = PROJECT_DIR / 'modules'
 PUBLIC_HOST = os.environ.get('PUBLIC_HOST')
 PUBLIC_PORT = os.environ.get('PUBLIC_PORT')
@@ -41,6 +43,14 @@ DB_NAME = os.environ.get('DB_NAME', 'wrolpi')
 DB_USER = os.environ.get('DB_USER', 'wrolpi')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'wrolpi')
 
+# Connection pool of the main DB engine.  These limits apply to each Sanic worker process.
+# `queue` keeps connections open between sessions, `null` opens a new connection for every session.
+DB_POOL = os.environ.get('DB_POOL', 'null' if PYTEST else 'queue').lower()
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 5))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 3600))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+
 EXAMPLE_CONFIG = {
     'hotspot_on_startup': True,
     'throttle_on_startup': False,
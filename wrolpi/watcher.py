@@ -0,0 +1,258 @@
+"""
+Watch the media directory for changes using Linux's inotify.
+
+Modules register a handler with `watch_handler`.  Changes are collected until no new changes have been seen for
+`debounce` seconds, then each handler is called with the paths that were created (or modified), and the paths that
+were deleted.  A deleted path may be a directory, handlers should remove anything within it.
+"""
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
+import stat
+import struct
+from pathlib import Path
+from typing import List, Callable, Dict, Set, Optional, Iterable
+
+from wrolpi.common import logger, walk_entries
+
+logger = logger.getChild(__name__)
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o00004000
+IN_CLOEXEC = 0o02000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct('iIII')
+
+# Files that are still being written by a downloader, these will be renamed when they are complete.
+IGNORED_SUFFIXES = ('.part', '.ytdl', '.temp', '.tmp')
+
+# Called with the created paths, and the deleted paths.
+WatchHandler = Callable[[List[Path], List[Path]], None]
+WATCH_HANDLERS: List[WatchHandler] = []
+
+
+def watch_handler(func: WatchHandler) -> WatchHandler:
+    """Call a function with the paths that have changed in the media directory."""
+    WATCH_HANDLERS.append(func)
+    return func
+
+
+def delete_paths(curs, table: str, column: str, paths: Iterable[Path]):
+    """Delete the rows of `table` whose path `column` is one of the deleted `paths`.  A deleted path may be a
+    directory, all rows within it are also deleted."""
+    stmt = f'''
+        DELETE FROM {table}
+        WHERE {column} = ANY(%(paths)s)
+            OR EXISTS (SELECT 1 FROM unnest(%(paths)s) AS d WHERE starts_with({column}, d || '/'))
+    '''
+    curs.execute(stmt, dict(paths=list(map(str, paths))))
+
+
+def _load_libc():
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+class MediaWatcher:
+
+    def __init__(self, directory: Path, debounce: float = 5.0, max_delay: float = 60.0):
+        self.directory = Path(directory)
+        self.debounce = debounce
+        # Handlers are always called after this long, even if changes are still happening.
+        self.max_delay = max_delay
+        self.created: Set[Path] = set()
+        self.deleted: Set[Path] = set()
+
+        self._libc = None
+        self._fd: Optional[int] = None
+        self._watches: Dict[int, Path] = dict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._first_change: Optional[float] = None
+
+    def __repr__(self):
+        return f'<MediaWatcher directory={self.directory} watches={len(self._watches)}>'
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._libc = _load_libc()
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._fd = fd
+        self._loop = loop
+
+        self.add_watches(self.directory)
+        loop.add_reader(self._fd, self._read_events)
+        logger.warning(f'Watching {len(self._watches)} directories in {self.directory}')
+
+    def stop(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        self._watches.clear()
+
+    def add_watch(self, directory: Path) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, str(directory).encode(), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                logger.error(f'Cannot watch {directory}, increase fs.inotify.max_user_watches')
+            elif error not in (errno.ENOENT, errno.ENOTDIR):
+                logger.error(f'Cannot watch {directory}: {os.strerror(error)}')
+            return False
+        self._watches[wd] = Path(directory)
+        return True
+
+    def remove_watches(self, directory: Path):
+        """Stop watching a directory, and all directories in it."""
+        for wd, path in list(self._watches.items()):
+            if path == directory or directory in path.parents:
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+
+    def add_watches(self, directory: Path) -> List[Path]:
+        """Watch a directory, and all directories in it.  Returns all files in the directory."""
+        files = []
+        if not self.add_watch(directory):
+            return files
+        for entry in walk_entries(directory):
+            if entry.is_dir():
+                self.add_watch(Path(entry.path))
+            else:
+                files.append(Path(entry.path))
+        return files
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode(errors='surrogateescape')
+            offset += length
+            self._handle_event(wd, mask, name)
+
+    def _handle_event(self, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            logger.error('Too many changes in the media directory, some changes were lost.  Refresh to find them.')
+            return
+        if mask & IN_IGNORED:
+            # The watched directory was removed.
+            self._watches.pop(wd, None)
+            return
+
+        directory = self._watches.get(wd)
+        if not directory or not name:
+            return
+        path = directory / name
+
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Files may have been created before the watch was added.
+                for file in self.add_watches(path):
+                    self.created_path(file)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                # A directory which was moved is still watched, it may have been moved out of the media directory.  It
+                # will be watched again if it was moved within the media directory.
+                self.remove_watches(path)
+                self.deleted_path(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.created_path(path)
+        elif mask & IN_CREATE:
+            # Links, and special files, are never written, so IN_CLOSE_WRITE will not follow.
+            try:
+                stat_ = os.lstat(path)
+            except FileNotFoundError:
+                return
+            if not stat.S_ISREG(stat_.st_mode) or stat_.st_nlink > 1:
+                self.created_path(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self.deleted_path(path)
+
+    def created_path(self, path: Path):
+        if path.name.endswith(IGNORED_SUFFIXES):
+            return
+        self.deleted.discard(path)
+        self.created.add(path)
+        self._schedule_flush()
+
+    def deleted_path(self, path: Path):
+        if path.name.endswith(IGNORED_SUFFIXES):
+            return
+        self.created.discard(path)
+        self.deleted.add(path)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        now = self._loop.time()
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        else:
+            self._first_change = now
+        delay = min(self.debounce, max(self._first_change + self.max_delay - now, 0))
+        self._flush_handle = self._loop.call_later(delay, self.flush)
+
+    def flush(self):
+        """Send all changes to the handlers."""
+        self._flush_handle = self._first_change = None
+        created, self.created = sorted(self.created), set()
+        deleted, self.deleted = sorted(self.deleted), set()
+        if created or deleted:
+            logger.info(f'Media directory changed: {len(created)} created, {len(deleted)} deleted')
+            self._loop.run_in_executor(None, call_handlers, created, deleted)
+
+
+def call_handlers(created: List[Path], deleted: List[Path]):
+    for handler in WATCH_HANDLERS:
+        try:
+            handler(created, deleted)
+        except Exception as e:
+            logger.error(f'Watch handler {handler.__name__} failed', exc_info=e)
+
+
+MEDIA_WATCHER: Optional[MediaWatcher] = None
+
+
+def start_media_watcher(directory: Path, loop: asyncio.AbstractEventLoop) -> Optional[MediaWatcher]:
+    global MEDIA_WATCHER
+    if MEDIA_WATCHER:
+        return MEDIA_WATCHER
+
+    try:
+        MEDIA_WATCHER = MediaWatcher(directory)
+        MEDIA_WATCHER.start(loop)
+    except (OSError, AttributeError) as e:
+        # inotify is only available on Linux.
+        logger.error('Unable to watch the media directory', exc_info=e)
+        MEDIA_WATCHER = None
+    return MEDIA_WATCHER
+
+
+def stop_media_watcher():
+    global MEDIA_WATCHER
+    if MEDIA_WATCHER:
+        MEDIA_WATCHER.stop()
+        MEDIA_WATCHER = None